@@ -0,0 +1,5 @@
+# tests/benchmarks
+"""
+Инструменты измерения производительности: заполнение базы тестовыми данными,
+нагрузочный прогон зачета по HTTP и замеры представлений.
+"""
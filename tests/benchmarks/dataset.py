@@ -0,0 +1,227 @@
+# tests/benchmarks/dataset.py
+"""
+Синтетический набор данных для замеров представлений.
+
+Повторяет форму рабочей базы: подразделения вида 35-1-1 с руководителями
+групп (35У) и подгрупп (35-1У), большие тесты, завершенные тренировки,
+экспресс-тесты и зачеты за последние месяцы со снимками результатов, несколько
+незавершенных попыток и сессии зачетов с участниками и счетчиками.
+Попытки создаются через bulk_create, поэтому дневная статистика графиков и
+лучшие результаты пересчитываются в конце generate_dataset (а после
+add_completed_attempts и add_quiz_results - вызовами rebuild_daily_stats и
+rebuild_best_results).
+
+Генерация детерминирована (random.Random(seed)), поэтому замеры на наборах с
+одинаковыми параметрами можно сравнивать между собой.
+"""
+from datetime import timedelta
+import random
+
+from django.db import transaction
+from django.utils import timezone
+
+from tests.benchmarks.seeding import delete_seeded_users, seed_test, seed_users
+from tests.models import QuizParticipant, QuizSession, Test, UserTestProgress, generate_attempt_id
+from tests.utils.answer_keys import build_result_snapshot, range_question_ids
+from tests.utils.best_results import rebuild_best_results
+from tests.utils.daily_stats import rebuild_daily_stats
+from tests.utils.quiz_stats import reconcile_quiz_stats
+
+ATTEMPT_QUESTIONS = 20
+BATCH_SIZE = 2000
+
+
+def department_codes(groups, subgroups, subsubgroups):
+    """Коды подразделений: руководители групп и подгрупп, затем рядовые коды"""
+    heads = []
+    members = []
+    for group in range(35, 35 + groups):
+        heads.append(f'{group}У')
+        for subgroup in range(1, subgroups + 1):
+            heads.append(f'{group}-{subgroup}У')
+            for subsubgroup in range(1, subsubgroups + 1):
+                members.append(f'{group}-{subgroup}-{subsubgroup}')
+    return heads, members
+
+
+def _answers_for(rng, key, question_ids, skill):
+    """Ответы попытки: с вероятностью skill правильный вариант, иначе случайный"""
+    answers = {}
+    for question_id in question_ids:
+        entry = key[question_id]
+        if rng.random() < skill:
+            selected = sorted(entry.correct)
+        else:
+            selected = [rng.randint(1, entry.option_count)]
+        answers[str(question_id)] = [str(option) for option in selected]
+    return answers
+
+
+def _completed_attempt(rng, user_id, test, key, question_ids, test_type, skill, completed_at, **extra):
+    answers = _answers_for(rng, key, question_ids, skill)
+    snapshot = build_result_snapshot(key, question_ids, answers)
+    start_time = completed_at - timedelta(minutes=rng.randint(5, 40))
+    return UserTestProgress(
+        user_id=user_id,
+        test=test,
+        test_type=test_type,
+        completed=True,
+        answers=answers,
+        question_order=list(question_ids),
+        current_position=len(question_ids) - 1,
+        start_time=start_time,
+        end_time=start_time + timedelta(minutes=45) if test_type != 'normal' else None,
+        time_limit_minutes=45 if test_type != 'normal' else 0,
+        completed_at=completed_at,
+        result_snapshot=snapshot,
+        correct_answers_count=snapshot['correct_count'],
+        total_questions_count=snapshot['total'],
+        score=snapshot['correct_count'] / snapshot['total'] * 100 if snapshot['total'] else 0,
+        attempt_id=generate_attempt_id(user_id, test.id),
+        **extra
+    )
+
+
+def _random_completed_at(rng, now, days):
+    return now - timedelta(seconds=rng.randint(60, days * 24 * 3600))
+
+
+def add_completed_attempts(users, tests, count, seed=0, days=90, skills=None):
+    """Добавляет count завершенных тренировок (диапазон номеров) и экспресс-тестов
+    (случайные вопросы) случайным пользователям из users. Возвращает количество."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    keys = {test.id: test.get_answer_key() for test in tests}
+    ordered_ids = {test.id: range_question_ids(keys[test.id]) for test in tests}
+    skills = skills or {}
+
+    batch = []
+    for _ in range(count):
+        user = users[rng.randrange(len(users))]
+        test = rng.choice(tests)
+        key, ids = keys[test.id], ordered_ids[test.id]
+        skill = skills.get(user.id, 0.7)
+        if rng.random() < 0.6:
+            start = rng.randrange(max(len(ids) - ATTEMPT_QUESTIONS, 0) + 1)
+            question_ids = ids[start:start + ATTEMPT_QUESTIONS]
+            attempt = _completed_attempt(
+                rng, user.id, test, key, question_ids, 'normal', skill, _random_completed_at(rng, now, days),
+                start_question=key[question_ids[0]].number,
+                end_question=key[question_ids[-1]].number,
+            )
+        else:
+            question_ids = rng.sample(ids, min(ATTEMPT_QUESTIONS, len(ids)))
+            attempt = _completed_attempt(
+                rng, user.id, test, key, question_ids, 'express', skill, _random_completed_at(rng, now, days)
+            )
+        batch.append(attempt)
+        if len(batch) >= BATCH_SIZE:
+            UserTestProgress.objects.bulk_create(batch)
+            batch = []
+    UserTestProgress.objects.bulk_create(batch)
+    return count
+
+
+def add_quiz_results(quiz_session, users, finished_at, seed=0, skills=None):
+    """Записывает пользователей в зачет с завершенными попытками. Возвращает количество."""
+    rng = random.Random(seed)
+    test = quiz_session.test
+    key = test.get_answer_key()
+    skills = skills or {}
+    with transaction.atomic():
+        progresses = [
+            _completed_attempt(rng, user.id, test, key, quiz_session.question_order, 'quiz',
+                               skills.get(user.id, 0.7), finished_at, quiz_session=quiz_session)
+            for user in users
+        ]
+        UserTestProgress.objects.bulk_create(progresses, batch_size=BATCH_SIZE)
+        QuizParticipant.objects.bulk_create([
+            QuizParticipant(quiz_session=quiz_session, user_id=progress.user_id,
+                            progress=progress, completed_at=finished_at)
+            for progress in progresses
+        ], batch_size=BATCH_SIZE)
+    return len(progresses)
+
+
+def generate_dataset(prefix='bench_', users=3000, groups=5, subgroups=4, subsubgroups=3,
+                     tests=4, questions=2000, attempts=200000, quiz_sessions_per_group=4,
+                     days=90, seed=0, password='bench-password', log=print):
+    """Создает набор данных и возвращает словарь с количеством созданных объектов"""
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    heads, members = department_codes(groups, subgroups, subsubgroups)
+    codes = heads + [members[index % len(members)] for index in range(max(users - len(heads), 0))]
+    created_users = seed_users(
+        [(f'{prefix}{index:06d}', code) for index, code in enumerate(codes)], password, batch_size=BATCH_SIZE
+    )
+    log(f'Пользователей: {len(created_users)}')
+
+    created_tests = [seed_test(f'{prefix}test_{index + 1}', questions) for index in range(tests)]
+    keys = {test.id: test.get_answer_key() for test in created_tests}
+    ordered_ids = {test.id: range_question_ids(keys[test.id]) for test in created_tests}
+    log(f'Тестов: {len(created_tests)} по {questions} вопросов')
+
+    skills = {user.id: rng.uniform(0.4, 0.95) for user in created_users}
+    users_by_group = {}
+    for user, code in zip(created_users, codes):
+        users_by_group.setdefault(code.split('-')[0].replace('У', ''), []).append(user)
+
+    # Зачеты: руководитель группы проводит несколько зачетов для всей группы
+    quiz_rows = 0
+    session_ids = []
+    for group, group_users in users_by_group.items():
+        head = group_users[0]
+        for _ in range(quiz_sessions_per_group):
+            test = rng.choice(created_tests)
+            question_ids = sorted(rng.sample(ordered_ids[test.id], min(ATTEMPT_QUESTIONS, questions)),
+                                  key=lambda question_id: keys[test.id][question_id].number)
+            starts_at = _random_completed_at(rng, now, days)
+            quiz_session = QuizSession.objects.create(
+                creator=head, test=test, question_count=len(question_ids), time_limit_minutes=45,
+                starts_at=starts_at, ends_at=starts_at + timedelta(hours=2), is_active=True,
+                question_order=question_ids, audience_updated_at=starts_at,
+            )
+            session_ids.append(quiz_session.id)
+            quiz_rows += add_quiz_results(quiz_session, group_users, starts_at + timedelta(minutes=30),
+                                          seed=rng.random(), skills=skills)
+    reconcile_quiz_stats(session_ids)
+    log(f'Сессий зачетов: {len(session_ids)}, попыток зачетов: {quiz_rows}')
+
+    remaining = max(attempts - quiz_rows, 0)
+    created = 0
+    chunk = BATCH_SIZE * 25
+    while created < remaining:
+        created += add_completed_attempts(created_users, created_tests, min(chunk, remaining - created),
+                                          seed=rng.random(), days=days, skills=skills)
+        log(f'  попыток: {created} из {remaining}')
+
+    # Незавершенные тренировки у каждого десятого пользователя
+    active = []
+    for user in created_users[::10]:
+        test = rng.choice(created_tests)
+        question_ids = ordered_ids[test.id][:ATTEMPT_QUESTIONS]
+        active.append(UserTestProgress(
+            user=user, test=test, test_type='normal', question_order=question_ids,
+            current_question_id=question_ids[0], start_question=1, end_question=len(question_ids),
+            start_time=now, attempt_id=generate_attempt_id(user.id, test.id),
+        ))
+    UserTestProgress.objects.bulk_create(active, batch_size=BATCH_SIZE)
+    log(f'Тренировок и экспресс-тестов: {created}, незавершенных попыток: {len(active)}')
+    log(f'Строк дневной статистики: {rebuild_daily_stats()}')
+    log(f'Лучших результатов: {rebuild_best_results()}')
+
+    return {
+        'users': len(created_users),
+        'tests': len(created_tests),
+        'questions_per_test': questions,
+        'quiz_sessions': len(session_ids),
+        'attempts': created + quiz_rows + len(active),
+    }
+
+
+def delete_dataset(prefix='bench_'):
+    """Удаляет набор данных: пользователей (с попытками и зачетами) и тесты"""
+    deleted_users = delete_seeded_users(prefix)
+    deleted_tests = Test.objects.filter(name__startswith=prefix).delete()[0]
+    return deleted_users + deleted_tests
@@ -0,0 +1,205 @@
+# tests/benchmarks/load_quiz.py
+"""
+Нагрузочный прогон группового зачета по HTTP.
+
+Каждый участник - отдельный поток со своей cookie-сессией: вход, открытие
+зачета (participate_in_quiz), ответы на вопросы (GET и POST test_progress),
+опрос check_time_remaining и страница результатов. Время каждого запроса
+записывается по имени представления, в конце считаются перцентили.
+
+Используется только стандартная библиотека, чтобы прогон можно было запустить
+на любой машине рядом с сервером (waitress, gunicorn, uvicorn).
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+import random
+import re
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+ATTEMPT_ID_RE = re.compile(r'data-attempt-id="([^"]+)"')
+ANSWER_OPTION_RE = re.compile(r'name="answer" value="([^"]+)"')
+
+# Признаки того, что запрос упал на блокировке SQLite (видны при DEBUG=True)
+LOCK_MARKERS = (b'database is locked', b'database table is locked')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Не следуем редиректам автоматически, чтобы замерять каждый запрос отдельно"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class LoadReport:
+    """Потокобезопасный сбор замеров по представлениям"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_timeouts = defaultdict(int)
+        self.timeouts = defaultdict(int)
+
+    def record(self, endpoint, seconds, status, body=b''):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if status >= 400:
+                self.errors[endpoint] += 1
+                if any(marker in body for marker in LOCK_MARKERS):
+                    self.lock_timeouts[endpoint] += 1
+
+    def record_timeout(self, endpoint, seconds):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.errors[endpoint] += 1
+            self.timeouts[endpoint] += 1
+
+    def summary(self):
+        """Сводка: endpoint -> количество, p50/p95/p99/max в миллисекундах, ошибки"""
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result[endpoint] = {
+                'requests': len(values),
+                'p50_ms': round(percentile(values, 50) * 1000, 1),
+                'p95_ms': round(percentile(values, 95) * 1000, 1),
+                'p99_ms': round(percentile(values, 99) * 1000, 1),
+                'max_ms': round(values[-1] * 1000, 1),
+                'errors': self.errors[endpoint],
+                'lock_timeouts': self.lock_timeouts[endpoint],
+                'timeouts': self.timeouts[endpoint],
+            }
+        return result
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль по методу ближайшего ранга для отсортированного списка"""
+    if not sorted_values:
+        return 0
+    rank = max(int(round(percent / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class QuizParticipantClient:
+    """Один участник зачета со своей cookie-сессией"""
+
+    def __init__(self, base_url, report, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.report = report
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect()
+        )
+
+    def _csrf_cookie(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, endpoint, path, data=None):
+        """Выполняет запрос и возвращает (статус, тело, Location)"""
+        url = path if path.startswith('http') else self.base_url + path
+        body = None
+        headers = {'Referer': self.base_url + '/'}
+        if data is not None:
+            body = urllib.parse.urlencode(data, doseq=True).encode()
+            headers['X-CSRFToken'] = self._csrf_cookie()
+        req = urllib.request.Request(url, data=body, headers=headers)
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                content = response.read()
+                status, location = response.status, None
+        except urllib.error.HTTPError as error:
+            content = error.read() or b''
+            status, location = error.code, error.headers.get('Location')
+        except (socket.timeout, TimeoutError, urllib.error.URLError) as error:
+            if isinstance(error, urllib.error.URLError) and not isinstance(error.reason, (socket.timeout, TimeoutError)):
+                raise
+            self.report.record_timeout(endpoint, time.perf_counter() - started)
+            return 0, b'', None
+        elapsed = time.perf_counter() - started
+
+        # Редирект - не ошибка
+        self.report.record(endpoint, elapsed, 200 if 300 <= status < 400 else status, content)
+        return status, content, location
+
+    def login(self, username, password):
+        _, page, _ = self.request('login GET', '/login/')
+        match = CSRF_INPUT_RE.search(page.decode('utf-8', 'ignore'))
+        status, _, _ = self.request('login POST', '/login/', {
+            'csrfmiddlewaretoken': match.group(1) if match else self._csrf_cookie(),
+            'username': username,
+            'password': password,
+        })
+        return status == 302
+
+    def run_quiz(self, session_id, test_id, question_count, think_time=0.5, poll_every=5):
+        """Проходит зачет целиком. Возвращает True, если дошли до результатов"""
+        status, _, location = self.request('participate_in_quiz', f'/quiz/participate/{session_id}/')
+        if status != 302 or not location or f'/test/{test_id}/' not in location:
+            return False
+
+        attempt_id = None
+        for answered in range(question_count):
+            status, page, location = self.request('test_progress GET', f'/test/{test_id}/')
+            if status != 200:
+                break
+            html = page.decode('utf-8', 'ignore')
+            if attempt_id is None:
+                match = ATTEMPT_ID_RE.search(html)
+                attempt_id = match.group(1) if match else None
+
+            options = ANSWER_OPTION_RE.findall(html)
+            csrf = CSRF_INPUT_RE.search(html)
+            if not options:
+                break
+            if think_time:
+                time.sleep(random.uniform(0, think_time))
+
+            self.request('test_progress POST', f'/test/{test_id}/', {
+                'csrfmiddlewaretoken': csrf.group(1) if csrf else self._csrf_cookie(),
+                'answer': random.sample(options, random.randint(1, min(2, len(options)))),
+            })
+
+            if attempt_id and poll_every and (answered + 1) % poll_every == 0:
+                self.request('check_time_remaining', f'/check-time-remaining/?attempt_id={attempt_id}')
+
+        query = f'?attempt_id={attempt_id}' if attempt_id else ''
+        status, _, _ = self.request('test_results', f'/test/{test_id}/results/{query}')
+        return status == 200
+
+
+def run_load(base_url, usernames, password, session_id, test_id, question_count,
+             concurrency=None, ramp_up=0, think_time=0.5, poll_every=5, timeout=30):
+    """Запускает участников параллельно и возвращает (LoadReport, число завершивших, длительность)"""
+    report = LoadReport()
+    completed = []
+
+    def participant(index_and_username):
+        index, username = index_and_username
+        if ramp_up:
+            time.sleep(ramp_up * index / max(len(usernames), 1))
+        client = QuizParticipantClient(base_url, report, timeout=timeout)
+        try:
+            if client.login(username, password) and client.run_quiz(
+                session_id, test_id, question_count, think_time=think_time, poll_every=poll_every
+            ):
+                completed.append(username)
+        except Exception:
+            report.record('unexpected', 0, 599)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency or len(usernames)) as executor:
+        list(executor.map(participant, enumerate(usernames)))
+    return report, len(completed), time.perf_counter() - started
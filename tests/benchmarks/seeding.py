@@ -0,0 +1,68 @@
+# tests/benchmarks/seeding.py
+"""
+Быстрое создание пользователей для нагрузочных прогонов и замеров.
+
+Пароль хэшируется один раз и переиспользуется, а пользователи и профили
+вставляются bulk_create, поэтому тысячи пользователей создаются за секунды.
+Нормализованные поля профиля заполняются так же, как в UserProfile.save().
+"""
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from tests.models import Question, Test, UserProfile, split_department_code
+
+
+def seed_users(usernames_with_codes, password, batch_size=1000):
+    """Создает пользователей с профилями. usernames_with_codes - пары
+    (username, код подразделения). Возвращает список User."""
+    password_hash = make_password(password)
+    pairs = list(usernames_with_codes)
+
+    User.objects.bulk_create([
+        User(username=username, email=f'{username}@example.com', password=password_hash,
+             first_name=f'Имя{index}', last_name=f'Фамилия{index}')
+        for index, (username, _) in enumerate(pairs)
+    ], batch_size=batch_size)
+
+    users = {user.username: user for user in User.objects.filter(username__in=[username for username, _ in pairs])}
+    profiles = []
+    for index, (username, department_code) in enumerate(pairs):
+        group, subgroup, subsubgroup, has_view_rights = split_department_code(department_code)
+        profiles.append(UserProfile(
+            user=users[username],
+            last_name=f'Фамилия{index}',
+            first_name=f'Имя{index}',
+            department_code=department_code,
+            department_group=group,
+            department_subgroup=subgroup,
+            department_subsubgroup=subsubgroup,
+            has_view_rights=has_view_rights,
+        ))
+    UserProfile.objects.bulk_create(profiles, batch_size=batch_size)
+    return [users[username] for username, _ in pairs]
+
+
+def delete_seeded_users(prefix):
+    """Удаляет пользователей с префиксом имени вместе со всеми их данными"""
+    return User.objects.filter(username__startswith=prefix).delete()[0]
+
+
+def seed_test(name, question_count, batch_size=1000):
+    """Создает тест с вопросами на четыре варианта ответа"""
+    test = Test.objects.create(name=name, description='Сгенерирован для замеров производительности')
+    questions = [
+        Question(
+            test=test,
+            question_number=number,
+            question_text=f'Вопрос {number}',
+            correct_answer='1, 3' if number % 3 == 0 else str(number % 4 + 1),
+            document_reference=f'Документ {number % 50 + 1}',
+            answer_options={str(option): f'Вариант {option}' for option in range(1, 5)},
+        )
+        for number in range(1, question_count + 1)
+    ]
+    # bulk_create не вызывает save() - хэш содержимого для повторного импорта считаем сами
+    for question in questions:
+        question.content_hash = question.compute_content_hash()
+    Question.objects.bulk_create(questions, batch_size=batch_size)
+    return test
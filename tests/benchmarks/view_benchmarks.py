@@ -0,0 +1,142 @@
+# tests/benchmarks/view_benchmarks.py
+"""
+Замеры горячих представлений на синтетическом наборе данных (dataset.py).
+
+Каждое представление вызывается тестовым клиентом Django несколько раз от
+имени подходящего пользователя: время ответа, количество SQL-запросов и их
+суммарное время. Каждый вызов выполняется в транзакции, которая
+откатывается, поэтому представления, меняющие данные (завершение попытки),
+не портят набор между повторами.
+
+Результаты сравниваются с сохраненным JSON (baseline.json рядом с модулем).
+"""
+import json
+import os
+import statistics as stats
+import time
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from tests.models import QuizSession, User, UserTestProgress
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def benchmark_context(prefix='bench_'):
+    """Пользователи и объекты, от имени которых выполняются замеры"""
+    users = User.objects.filter(username__startswith=prefix)
+    # Самый активный рядовой пользователь и руководитель его группы
+    member = users.filter(profile__has_view_rights=False).annotate(
+        attempts=Count('usertestprogress', filter=Q(usertestprogress__completed=True))
+    ).order_by('-attempts', 'id').first()
+    if member is None:
+        return None
+    head = users.filter(
+        profile__has_view_rights=True,
+        profile__department_group=member.profile.department_group,
+        profile__department_subgroup='',
+    ).order_by('id').first()
+    if head is None:
+        return None
+
+    quiz_session = QuizSession.objects.filter(creator=head).order_by('-starts_at').first()
+    attempt = UserTestProgress.objects.filter(
+        user=member, completed=True, test_type='express'
+    ).order_by('-completed_at').first()
+    return {'head': head, 'member': member, 'quiz_session': quiz_session, 'attempt': attempt}
+
+
+def benchmark_scenarios(context):
+    """Список замеров: (название, пользователь, URL)"""
+    head, member = context['head'], context['member']
+    scenarios = [
+        ('test_selection', member, '/'),
+        ('statistics', member, '/profile/statistics/'),
+        ('statistics_charts', member, '/statistics/all/'),
+        ('user_statistics_charts', head, f'/user/{member.id}/statistics/all/'),
+        ('group_results', head, '/group-results/'),
+    ]
+    if context['quiz_session']:
+        scenarios.append(('quiz_session_results', head, f'/quiz/session/{context["quiz_session"].id}/results/'))
+    if context['attempt']:
+        attempt = context['attempt']
+        scenarios.append(('test_results', member, f'/test/{attempt.test_id}/results/?attempt_id={attempt.attempt_id}'))
+    return scenarios
+
+
+def measure(client, url, repeat):
+    """Вызывает URL repeat раз (плюс прогрев) и возвращает сводку замеров"""
+    durations = []
+    query_counts = []
+    sql_times = []
+    status = None
+    for iteration in range(repeat + 1):
+        # Журнал запросов ограничен 9000 записей - очищаем, чтобы подсчет не сбивался
+        connection.queries_log.clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        status = response.status_code
+        if iteration == 0:
+            continue  # прогрев: кэши ключей ответов, шаблонов
+        durations.append(elapsed)
+        query_counts.append(len(queries))
+        sql_times.append(sum(float(query['time']) for query in queries.captured_queries))
+
+    return {
+        'status': status,
+        'median_ms': round(stats.median(durations) * 1000, 1),
+        'min_ms': round(min(durations) * 1000, 1),
+        'max_ms': round(max(durations) * 1000, 1),
+        'queries': max(query_counts),
+        'sql_ms': round(stats.median(sql_times) * 1000, 1),
+    }
+
+
+def run_benchmarks(prefix='bench_', repeat=5, only=None):
+    """Выполняет замеры и возвращает {название: сводка}"""
+    context = benchmark_context(prefix)
+    if context is None:
+        return {}
+
+    clients = {}
+    results = {}
+    for name, user, url in benchmark_scenarios(context):
+        if only and name not in only:
+            continue
+        if user.id not in clients:
+            clients[user.id] = Client(HTTP_HOST='localhost')
+            clients[user.id].force_login(user)
+        results[name] = dict(measure(clients[user.id], url, repeat), url=url)
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results, dataset, path=BASELINE_PATH):
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump({'dataset': dataset, 'views': results}, baseline_file, ensure_ascii=False, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def compare_with_baseline(results, baseline):
+    """Изменения относительно базовых замеров: {название: (изменение медианы в %, изменение числа запросов)}"""
+    changes = {}
+    for name, row in results.items():
+        base = (baseline or {}).get('views', {}).get(name)
+        if not base:
+            continue
+        time_change = (row['median_ms'] - base['median_ms']) / base['median_ms'] * 100 if base['median_ms'] else 0
+        changes[name] = (round(time_change, 1), row['queries'] - base['queries'])
+    return changes
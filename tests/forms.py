@@ -211,6 +211,11 @@ class ExcelUploadForm(forms.Form):
         label="Название теста (необязательно)",
         help_text="Если не указано, будет использовано имя файла"
     )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Только проверить файл",
+        help_text="Файл будет проверен построчно без сохранения вопросов"
+    )
 
 class QuizCreationForm(forms.Form):
     test = forms.ModelChoiceField(
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tests.utils.quiz_activation import activate_due_sessions, next_activation_time
+
+class Command(BaseCommand):
+    help = 'Активирует зачеты, у которых наступило время начала (можно запускать как демон с --loop)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, активируя зачеты ко времени начала')
+        parser.add_argument('--interval', type=int, default=30, help='Максимальный интервал проверки в секундах для --loop')
+    
+    def handle(self, *args, **options):
+        while True:
+            activated_count = activate_due_sessions()
+            if activated_count or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Активировано зачетов: {activated_count}')
+                )
+            
+            if not options['loop']:
+                break
+            
+            # Спим до начала ближайшего зачета, но не дольше интервала -
+            # зачет могут создать или перенести в любой момент
+            sleep_seconds = options['interval']
+            next_start = next_activation_time()
+            if next_start is not None:
+                sleep_seconds = min(sleep_seconds, max((next_start - timezone.now()).total_seconds(), 0.5))
+            time.sleep(sleep_seconds)
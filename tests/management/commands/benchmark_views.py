@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tests.benchmarks.view_benchmarks import (
+    BASELINE_PATH, compare_with_baseline, load_baseline, run_benchmarks, save_baseline,
+)
+from tests.models import Test, User, UserTestProgress
+
+
+class Command(BaseCommand):
+    help = ('Замеряет горячие представления на данных seed_benchmark_data и сравнивает '
+            'с базовыми замерами (tests/benchmarks/baseline.json)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench_', help='Префикс данных seed_benchmark_data')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого замера')
+        parser.add_argument('--view', action='append', dest='views', help='Замерить только это представление (можно несколько)')
+        parser.add_argument('--baseline', default=BASELINE_PATH, help='Файл базовых замеров')
+        parser.add_argument('--save-baseline', action='store_true', help='Записать результаты как новые базовые замеры')
+        parser.add_argument('--max-regression', type=float,
+                            help='Завершиться с ошибкой, если медиана выросла больше чем на столько процентов')
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(options['prefix'], repeat=max(options['repeat'], 1), only=options['views'])
+        if not results:
+            raise CommandError('Нет данных для замеров: сначала выполните seed_benchmark_data')
+
+        baseline = load_baseline(options['baseline'])
+        changes = compare_with_baseline(results, baseline)
+
+        self.stdout.write(
+            f'{"Представление":<24}{"Статус":>7}{"Медиана, мс":>13}{"Мин, мс":>10}{"Макс, мс":>10}'
+            f'{"Запросов":>10}{"SQL, мс":>10}{"К базе":>24}'
+        )
+        for name, row in results.items():
+            change = changes.get(name)
+            change_text = f'{change[0]:+.1f}%' if change else '-'
+            if change and change[1]:
+                change_text += f' ({change[1]:+d} запр.)'
+            self.stdout.write(
+                f'{name:<24}{row["status"]:>7}{row["median_ms"]:>13}{row["min_ms"]:>10}{row["max_ms"]:>10}'
+                f'{row["queries"]:>10}{row["sql_ms"]:>10}{change_text:>24}'
+            )
+
+        if options['save_baseline']:
+            prefix = options['prefix']
+            dataset = {
+                'users': User.objects.filter(username__startswith=prefix).count(),
+                'tests': Test.objects.filter(name__startswith=prefix).count(),
+                'attempts': UserTestProgress.objects.filter(user__username__startswith=prefix).count(),
+            }
+            save_baseline(results, dataset, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f'Базовые замеры сохранены в {options["baseline"]}'))
+
+        limit = options['max_regression']
+        if limit is not None:
+            regressions = [name for name, (time_change, _) in changes.items() if time_change > limit]
+            if regressions:
+                raise CommandError(f'Замедление больше {limit}%: {", ".join(regressions)}')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from tests.models import UserTestProgress
+from tests.utils.answer_keys import attempt_question_ids, build_result_snapshot
+
+class Command(BaseCommand):
+    help = 'Строит снимки результатов для завершенных попыток, у которых их еще нет'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Размер пакета обновления')
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        attempts = UserTestProgress.objects.filter(
+            completed=True,
+            result_snapshot__isnull=True
+        ).select_related('test').order_by('id')
+        
+        batch = []
+        built_count = 0
+        
+        for progress in attempts.iterator(chunk_size=batch_size):
+            answer_key = progress.test.get_answer_key()
+            question_ids = attempt_question_ids(progress, answer_key)
+            progress.result_snapshot = build_result_snapshot(answer_key, question_ids, progress.get_answers())
+            batch.append(progress)
+            
+            if len(batch) >= batch_size:
+                UserTestProgress.objects.bulk_update(batch, ['result_snapshot'])
+                built_count += len(batch)
+                batch = []
+        
+        if batch:
+            UserTestProgress.objects.bulk_update(batch, ['result_snapshot'])
+            built_count += len(batch)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Построено снимков результатов: {built_count}')
+        )
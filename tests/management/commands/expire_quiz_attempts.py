@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from tests.utils.attempt_expiry import expire_all_overdue_attempts
+
+class Command(BaseCommand):
+    help = 'Завершает и оценивает попытки, у которых истекло время (можно запускать как демон с --loop)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Размер пакета попыток')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, проверяя попытки с интервалом')
+        parser.add_argument('--interval', type=int, default=15, help='Интервал проверки в секундах для --loop')
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        
+        while True:
+            closed_count = expire_all_overdue_attempts(batch_size=batch_size)
+            if closed_count or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Завершено попыток с истекшим временем: {closed_count}')
+                )
+            
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
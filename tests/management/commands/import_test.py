@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
 import os
-from tests.utils.excel_importer import import_test_from_excel
+from tests.utils.excel_importer import import_test_from_excel, preview_changes, read_test_excel
 
 class Command(BaseCommand):
     help = 'Импортирует тест из Excel файла'
@@ -9,6 +9,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('file_path', type=str, help='Путь к Excel файлу')
         parser.add_argument('--test_name', type=str, help='Название теста', default=None)
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл, ничего не сохраняя')
     
     def handle(self, *args, **options):
         file_path = options['file_path']
@@ -18,11 +19,35 @@ class Command(BaseCommand):
             file_path = os.path.join(settings.BASE_DIR, file_path)
         
         try:
-            test = import_test_from_excel(file_path, test_name)
+            report = read_test_excel(file_path)
+            for warning in report.warnings:
+                self.stdout.write(self.style.WARNING(warning))
+            for error in report.errors:
+                self.stdout.write(self.style.ERROR(error))
+            
+            if options['dry_run'] or not report.is_valid:
+                style = self.style.SUCCESS if report.is_valid else self.style.ERROR
+                self.stdout.write(style(
+                    f'Проверено вопросов: {len(report.questions)}, ошибок: {len(report.errors)}, '
+                    f'предупреждений: {len(report.warnings)}, пропущено строк: {report.skipped_rows}'
+                ))
+                if report.is_valid:
+                    self.write_changes(preview_changes(report, test_name), 'При импорте будет')
+                return
+            
+            test = import_test_from_excel(file_path, test_name, report=report)
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Успешно импортирован тест "{test.name}" с {test.questions.count()} вопросами'
+                    f'Успешно импортирован тест "{test.name}" с {len(report.questions)} вопросами'
                 )
             )
+            self.write_changes(report.changes, 'Изменения')
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ошибка импорта: {str(e)}'))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f'Ошибка импорта: {str(e)}'))
+    
+    def write_changes(self, changes, title):
+        self.stdout.write(f'{title}: {changes.summary()}')
+        for label, numbers in (('добавлены', changes.added), ('изменены', changes.updated),
+                               ('выведены из теста', changes.retired)):
+            if numbers and len(numbers) <= 200:
+                self.stdout.write(f'  Вопросы {label}: {", ".join(map(str, numbers))}')
@@ -0,0 +1,131 @@
+import json
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tests.benchmarks.load_quiz import run_load
+from tests.benchmarks.seeding import delete_seeded_users, seed_test, seed_users
+from tests.models import QuizSession, Test
+from tests.utils.answer_keys import active_question_ids
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон группового зачета: создает N участников одного подразделения, '
+            'зачет и проходит его параллельно по HTTP против запущенного сервера')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес запущенного сервера')
+        parser.add_argument('--users', type=int, default=50, help='Количество участников')
+        parser.add_argument('--department', default='990-1', help='Код подразделения участников')
+        parser.add_argument('--prefix', default='load_', help='Префикс имен создаваемых пользователей')
+        parser.add_argument('--password', default='load-test-password', help='Пароль участников')
+        parser.add_argument('--test-id', type=int, help='Существующий тест (по умолчанию создается новый)')
+        parser.add_argument('--questions', type=int, default=20, help='Количество вопросов в зачете')
+        parser.add_argument('--time-limit', type=int, default=30, help='Лимит времени зачета в минутах')
+        parser.add_argument('--concurrency', type=int, help='Одновременных участников (по умолчанию все)')
+        parser.add_argument('--ramp-up', type=float, default=5, help='За сколько секунд стартуют все участники')
+        parser.add_argument('--think-time', type=float, default=0.5, help='Максимальная пауза перед ответом, сек')
+        parser.add_argument('--poll-every', type=int, default=5, help='Опрос check_time_remaining каждые N ответов')
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут запроса, сек')
+        parser.add_argument('--json', dest='json_path', help='Сохранить сводку в JSON-файл')
+        parser.add_argument('--cleanup', action='store_true', help='Удалить созданных пользователей и зачет после прогона')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        department = options['department']
+        group = department.split('-')[0].replace('У', '')
+
+        deleted = delete_seeded_users(prefix)
+        if deleted:
+            self.stdout.write(f'Удалены данные предыдущего прогона: {deleted} объектов')
+
+        if options['test_id']:
+            test = Test.objects.filter(id=options['test_id']).first()
+            if test is None:
+                raise CommandError(f'Тест {options["test_id"]} не найден')
+        else:
+            test = seed_test(f'{prefix}test', max(options['questions'], 1))
+
+        answer_key = test.get_answer_key()
+        question_ids = active_question_ids(answer_key)
+        if len(question_ids) < options['questions']:
+            raise CommandError(f'В тесте всего {len(question_ids)} вопросов')
+
+        # Создатель зачета - руководитель группы (с правами просмотра)
+        creator, *participants = seed_users(
+            [(f'{prefix}creator', f'{group}У')] +
+            [(f'{prefix}{index:05d}', department) for index in range(options['users'])],
+            options['password'],
+        )
+
+        question_order = random.sample(question_ids, options['questions'])
+        question_order.sort(key=lambda question_id: answer_key[question_id].number)
+        now = timezone.now()
+        quiz_session = QuizSession.objects.create(
+            creator=creator,
+            test=test,
+            question_count=options['questions'],
+            time_limit_minutes=options['time_limit'],
+            starts_at=now,
+            ends_at=now + timedelta(minutes=options['time_limit'] * 2),
+            question_order=question_order,
+        )
+        quiz_session.activate_manually()
+        enrolled = quiz_session.participants.count()
+        self.stdout.write(
+            f'Зачет {quiz_session.id}: тест "{test.name}", участников {enrolled}, '
+            f'вопросов {options["questions"]}, сервер {options["base_url"]}'
+        )
+
+        report, completed, duration = run_load(
+            options['base_url'],
+            [user.username for user in participants],
+            options['password'],
+            quiz_session.id,
+            test.id,
+            options['questions'],
+            concurrency=options['concurrency'],
+            ramp_up=options['ramp_up'],
+            think_time=options['think_time'],
+            poll_every=options['poll_every'],
+            timeout=options['timeout'],
+        )
+        summary = report.summary()
+
+        self.stdout.write(
+            f'\n{"Представление":<24}{"Запросов":>9}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}'
+            f'{"max, мс":>10}{"Ошибок":>8}{"Блокир.":>9}{"Таймаут":>9}'
+        )
+        for endpoint, row in summary.items():
+            self.stdout.write(
+                f'{endpoint:<24}{row["requests"]:>9}{row["p50_ms"]:>10}{row["p95_ms"]:>10}{row["p99_ms"]:>10}'
+                f'{row["max_ms"]:>10}{row["errors"]:>8}{row["lock_timeouts"]:>9}{row["timeouts"]:>9}'
+            )
+
+        total_requests = sum(row['requests'] for row in summary.values())
+        total_errors = sum(row['errors'] for row in summary.values())
+        style = self.style.SUCCESS if not total_errors and completed == len(participants) else self.style.WARNING
+        self.stdout.write(style(
+            f'\nЗавершили зачет: {completed} из {len(participants)}, запросов: {total_requests}, '
+            f'ошибок: {total_errors}, длительность: {duration:.1f} с, '
+            f'пропускная способность: {total_requests / duration if duration else 0:.1f} запросов/с'
+        ))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as output:
+                json.dump({
+                    'users': len(participants),
+                    'questions': options['questions'],
+                    'completed': completed,
+                    'duration_s': round(duration, 2),
+                    'endpoints': summary,
+                }, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Сводка сохранена в {options["json_path"]}')
+
+        if options['cleanup']:
+            quiz_session.delete()
+            delete_seeded_users(prefix)
+            if not options['test_id']:
+                test.delete()
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from tests.utils.import_jobs import STALE_JOB_MINUTES, process_import_jobs, requeue_stale_jobs
+
+class Command(BaseCommand):
+    help = 'Выполняет задания на импорт тестов из Excel (можно запускать как демон с --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Выполнить не больше указанного числа заданий')
+        parser.add_argument('--stale-minutes', type=int, default=STALE_JOB_MINUTES,
+                            help='Через сколько минут без отметки обработчика задание считается зависшим и возвращается в очередь')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, проверяя очередь с интервалом')
+        parser.add_argument('--interval', type=int, default=5, help='Интервал проверки в секундах для --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            requeued_count = requeue_stale_jobs(options['stale_minutes'])
+            if requeued_count:
+                self.stdout.write(self.style.WARNING(f'Возвращено в очередь зависших заданий: {requeued_count}'))
+
+            processed_count = process_import_jobs(limit=options['limit'])
+            if processed_count or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Выполнено заданий на импорт: {processed_count}')
+                )
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from tests.utils.retention import RETENTION_DAYS, purge_expired_attempts
+
+class Command(BaseCommand):
+    help = ('Удаляет тренировки и экспресс-тесты старше заданного срока у всех пользователей '
+            'пакетами (зачеты сохраняются); запускать по расписанию или с --loop')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=RETENTION_DAYS, help='Срок хранения попыток в днях')
+        parser.add_argument('--batch-size', type=int, default=500, help='Размер пакета удаления')
+        parser.add_argument('--archive', help='Дописывать удаляемые попытки в файл JSON Lines (.gz - со сжатием)')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не удалять')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, проверяя с интервалом')
+        parser.add_argument('--interval', type=int, default=3600, help='Интервал проверки в секундах для --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            report = purge_expired_attempts(
+                days=options['days'],
+                batch_size=options['batch_size'],
+                archive_path=options['archive'],
+                dry_run=options['dry_run'],
+            )
+            if report['found'] or not options['loop']:
+                self.write_report(report, options['dry_run'])
+
+            if not options['loop'] or options['dry_run']:
+                break
+            time.sleep(options['interval'])
+
+    def write_report(self, report, dry_run):
+        cutoff = report['cutoff'].strftime('%d.%m.%Y %H:%M')
+        if dry_run:
+            self.stdout.write(
+                f'Попыток старше {cutoff}: {report["found"]} у {report["users"]} пользователей (ничего не удалено)'
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено попыток старше {cutoff}: {report["deleted"]} у {report["users"]} пользователей, '
+            f'пакетов: {report["batches"]}'
+        ))
+        if report['archive'] and report['deleted']:
+            self.stdout.write(f'Удаленные попытки дописаны в {report["archive"]}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from tests.utils.best_results import rebuild_best_results
+
+class Command(BaseCommand):
+    help = 'Пересчитывает лучшие результаты пользователей по экспресс-тестам и зачетам'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='ID пользователя (можно указать несколько раз)')
+    
+    def handle(self, *args, **options):
+        rows = rebuild_best_results(options['user'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Лучших результатов: {rows}')
+        )
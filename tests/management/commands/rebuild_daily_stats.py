@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from tests.utils.daily_stats import rebuild_daily_stats
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневную статистику графиков по завершенным попыткам'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='ID пользователя (можно указать несколько раз)')
+    
+    def handle(self, *args, **options):
+        rows = rebuild_daily_stats(options['user'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Строк дневной статистики: {rows}')
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from tests.utils.quiz_stats import reconcile_quiz_stats
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики сессий зачетов по участникам и исправляет расхождения'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--session', type=int, action='append', help='ID сессии зачета (можно указать несколько раз)')
+    
+    def handle(self, *args, **options):
+        repaired = reconcile_quiz_stats(options['session'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счетчиков сессий: {repaired}')
+        )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from tests.benchmarks.dataset import delete_dataset, generate_dataset
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для замеров: пользователи в иерархии подразделений, '
+            'большие тесты, сотни тысяч попыток тренировок, экспресс-тестов и зачетов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench_', help='Префикс имен пользователей и тестов')
+        parser.add_argument('--users', type=int, default=3000, help='Количество пользователей')
+        parser.add_argument('--groups', type=int, default=5, help='Количество групп (35, 36, ...)')
+        parser.add_argument('--subgroups', type=int, default=4, help='Подгрупп в группе')
+        parser.add_argument('--subsubgroups', type=int, default=3, help='Подподгрупп в подгруппе')
+        parser.add_argument('--tests', type=int, default=4, help='Количество тестов')
+        parser.add_argument('--questions', type=int, default=2000, help='Вопросов в каждом тесте')
+        parser.add_argument('--attempts', type=int, default=200000, help='Всего завершенных попыток')
+        parser.add_argument('--quiz-sessions', type=int, default=4, help='Зачетов на группу')
+        parser.add_argument('--days', type=int, default=90, help='За сколько последних дней распределить попытки')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора случайных чисел')
+        parser.add_argument('--password', default='bench-password', help='Пароль всех пользователей')
+        parser.add_argument('--clear', action='store_true', help='Только удалить данные с указанным префиксом')
+
+    def handle(self, *args, **options):
+        deleted = delete_dataset(options['prefix'])
+        if deleted:
+            self.stdout.write(f'Удалены предыдущие данные: {deleted} объектов')
+        if options['clear']:
+            return
+
+        summary = generate_dataset(
+            prefix=options['prefix'],
+            users=options['users'],
+            groups=options['groups'],
+            subgroups=options['subgroups'],
+            subsubgroups=options['subsubgroups'],
+            tests=options['tests'],
+            questions=options['questions'],
+            attempts=options['attempts'],
+            quiz_sessions_per_group=options['quiz_sessions'],
+            days=options['days'],
+            seed=options['seed'],
+            password=options['password'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: ' + ', '.join(f'{key}={value}' for key, value in summary.items())
+        ))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0016_quizsession_manually_activated_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='answer_key_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время изменения вопросов'),
+        ),
+    ]
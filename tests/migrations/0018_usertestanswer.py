@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_answer_records(apps, schema_editor):
+    """Переносит ответы незавершенных попыток из JSON в построчную таблицу"""
+    UserTestProgress = apps.get_model('tests', 'UserTestProgress')
+    UserTestAnswer = apps.get_model('tests', 'UserTestAnswer')
+    Question = apps.get_model('tests', 'Question')
+
+    existing_questions = set(Question.objects.values_list('id', flat=True))
+    batch = []
+    for progress in UserTestProgress.objects.filter(completed=False).only('id', 'answers', 'updated_at').iterator():
+        for question_id, selected in (progress.answers or {}).items():
+            if not str(question_id).isdigit() or int(question_id) not in existing_questions:
+                continue
+            batch.append(UserTestAnswer(
+                progress_id=progress.id,
+                question_id=int(question_id),
+                selected=selected,
+                answered_at=progress.updated_at,
+            ))
+        if len(batch) >= 1000:
+            UserTestAnswer.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        UserTestAnswer.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0017_test_answer_key_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTestAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selected', models.JSONField(default=list, verbose_name='Выбранные варианты')),
+                ('answered_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время ответа')),
+                ('progress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_records', to='tests.usertestprogress')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tests.question')),
+            ],
+            options={
+                'verbose_name': 'Ответ на вопрос',
+                'verbose_name_plural': 'Ответы на вопросы',
+                'constraints': [models.UniqueConstraint(fields=('progress', 'question'), name='unique_answer_per_question')],
+            },
+        ),
+        migrations.RunPython(backfill_answer_records, migrations.RunPython.noop),
+    ]
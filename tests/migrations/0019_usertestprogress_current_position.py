@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+def backfill_positions(apps, schema_editor):
+    """Сохраняет порядок вопросов и позицию курсора для незавершенных попыток"""
+    UserTestProgress = apps.get_model('tests', 'UserTestProgress')
+    Question = apps.get_model('tests', 'Question')
+
+    for progress in UserTestProgress.objects.filter(completed=False).iterator():
+        sequence = progress.question_order
+        if not sequence:
+            questions = Question.objects.filter(test_id=progress.test_id)
+            if progress.start_question:
+                questions = questions.filter(question_number__gte=progress.start_question)
+            if progress.end_question:
+                questions = questions.filter(question_number__lte=progress.end_question)
+            sequence = list(questions.order_by('question_number').values_list('id', flat=True))
+
+        position = 0
+        if progress.current_question_id in sequence:
+            position = sequence.index(progress.current_question_id)
+
+        UserTestProgress.objects.filter(pk=progress.pk).update(
+            question_order=sequence,
+            current_position=position,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0018_usertestanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertestprogress',
+            name='current_position',
+            field=models.PositiveIntegerField(default=0, verbose_name='Позиция текущего вопроса'),
+        ),
+        migrations.AlterField(
+            model_name='usertestprogress',
+            name='question_order',
+            field=models.JSONField(blank=True, null=True, verbose_name='Порядок вопросов попытки'),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0019_usertestprogress_current_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertestprogress',
+            name='result_snapshot',
+            field=models.JSONField(blank=True, null=True, verbose_name='Снимок результата'),
+        ),
+    ]
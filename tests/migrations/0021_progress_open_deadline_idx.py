@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0020_usertestprogress_result_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usertestprogress',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['end_time'], name='progress_open_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_department_levels(apps, schema_editor):
+    """Заполняет нормализованные уровни кода подразделения у существующих профилей"""
+    UserProfile = apps.get_model('tests', 'UserProfile')
+
+    for profile in UserProfile.objects.exclude(department_code__isnull=True).exclude(department_code='').iterator():
+        code = profile.department_code.upper().strip()
+        parts = [part.replace('У', '').strip() for part in code.split('-')]
+        parts += [''] * (3 - len(parts))
+        UserProfile.objects.filter(pk=profile.pk).update(
+            department_group=parts[0],
+            department_subgroup=parts[1],
+            department_subsubgroup=parts[2],
+            has_view_rights='У' in code,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0021_progress_open_deadline_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='department_group',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50, verbose_name='Группа'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='department_subgroup',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50, verbose_name='Подгруппа'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='department_subsubgroup',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50, verbose_name='Подподгруппа'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='has_view_rights',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Права просмотра результатов'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['department_group', 'department_subgroup', 'department_subsubgroup'], name='profile_department_idx'),
+        ),
+        migrations.RunPython(backfill_department_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0022_userprofile_department_levels'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='audience_updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Время записи группы'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='quizzes_synced_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Время синхронизации зачетов'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0023_quiz_enrollment_watermarks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['starts_at'], name='quiz_pending_start_idx'),
+        ),
+    ]
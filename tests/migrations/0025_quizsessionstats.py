@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_quiz_session_stats(apps, schema_editor):
+    """Считает счетчики для уже существующих сессий зачетов"""
+    QuizSession = apps.get_model('tests', 'QuizSession')
+    QuizParticipant = apps.get_model('tests', 'QuizParticipant')
+    QuizSessionStats = apps.get_model('tests', 'QuizSessionStats')
+
+    completed = Q(completed_at__isnull=False)
+    rows = {
+        row['quiz_session_id']: row
+        for row in QuizParticipant.objects.values('quiz_session_id').annotate(
+            enrolled_count=Count('id'),
+            started_count=Count('id', filter=Q(progress__start_time__isnull=False)),
+            completed_count=Count('id', filter=completed),
+            score_sum=Sum('progress__score', filter=completed),
+            grade_fail_count=Count('id', filter=completed & Q(progress__score__lte=50)),
+            grade_pass_count=Count('id', filter=completed & Q(progress__score__gt=50, progress__score__lte=70)),
+            grade_good_count=Count('id', filter=completed & Q(progress__score__gt=70, progress__score__lte=90)),
+            grade_excellent_count=Count('id', filter=completed & Q(progress__score__gt=90)),
+        )
+    }
+    stats = []
+    for quiz_session_id in QuizSession.objects.values_list('id', flat=True):
+        row = rows.get(quiz_session_id, {})
+        stats.append(QuizSessionStats(
+            quiz_session_id=quiz_session_id,
+            enrolled_count=row.get('enrolled_count', 0),
+            started_count=row.get('started_count', 0),
+            completed_count=row.get('completed_count', 0),
+            score_sum=row.get('score_sum') or 0,
+            grade_fail_count=row.get('grade_fail_count', 0),
+            grade_pass_count=row.get('grade_pass_count', 0),
+            grade_good_count=row.get('grade_good_count', 0),
+            grade_excellent_count=row.get('grade_excellent_count', 0),
+        ))
+    QuizSessionStats.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0024_quiz_pending_start_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizSessionStats',
+            fields=[
+                ('quiz_session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='tests.quizsession')),
+                ('enrolled_count', models.PositiveIntegerField(default=0, verbose_name='Записано участников')),
+                ('started_count', models.PositiveIntegerField(default=0, verbose_name='Начали тестирование')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='Завершили тестирование')),
+                ('score_sum', models.FloatField(default=0, verbose_name='Сумма результатов')),
+                ('grade_fail_count', models.PositiveIntegerField(default=0, verbose_name='Неудовлетворительно (до 50%)')),
+                ('grade_pass_count', models.PositiveIntegerField(default=0, verbose_name='Удовлетворительно (до 70%)')),
+                ('grade_good_count', models.PositiveIntegerField(default=0, verbose_name='Хорошо (до 90%)')),
+                ('grade_excellent_count', models.PositiveIntegerField(default=0, verbose_name='Отлично')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Счетчики зачета',
+                'verbose_name_plural': 'Счетчики зачетов',
+            },
+        ),
+        migrations.RunPython(backfill_quiz_session_stats, migrations.RunPython.noop),
+    ]
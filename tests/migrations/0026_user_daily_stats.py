@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Собирает дневную статистику по уже завершенным попыткам"""
+    UserTestProgress = apps.get_model('tests', 'UserTestProgress')
+    UserDailyStats = apps.get_model('tests', 'UserDailyStats')
+
+    rows = UserTestProgress.objects.filter(
+        completed=True, score__isnull=False, completed_at__isnull=False
+    ).annotate(
+        day=TruncDate('completed_at', tzinfo=timezone.get_default_timezone())
+    ).values('user_id', 'test_id', 'test_type', 'day').annotate(
+        attempts_count=Count('id'),
+        score_sum=Sum('score'),
+        score_min=Min('score'),
+        score_max=Max('score'),
+        grade_fail_count=Count('id', filter=Q(score__lte=50)),
+        grade_pass_count=Count('id', filter=Q(score__gt=50, score__lte=70)),
+        grade_good_count=Count('id', filter=Q(score__gt=70, score__lte=90)),
+        grade_excellent_count=Count('id', filter=Q(score__gt=90)),
+    ).order_by()
+    UserDailyStats.objects.bulk_create([UserDailyStats(**row) for row in rows], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0025_quizsessionstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_type', models.CharField(max_length=10, verbose_name='Тип теста')),
+                ('day', models.DateField(verbose_name='День')),
+                ('attempts_count', models.PositiveIntegerField(default=0, verbose_name='Завершено попыток')),
+                ('score_sum', models.FloatField(default=0, verbose_name='Сумма результатов')),
+                ('score_min', models.FloatField(blank=True, null=True, verbose_name='Худший результат')),
+                ('score_max', models.FloatField(blank=True, null=True, verbose_name='Лучший результат')),
+                ('grade_fail_count', models.PositiveIntegerField(default=0, verbose_name='Неудовлетворительно (до 50%)')),
+                ('grade_pass_count', models.PositiveIntegerField(default=0, verbose_name='Удовлетворительно (до 70%)')),
+                ('grade_good_count', models.PositiveIntegerField(default=0, verbose_name='Хорошо (до 90%)')),
+                ('grade_excellent_count', models.PositiveIntegerField(default=0, verbose_name='Отлично')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tests.test')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Дневная статистика',
+                'verbose_name_plural': 'Дневная статистика',
+                'indexes': [models.Index(fields=['user', 'day'], name='daily_stats_user_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'test', 'test_type', 'day'), name='unique_daily_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
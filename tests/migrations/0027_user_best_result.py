@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def backfill_best_results(apps, schema_editor):
+    """Выбирает лучшие результаты по уже завершенным экспресс-тестам и зачетам"""
+    UserTestProgress = apps.get_model('tests', 'UserTestProgress')
+    UserBestResult = apps.get_model('tests', 'UserBestResult')
+
+    rows = UserTestProgress.objects.filter(
+        completed=True, score__isnull=False, completed_at__isnull=False, test_type__in=['express', 'quiz']
+    ).annotate(
+        rank=Window(RowNumber(), partition_by=[F('user_id'), F('test_id'), F('test_type')],
+                    order_by=[F('score').desc(), F('completed_at').desc()])
+    ).filter(rank=1).values_list('user_id', 'test_id', 'test_type', 'id', 'score', 'completed_at')
+    UserBestResult.objects.bulk_create([
+        UserBestResult(user_id=user_id, test_id=test_id, test_type=test_type,
+                       progress_id=progress_id, score=score, completed_at=completed_at)
+        for user_id, test_id, test_type, progress_id, score, completed_at in rows
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0026_user_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_type', models.CharField(max_length=10, verbose_name='Тип теста')),
+                ('score', models.FloatField(verbose_name='Результат')),
+                ('completed_at', models.DateTimeField(verbose_name='Дата прохождения')),
+                ('progress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tests.usertestprogress', verbose_name='Попытка')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tests.test')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_results', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Лучший результат',
+                'verbose_name_plural': 'Лучшие результаты',
+                'indexes': [models.Index(fields=['test_type', 'test', 'completed_at'], name='best_result_test_idx'), models.Index(fields=['test_type', 'completed_at'], name='best_result_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'test', 'test_type'), name='unique_best_result')],
+            },
+        ),
+        migrations.RunPython(backfill_best_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0027_user_best_result'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/', verbose_name='Файл')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Имя загруженного файла')),
+                ('test_name', models.CharField(blank=True, max_length=200, verbose_name='Название теста')),
+                ('dry_run', models.BooleanField(default=False, verbose_name='Только проверка')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='Строк в файле')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('questions_count', models.PositiveIntegerField(default=0, verbose_name='Вопросов')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Ошибки')),
+                ('warnings', models.JSONField(blank=True, default=list, verbose_name='Предупреждения')),
+                ('message', models.TextField(blank=True, verbose_name='Итог')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+                ('test', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tests.test')),
+            ],
+            options={
+                'verbose_name': 'Импорт теста',
+                'verbose_name_plural': 'Импорт тестов',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='import_job_queue_idx')],
+            },
+        ),
+    ]
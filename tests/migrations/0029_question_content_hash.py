@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:28
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def question_content_hash(question_text, correct_answer, document_reference, answer_options):
+    # Копия tests.models.question_content_hash на момент миграции
+    options = {str(number): str(text) for number, text in (answer_options or {}).items()}
+    content = json.dumps([question_text, correct_answer, document_reference, options],
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def backfill_content_hash(apps, schema_editor):
+    """Считает хэш содержимого существующих вопросов"""
+    Question = apps.get_model('tests', 'Question')
+
+    batch = []
+    for question in Question.objects.only(
+        'id', 'question_text', 'correct_answer', 'document_reference', 'answer_options'
+    ).iterator(chunk_size=2000):
+        question.content_hash = question_content_hash(
+            question.question_text, question.correct_answer, question.document_reference, question.answer_options
+        )
+        batch.append(question)
+        if len(batch) >= 2000:
+            Question.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    Question.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0028_test_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хэш содержимого'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='retired_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Выведен из теста'),
+        ),
+        migrations.AddField(
+            model_name='testimportjob',
+            name='changes',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Изменения вопросов'),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0029_question_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testimportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
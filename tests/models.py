@@ -1,18 +1,42 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+import hashlib
 import json
 from django.utils import timezone
 import re
+import uuid
+
+
+def generate_attempt_id(user_id, test_id):
+    """Уникальный идентификатор попытки: читаемый префикс и 64 случайных бита,
+    поэтому попытки, созданные в одну секунду (в том числе пакетом), не конфликтуют"""
+    timestamp = timezone.now().strftime("%Y%m%d%H%M%S")
+    return f"{user_id}_{test_id}_{timestamp}_{uuid.uuid4().hex[:16]}"
 
 class Test(models.Model):
     name = models.CharField(max_length=255, verbose_name="Название теста")
     description = models.TextField(blank=True, verbose_name="Описание теста")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Метка изменения вопросов - по ней перестраивается кэш ключей ответов
+    answer_key_updated_at = models.DateTimeField(default=timezone.now, verbose_name="Время изменения вопросов")
     
     def __str__(self):
         return self.name
+    
+    def get_answer_key(self):
+        """Возвращает ключ ответов теста: id вопроса -> AnswerKey"""
+        from .utils.answer_keys import get_answer_key
+        return get_answer_key(self)
+
+def question_content_hash(question_text, correct_answer, document_reference, answer_options):
+    """Хэш содержимого вопроса - по нему повторный импорт находит измененные вопросы"""
+    options = {str(number): str(text) for number, text in (answer_options or {}).items()}
+    content = json.dumps([question_text, correct_answer, document_reference, options],
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
 
 class Question(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='questions')
@@ -21,12 +45,36 @@ class Question(models.Model):
     correct_answer = models.CharField(max_length=50, verbose_name="Правильные ответы")
     document_reference = models.CharField(max_length=255, verbose_name="Ссылка на документ")
     answer_options = models.JSONField(verbose_name="Варианты ответов")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Хэш содержимого")
+    # Вопрос, которого нет в новой версии файла, не удаляется (на него ссылаются
+    # старые попытки), а выводится из теста и больше не выдается
+    retired_at = models.DateTimeField(null=True, blank=True, verbose_name="Выведен из теста")
     
     class Meta:
         ordering = ['question_number']
     
     def __str__(self):
         return f"Вопрос {self.question_number}: {self.question_text[:50]}..."
+    
+    def compute_content_hash(self):
+        return question_content_hash(self.question_text, self.correct_answer,
+                                     self.document_reference, self.answer_options)
+    
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content_hash' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'content_hash']
+        super().save(*args, **kwargs)
+
+def split_department_code(code):
+    """Разбивает код подразделения на нормализованные уровни без 'У'.
+    Возвращает (группа, подгруппа, подподгруппа, есть_права_просмотра)."""
+    code = (code or '').upper().strip()
+    parts = [part.replace('У', '').strip() for part in code.split('-')] if code else []
+    parts += [''] * (3 - len(parts))
+    return parts[0], parts[1], parts[2], 'У' in code
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -58,12 +106,38 @@ class UserProfile(models.Model):
         verbose_name="Код подразделения",
         help_text="Формат: Группа-Подгруппа-Подподгруппа (например: 35-1-1). Добавьте 'У' для прав просмотра"
     )
+    # Нормализованные уровни кода подразделения (без 'У') - заполняются в save()
+    # и используются в запросах иерархии вместо регулярных выражений
+    department_group = models.CharField(max_length=50, blank=True, default='', editable=False, verbose_name="Группа")
+    department_subgroup = models.CharField(max_length=50, blank=True, default='', editable=False, verbose_name="Подгруппа")
+    department_subsubgroup = models.CharField(max_length=50, blank=True, default='', editable=False, verbose_name="Подподгруппа")
+    has_view_rights = models.BooleanField(default=False, editable=False, verbose_name="Права просмотра результатов")
+    # Водяной знак синхронизации зачетов: зачеты группы, чей состав менялся
+    # позже этого момента, проверяются на главной странице
+    quizzes_synced_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Время синхронизации зачетов")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Профиль {self.user.username}"
     
+    def save(self, *args, **kwargs):
+        # Нормализованные поля меняются только здесь, поэтому до пересчета
+        # в них лежит группа из базы
+        previous_group = self.department_group
+        (self.department_group, self.department_subgroup,
+         self.department_subsubgroup, self.has_view_rights) = split_department_code(self.department_code)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'department_code' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {
+                'department_group', 'department_subgroup', 'department_subsubgroup', 'has_view_rights'
+            }
+        super().save(*args, **kwargs)
+        
+        # Сменилась группа (в том числе при регистрации) - записываем в ее зачеты
+        if self.department_group and self.department_group != previous_group:
+            self.add_to_group_quizzes()
+    
     def get_full_name(self):
         """Возвращает полное ФИО пользователя"""
         parts = [self.last_name, self.first_name, self.patronymic]
@@ -108,107 +182,49 @@ class UserProfile(models.Model):
     
     def can_view_other_results(self):
         """Проверяет, имеет ли пользователь права на просмотр чужих результатов"""
-        parsed = self.parse_department_code()
-        return parsed and parsed['has_view_rights']
+        return bool(self.department_code) and self.has_view_rights
+    
+    def get_visibility_lookup(self):
+        """Условия на поля UserProfile для профилей, чьи результаты видит пользователь,
+        или None, если прав просмотра нет"""
+        if not self.can_view_other_results() or not self.department_group:
+            return None
+        
+        # Уровень доступа определяется самым глубоким заполненным уровнем кода:
+        # 35У - вся группа, 35-1У - подгруппа, 35-1-1У - подподгруппа.
+        # Поиск идет по индексу profile_department_idx (левый префикс).
+        lookup = {'department_group': self.department_group}
+        if self.department_subgroup:
+            lookup['department_subgroup'] = self.department_subgroup
+            if self.department_subsubgroup:
+                lookup['department_subsubgroup'] = self.department_subsubgroup
+        return lookup
     
     def get_viewable_users_query(self):
         """Возвращает QuerySet пользователей, чьи результаты может просматривать текущий пользователь"""
-        from django.contrib.auth.models import User
-        from django.db.models import Q
-        
-        parsed = self.parse_department_code()
-        if not parsed or not parsed['has_view_rights']:
+        lookup = self.get_visibility_lookup()
+        if lookup is None:
             return User.objects.none()
         
-        # Базовый запрос
-        query = Q(profile__department_code__isnull=False)
-        
-        # Определяем уровень доступа на основе структуры кода
-        if parsed['subsubgroup']:  # Формат: 35-1-1У
-            # Может видеть всех в своей подподгруппе
-            base_pattern = f"{parsed['group']}-{parsed['subgroup']}-{parsed['subsubgroup'].replace('У', '')}"
-            query &= Q(profile__department_code__iregex=rf'^{base_pattern}[\wУ]*$')
-        
-        elif parsed['subgroup']:  # Формат: 35-1У
-            # Может видеть всех в своей подгруппе (включая подподгруппы)
-            base_pattern = f"{parsed['group']}-{parsed['subgroup'].replace('У', '')}"
-            query &= Q(profile__department_code__iregex=rf'^{base_pattern}(?:[\wУ]*$|-\w+[\wУ]*$)')
-        
-        elif parsed['group']:  # Формат: 35У
-            # Может видеть всех в своей группе
-            base_pattern = f"{parsed['group'].replace('У', '')}"
-            query &= Q(profile__department_code__iregex=rf'^{base_pattern}(?:[\wУ]*$|-\w+(?:[\wУ]*$|-\w+[\wУ]*$))')
-        
-        # НЕ исключаем самого себя из результатов - пользователь должен видеть свои результаты
-        return User.objects.filter(query)
+        # НЕ исключаем самого себя - пользователь должен видеть свои результаты
+        return User.objects.filter(**{f'profile__{field}': value for field, value in lookup.items()})
     
     def get_group_users(self):
-        """Возвращает всех пользователей в группе текущего пользователя - ОПТИМИЗИРОВАННАЯ ВЕРСИЯ"""
-        from django.contrib.auth.models import User
-        from django.db.models import Q
-        
-        if not self.department_code:
-            return User.objects.filter(id=self.user.id)
+        """Возвращает всех пользователей в группе текущего пользователя (группа без учета 'У')"""
+        if not self.department_code or not self.department_group:
+            return User.objects.filter(id=self.user_id)
         
-        user_code = self.department_code.upper().strip()
-        #print(f"Поиск группы для кода: {user_code}")
-        
-        # Нормализуем код пользователя (убираем У)
-        user_base_code = user_code.replace('У', '').split('-')[0]
-        #print(f"Базовая группа (нормализованная): {user_base_code}")
-        
-        # Создаем запрос для поиска пользователей с той же базовой группой (игнорируя У)
-        query = Q(profile__department_code__iregex=rf'^{user_base_code}[\wУ-]*')
-        
-        users = User.objects.filter(query).distinct()
-        
-        #print(f"Найдено пользователей: {users.count()}")
-        #print("Найденные пользователи:")
-        #for i, user in enumerate(users[:10]):
-        #    user_code_found = user.profile.department_code if hasattr(user, 'profile') else "Нет профиля"
-        #    print(f"  {i+1}. {user.username}: {user_code_found}")
-        
-        return users
+        return User.objects.filter(profile__department_group=self.department_group)
     
     def add_to_group_quizzes(self):
         """Автоматически добавляет пользователя в активные зачеты его группы"""
-        from .models import QuizSession, QuizParticipant
-        from django.utils import timezone
-        
-        if not self.department_code:
-            return 0
-            
-        now = timezone.now()
-        added_count = 0
+        from .utils.quiz_enrollment import enroll_user_in_group_quizzes
         
         try:
-            # Получаем пользователей группы
-            group_users = self.get_group_users()
-            
-            # Находим активные зачеты, созданные руководителями из этой группы
-            active_quizzes = QuizSession.objects.filter(
-                ends_at__gte=now,
-                is_active=True
-            ).select_related('creator', 'test')
-            
-            # Фильтруем зачеты по создателю из той же группы
-            for quiz in active_quizzes:
-                if quiz.creator in group_users:
-                    # Проверяем, не добавлен ли уже пользователь
-                    if not QuizParticipant.objects.filter(
-                        quiz_session=quiz, 
-                        user=self.user
-                    ).exists():
-                        QuizParticipant.objects.create(
-                            quiz_session=quiz,
-                            user=self.user
-                        )
-                        added_count += 1
-                        
+            return enroll_user_in_group_quizzes(self.user)
         except Exception as e:
             print(f"Ошибка при автоматическом добавлении в зачеты: {e}")
-            
-        return added_count
+            return 0
     
     def get_department_hierarchy(self):
         """Возвращает иерархию подразделения пользователя"""
@@ -229,6 +245,12 @@ class UserProfile(models.Model):
     class Meta:
         verbose_name = "Профиль пользователя"
         verbose_name_plural = "Профили пользователей"
+        indexes = [
+            models.Index(
+                fields=['department_group', 'department_subgroup', 'department_subsubgroup'],
+                name='profile_department_idx'
+            ),
+        ]
 
 
 class UserTestProgress(models.Model):
@@ -256,12 +278,14 @@ class UserTestProgress(models.Model):
     total_questions_count = models.IntegerField(null=True, blank=True, verbose_name="Общее количество вопросов")
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Время завершения теста")
     
-     # Новое поле для хранения порядка вопросов в экспресс-тесте
+    # Неизменяемая последовательность id вопросов попытки (для всех типов тестов)
     question_order = models.JSONField(
         null=True, 
         blank=True, 
-        verbose_name="Порядок вопросов в экспресс-тесте"
+        verbose_name="Порядок вопросов попытки"
     )
+    # Позиция текущего вопроса в question_order (с нуля)
+    current_position = models.PositiveIntegerField(default=0, verbose_name="Позиция текущего вопроса")
 
     # Добавьте связь с QuizSession
     quiz_session = models.ForeignKey(
@@ -272,12 +296,19 @@ class UserTestProgress(models.Model):
         related_name='progress_records'
     )
 
+    # Неизменяемый снимок результата, записывается при завершении попытки
+    result_snapshot = models.JSONField(null=True, blank=True, verbose_name="Снимок результата")
+    
     # Уникальный идентификатор попытки
     attempt_id = models.CharField(max_length=100, unique=True, blank=True, null=True)
     
     class Meta:
         # Убираем unique_together, чтобы разрешить несколько попыток для одного теста
         ordering = ['-created_at']
+        indexes = [
+            # Поиск незавершенных попыток с истекшим временем (expire_quiz_attempts)
+            models.Index(fields=['end_time'], condition=models.Q(completed=False), name='progress_open_deadline_idx'),
+        ]
     
     def __str__(self):
         type_str = "Экспресс" if self.test_type == 'express' else "Обычный"
@@ -287,45 +318,95 @@ class UserTestProgress(models.Model):
     def save(self, *args, **kwargs):
         # Генерируем уникальный attempt_id при создании
         if not self.attempt_id:
-            timestamp = timezone.now().strftime("%Y%m%d%H%M%S")
-            self.attempt_id = f"{self.user.id}_{self.test.id}_{timestamp}"
-        
-        # При завершении теста вычисляем результат
-        if self.completed and not self.completed_at:
-            self.completed_at = timezone.now()
+            self.attempt_id = generate_attempt_id(self.user_id, self.test_id)
+        
+        # При завершении теста фиксируем ответы и вычисляем результат
+        completing = self.completed and not self.completed_at
+        if completing:
+            # Попытка, закрытая после дедлайна, считается завершенной в дедлайн
+            now = timezone.now()
+            self.completed_at = min(now, self.end_time) if self.end_time else now
+            self.answers = self._load_answer_records()
             self.calculate_score()
         super().save(*args, **kwargs)
+        
+        # Завершенная попытка попадает в дневную статистику и лучшие результаты
+        if completing:
+            from .utils.best_results import record_best_results
+            from .utils.daily_stats import record_daily_results
+            record_daily_results([self])
+            record_best_results([self])
+        
+        # Попытка зачета: отмечаем участника и обновляем счетчики сессии
+        if completing and self.quiz_session_id:
+            from .utils.quiz_stats import complete_quiz_attempt
+            complete_quiz_attempt(self)
+    
+    def get_answers(self):
+        """Возвращает ответы попытки в виде {str(id вопроса): [варианты]}
+        
+        Пока попытка идет, ответы хранятся построчно в UserTestAnswer, а поле
+        answers - снимок, который записывается один раз при завершении.
+        """
+        if self.completed and self.answers:
+            return self.answers
+        return self._load_answer_records()
+    
+    def _load_answer_records(self):
+        if not self.pk:
+            return dict(self.answers or {})
+        return {
+            str(question_id): selected
+            for question_id, selected in self.answer_records.values_list('question_id', 'selected')
+        }
+    
+    def record_answer(self, question_id, selected):
+        """Сохраняет ответ на вопрос одной строкой (INSERT ... ON CONFLICT UPDATE)"""
+        UserTestAnswer.objects.bulk_create(
+            [UserTestAnswer(progress=self, question_id=question_id, selected=selected, answered_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=['progress', 'question'],
+            update_fields=['selected', 'answered_at'],
+        )
+    
+    def clear_answers(self):
+        """Удаляет все ответы попытки"""
+        self.answer_records.all().delete()
+        self.answers = {}
+    
+    def get_question_ids(self):
+        """Возвращает id вопросов попытки в порядке прохождения"""
+        from .utils.answer_keys import attempt_question_ids
+        return attempt_question_ids(self)
+    
+    def get_question_sequence(self):
+        """Возвращает последовательность id вопросов, по которой идет курсор попытки"""
+        if not self.question_order:
+            # Старые попытки без сохраненного порядка - фиксируем его один раз
+            self.question_order = self.get_question_ids()
+            if self.pk:
+                UserTestProgress.objects.filter(pk=self.pk).update(question_order=self.question_order)
+        return self.question_order
+    
+    def move_to_position(self, position):
+        """Переводит курсор на позицию и сохраняет только его"""
+        sequence = self.get_question_sequence()
+        self.current_position = position
+        self.current_question_id = sequence[position]
+        self.save(update_fields=['current_position', 'current_question', 'updated_at'])
     
     def calculate_score(self):
-        """Вычисляет результат теста"""
-        if not self.answers:
-            self.score = 0
-            self.correct_answers_count = 0
-            self.total_questions_count = 0
-            return
-        
-        # Получаем вопросы теста с учетом диапазона
-        questions_query = self.test.questions.all()
+        """Вычисляет результат теста по ключу ответов и сохраняет снимок результата"""
+        from .utils.answer_keys import attempt_question_ids, build_result_snapshot
         
-        if self.start_question:
-            questions_query = questions_query.filter(question_number__gte=self.start_question)
+        key = self.test.get_answer_key()
+        question_ids = attempt_question_ids(self, key)
         
-        if self.end_question:
-            questions_query = questions_query.filter(question_number__lte=self.end_question)
-        
-        questions = list(questions_query)
-        self.total_questions_count = len(questions)
-        
-        # Считаем правильные ответы
-        correct_count = 0
-        for question in questions:
-            user_answer = self.answers.get(str(question.id), [])
-            correct_answers = [int(ans.strip()) for ans in question.correct_answer.split(',')]
-            if set(user_answer) == set(correct_answers):
-                correct_count += 1
-        
-        self.correct_answers_count = correct_count
-        self.score = (correct_count / self.total_questions_count) * 100 if self.total_questions_count > 0 else 0
+        snapshot = build_result_snapshot(key, question_ids, self.answers)
+        self.result_snapshot = snapshot
+        self.correct_answers_count = snapshot['correct_count']
+        self.total_questions_count = snapshot['total']
+        self.score = (snapshot['correct_count'] / snapshot['total']) * 100 if snapshot['total'] > 0 else 0
         
     # Время теста
     def is_time_expired(self):
@@ -343,6 +424,23 @@ class UserTestProgress(models.Model):
             return 0
         return (self.end_time - now).total_seconds()
 
+class UserTestAnswer(models.Model):
+    """Ответ пользователя на один вопрос попытки"""
+    progress = models.ForeignKey(UserTestProgress, on_delete=models.CASCADE, related_name='answer_records')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    selected = models.JSONField(default=list, verbose_name="Выбранные варианты")
+    answered_at = models.DateTimeField(default=timezone.now, verbose_name="Время ответа")
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['progress', 'question'], name='unique_answer_per_question'),
+        ]
+        verbose_name = "Ответ на вопрос"
+        verbose_name_plural = "Ответы на вопросы"
+    
+    def __str__(self):
+        return f"{self.progress_id} - {self.question_id}: {self.selected}"
+
 # Сигналы для автоматического создания профиля при создании пользователя
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -356,6 +454,18 @@ def create_user_profile(sender, instance, created, **kwargs):
             profile.last_name = instance.last_name
         profile.save()
 
+# Любое изменение вопросов теста сбрасывает кэш ключей ответов
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_answer_key(sender, instance, **kwargs):
+    Test.objects.filter(id=instance.test_id).update(answer_key_updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Test)
+def forget_deleted_test_answer_key(sender, instance, **kwargs):
+    from .utils.answer_keys import forget_answer_key
+    forget_answer_key(instance.id)
+
 class QuizSession(models.Model):
     """Сессия зачета для группы"""
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_quizzes')
@@ -371,10 +481,25 @@ class QuizSession(models.Model):
     
     # Поля для хранения информации о вопросах
     question_order = models.JSONField(verbose_name="Порядок вопросов")
+    # Момент последней записи группы в зачет (создание, активация) -
+    # сравнивается с UserProfile.quizzes_synced_at
+    audience_updated_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Время записи группы")
+    
+    @staticmethod
+    def started_filter(now=None):
+        """Условие для QuerySet: зачет начался (активирован или наступило время начала)"""
+        return models.Q(is_active=True) | models.Q(starts_at__lte=now or timezone.now())
+    
+    @property
+    def is_started(self):
+        """Начался ли зачет. Вычисляется без записи в базу: флаг is_active
+        выставляет планировщик (activate_quiz_sessions) или создатель вручную,
+        а до срабатывания планировщика достаточно наступившего starts_at."""
+        return self.is_active or self.manually_activated or timezone.now() >= self.starts_at
     
     def is_available_for_user(self, user):
         """Проверяет, доступен ли зачет для пользователя"""
-        if not self.is_active:
+        if not self.is_started:
             return False
         
         now = timezone.now()
@@ -395,31 +520,37 @@ class QuizSession(models.Model):
         ordering = ['-created_at']
         verbose_name = "Сессия зачета"
         verbose_name_plural = "Сессии зачетов"
+        indexes = [
+            # Поиск зачетов, ожидающих активации (activate_quiz_sessions)
+            models.Index(fields=['starts_at'], condition=models.Q(is_active=False), name='quiz_pending_start_idx'),
+        ]
     
     def __str__(self):
         return f"Зачет {self.test.name} от {self.creator.username}"
     
     def check_activation(self):
-        """Проверяет и обновляет статус активации зачета"""
-        now = timezone.now()
-        
-        # Если зачет уже активирован, ничего не делаем
-        if self.is_active:
-            return True
-            
-        # Если время начала наступило, активируем автоматически
-        if now >= self.starts_at:
-            self.is_active = True
-            self.save()
-            return True
-            
-        return False
+        """Проверяет, начался ли зачет (только чтение - активацию по расписанию
+        выполняет команда activate_quiz_sessions)"""
+        return self.is_started
     
     def activate_manually(self):
         """Принудительная активация зачета"""
         self.is_active = True
         self.manually_activated = True
+        self.audience_updated_at = timezone.now()
         self.save()
+        self.enroll_group()
+        self.provision_attempts()
+    
+    def provision_attempts(self):
+        """Заранее создает ожидающие попытки всем участникам зачета"""
+        from .utils.quiz_attempts import provision_quiz_attempts
+        return provision_quiz_attempts(self)
+    
+    def enroll_group(self):
+        """Дописывает в зачет пользователей группы создателя, которых в нем еще нет"""
+        from .utils.quiz_enrollment import enroll_group
+        return enroll_group(self)
 
 class QuizParticipant(models.Model):
     """Участник зачета"""
@@ -440,5 +571,158 @@ class QuizParticipant(models.Model):
     def update_completion_status(self):
         """Обновляет статус завершения на основе прогресса теста"""
         if self.progress and self.progress.completed and not self.completed_at:
+            from .utils.quiz_stats import complete_quiz_attempt
+            complete_quiz_attempt(self.progress)
             self.completed_at = self.progress.completed_at
-            self.save()
\ No newline at end of file
+
+
+class QuizSessionStats(models.Model):
+    """Счетчики сессии зачета. Обновляются атомарно при записи участников,
+    начале и завершении попыток; расхождения исправляет команда reconcile_quiz_stats"""
+    quiz_session = models.OneToOneField(QuizSession, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    enrolled_count = models.PositiveIntegerField(default=0, verbose_name="Записано участников")
+    started_count = models.PositiveIntegerField(default=0, verbose_name="Начали тестирование")
+    completed_count = models.PositiveIntegerField(default=0, verbose_name="Завершили тестирование")
+    score_sum = models.FloatField(default=0, verbose_name="Сумма результатов")
+    # Распределение оценок (границы те же, что в шаблоне результатов)
+    grade_fail_count = models.PositiveIntegerField(default=0, verbose_name="Неудовлетворительно (до 50%)")
+    grade_pass_count = models.PositiveIntegerField(default=0, verbose_name="Удовлетворительно (до 70%)")
+    grade_good_count = models.PositiveIntegerField(default=0, verbose_name="Хорошо (до 90%)")
+    grade_excellent_count = models.PositiveIntegerField(default=0, verbose_name="Отлично")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Счетчики зачета"
+        verbose_name_plural = "Счетчики зачетов"
+    
+    def __str__(self):
+        return f"Счетчики: {self.quiz_session}"
+    
+    @property
+    def average_score(self):
+        """Средний результат завершивших"""
+        return self.score_sum / self.completed_count if self.completed_count else 0
+
+
+@receiver(post_save, sender=QuizSession)
+def create_quiz_session_stats(sender, instance, created, **kwargs):
+    if created:
+        QuizSessionStats.objects.get_or_create(quiz_session=instance)
+
+class UserDailyStats(models.Model):
+    """Дневная сводка результатов пользователя по тесту и типу теста (день по
+    московскому времени). Обновляется при завершении попытки, пересчитывается
+    командой rebuild_daily_stats; графики статистики читают только ее."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='+')
+    test_type = models.CharField(max_length=10, verbose_name="Тип теста")
+    day = models.DateField(verbose_name="День")
+    attempts_count = models.PositiveIntegerField(default=0, verbose_name="Завершено попыток")
+    score_sum = models.FloatField(default=0, verbose_name="Сумма результатов")
+    score_min = models.FloatField(null=True, blank=True, verbose_name="Худший результат")
+    score_max = models.FloatField(null=True, blank=True, verbose_name="Лучший результат")
+    # Распределение оценок (границы те же, что у счетчиков зачета)
+    grade_fail_count = models.PositiveIntegerField(default=0, verbose_name="Неудовлетворительно (до 50%)")
+    grade_pass_count = models.PositiveIntegerField(default=0, verbose_name="Удовлетворительно (до 70%)")
+    grade_good_count = models.PositiveIntegerField(default=0, verbose_name="Хорошо (до 90%)")
+    grade_excellent_count = models.PositiveIntegerField(default=0, verbose_name="Отлично")
+    
+    class Meta:
+        verbose_name = "Дневная статистика"
+        verbose_name_plural = "Дневная статистика"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'test', 'test_type', 'day'], name='unique_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='daily_stats_user_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.test.name} - {self.test_type} - {self.day}"
+
+
+class UserBestResult(models.Model):
+    """Лучший результат пользователя по тесту для экспресс-тестов и зачетов.
+    Обновляется при завершении попытки, пересчитывается командой
+    rebuild_best_results; страница результатов группы читает только ее."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='best_results')
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='+')
+    test_type = models.CharField(max_length=10, verbose_name="Тип теста")
+    progress = models.ForeignKey(UserTestProgress, on_delete=models.CASCADE, related_name='+', verbose_name="Попытка")
+    score = models.FloatField(verbose_name="Результат")
+    completed_at = models.DateTimeField(verbose_name="Дата прохождения")
+    
+    class Meta:
+        verbose_name = "Лучший результат"
+        verbose_name_plural = "Лучшие результаты"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'test', 'test_type'], name='unique_best_result'),
+        ]
+        indexes = [
+            # Фильтры страницы результатов группы: тип, тест, период
+            models.Index(fields=['test_type', 'test', 'completed_at'], name='best_result_test_idx'),
+            models.Index(fields=['test_type', 'completed_at'], name='best_result_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.test.name} - {self.test_type} - {self.score}"
+
+
+class TestImportJob(models.Model):
+    """Задание на импорт теста из Excel. Создается при загрузке файла,
+    выполняется командой process_import_jobs вне веб-запроса."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/', verbose_name="Файл")
+    file_name = models.CharField(max_length=255, verbose_name="Имя загруженного файла")
+    test_name = models.CharField(max_length=200, blank=True, verbose_name="Название теста")
+    dry_run = models.BooleanField(default=False, verbose_name="Только проверка")
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING, verbose_name="Статус")
+    # Ход выполнения: строки листа прочитано / всего (по размеру листа)
+    total_rows = models.PositiveIntegerField(default=0, verbose_name="Строк в файле")
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name="Обработано строк")
+    questions_count = models.PositiveIntegerField(default=0, verbose_name="Вопросов")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Ошибки")
+    warnings = models.JSONField(default=list, blank=True, verbose_name="Предупреждения")
+    # Номера добавленных, измененных и выведенных вопросов (QuestionChanges.as_dict)
+    changes = models.JSONField(default=dict, blank=True, verbose_name="Изменения вопросов")
+    message = models.TextField(blank=True, verbose_name="Итог")
+    test = models.ForeignKey(Test, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Обновляется обработчиком по ходу чтения файла; по нему находятся зависшие задания
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Импорт теста"
+        verbose_name_plural = "Импорт тестов"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='import_job_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.file_name} - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+    
+    @property
+    def percent(self):
+        """Процент выполнения для индикатора"""
+        if self.is_finished:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 99)
@@ -1,3 +1,954 @@
-from django.test import TestCase
+"""
+Бюджеты SQL-запросов представлений.
+
+Каждый URL из tests/urls.py вызывается на небольшом синтетическом наборе
+данных (tests/benchmarks/dataset.py) от имени подходящего пользователя.
+Проверяется, что количество запросов и их суммарное время не превышают
+бюджета, а после увеличения объема данных количество запросов не растет -
+так ловятся запросы в цикле по строкам (N+1).
+
+Новый URL без записи в QUERY_BUDGETS роняет test_every_url_has_budget.
+
+Ниже - проверки поведения сводных таблиц и служебных механизмов на маленьком
+тесте из десяти вопросов (ScenarioTestCase).
+"""
+from datetime import timedelta
+from io import BytesIO
+import json
+import os
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+
+from tests import urls
+from tests.benchmarks.dataset import add_completed_attempts, add_quiz_results, generate_dataset
+from tests.benchmarks.seeding import seed_test, seed_users
+from tests.benchmarks.view_benchmarks import benchmark_context
+from tests.models import (
+    Question, QuizParticipant, QuizSession, Test, TestImportJob, UserBestResult, UserDailyStats, UserProfile,
+    UserTestProgress,
+)
+from tests.utils.attempt_cleanup import delete_attempts
+from tests.utils.attempt_expiry import expire_all_overdue_attempts
+from tests.utils.quiz_activation import activate_due_sessions, next_activation_time
+from tests.utils.answer_keys import range_question_ids
+from tests.utils.exports import XLSX_CONTENT_TYPE
+from tests.utils.excel_importer import import_test_from_excel, read_test_excel, resolve_test_name
+from tests.utils.import_jobs import STALE_JOB_MINUTES, requeue_stale_jobs, touch_job
+from tests.utils.quiz_attempts import provision_quiz_attempts, start_quiz_attempt
+from tests.utils.quiz_enrollment import sync_group_quizzes
+from tests.utils.quiz_results import get_results_page, ranked_participants
+from tests.utils.quiz_stats import get_session_stats, reconcile_quiz_stats
+from tests.utils.visibility import VisibilityScope
+from tests.utils.best_results import rebuild_best_results
+from tests.utils.daily_stats import rebuild_daily_stats
+
+PREFIX = 'qb_'
+
+# Максимальное количество SQL-запросов на один вызов представления
+QUERY_BUDGETS = {
+    'login': 0,
+    'logout': 4,
+    'register': 0,
+    'test_selection': 11,
+    'test_progress': 5,
+    'test_results': 6,
+    'reset_test_progress': 11,
+    'delete_test_progress': 13,
+    'save_answer': 5,
+    'upload_excel': 4,
+    'import_job_detail': 4,
+    'import_job_status': 3,
+    'manage_tests': 4,
+    'export_test': 4,
+    'export_answers': 4,
+    'profile': 12,
+    'edit_profile': 3,
+    'statistics': 8,
+    'reset_statistics': 17,
+    'group_results': 8,
+    'export_group_results': 4,
+    'user_test_results': 9,
+    'user_statistics_view': 11,
+    'create_quiz': 4,
+    'quiz_sessions': 5,
+    'quiz_session_detail': 8,
+    'start_quiz_session': 17,
+    'quiz_session_results': 9,
+    'export_quiz_session_results': 5,
+    'delete_quiz_session': 7,
+    'update_quiz_participants': 9,
+    'participate_in_quiz': 9,
+    'user_test_all_attempts': 8,
+    'check_time_remaining': 3,
+    'quiz_timer_stream': 3,
+    'training_statistics': 6,
+    'express_statistics': 6,
+    'quiz_statistics': 6,
+    'all_statistics': 6,
+    'user_training_statistics': 9,
+    'user_express_statistics': 9,
+    'user_quiz_statistics': 9,
+    'user_all_statistics': 9,
+}
+
+# Суммарное время SQL одного вызова на тестовом наборе, мс
+SQL_TIME_BUDGET_MS = 250
+
+# На сколько запросов может вырасти представление с массовой вставкой: SQLite
+# делит bulk_create на пачки по лимиту параметров запроса (999)
+BULK_WRITE_ALLOWANCE = {
+    'start_quiz_session': 2,
+}
+
+
+def consume_stream(response):
+    """Дочитывает потоковый ответ, чтобы учесть запросы генератора"""
+    if response.is_async:
+        async def read_all():
+            return [chunk async for chunk in response.streaming_content]
+        return async_to_sync(read_all)()
+    return list(response.streaming_content)
+
+
+def capture(client, method, path, data=None, content_type=None):
+    """Вызывает представление в откатываемой транзакции и возвращает (ответ, запросы)"""
+    connection.queries_log.clear()
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'post':
+                kwargs = {'content_type': content_type} if content_type else {}
+                response = client.post(path, data or {}, **kwargs)
+            else:
+                response = client.get(path, data or {})
+            if response.streaming:
+                consume_stream(response)
+        transaction.set_rollback(True)
+    return response, queries.captured_queries
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(
+            prefix=PREFIX, users=60, groups=2, subgroups=2, subsubgroups=2, tests=2, questions=60,
+            attempts=600, quiz_sessions_per_group=2, days=90, seed=1, log=lambda message: None,
+        )
+        context = benchmark_context(PREFIX)
+        cls.head, cls.member = context['head'], context['member']
+        cls.finished_session, cls.attempt = context['quiz_session'], context['attempt']
+        User.objects.filter(pk=cls.head.pk).update(is_staff=True)
+        cls.head.is_staff = True
+        cls.tests = list(Test.objects.filter(name__startswith=PREFIX).order_by('id'))
+        cls.test = cls.tests[0]
+
+        now = timezone.now()
+        question_order = cls.finished_session.question_order
+
+        # Идущий зачет с открытой попыткой участника и зачет, ожидающий активации
+        cls.active_session = QuizSession.objects.create(
+            creator=cls.head, test=cls.finished_session.test, question_count=len(question_order),
+            time_limit_minutes=30, starts_at=now, ends_at=now + timedelta(hours=2), question_order=question_order,
+        )
+        cls.active_session.activate_manually()
+        participant = cls.active_session.participants.select_related('progress').get(user=cls.member)
+        cls.quiz_attempt = start_quiz_attempt(cls.active_session, participant, now)
+
+        question_ids = list(cls.test.questions.order_by('question_number').values_list('id', flat=True)[:10])
+        cls.pending_session = QuizSession.objects.create(
+            creator=cls.head, test=cls.test, question_count=len(question_ids), time_limit_minutes=30,
+            starts_at=now + timedelta(days=1), ends_at=now + timedelta(days=2), question_order=question_ids,
+        )
+
+        # Незавершенная тренировка участника
+        cls.training = UserTestProgress.objects.create(
+            user=cls.member, test=cls.test, test_type='normal', current_question_id=question_ids[0],
+            start_question=1, end_question=10, question_order=question_ids,
+        )
+
+        # Завершенное задание на импорт с ошибками по строкам
+        cls.import_job = TestImportJob.objects.create(
+            created_by=cls.head, file='imports/qb_import.xlsx', file_name='qb_import.xlsx',
+            status=TestImportJob.STATUS_FAILED, total_rows=3, processed_rows=3, finished_at=now,
+            errors=['Строка 2: нет вариантов ответов'], warnings=['Строка 3: пустой текст вопроса'],
+        )
+
+    def setUp(self):
+        self.anonymous = Client(HTTP_HOST='localhost')
+        self.member_client = self.login(self.member)
+        self.head_client = self.login(self.head)
+
+    def login(self, user):
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        return client
+
+    def requests(self):
+        """Запросы к каждому URL: имя URL -> (клиент, метод, путь, данные, content_type)"""
+        member, head, test = self.member, self.head, self.test
+        attempt = self.attempt
+        active_id, pending_id, finished_id = self.active_session.id, self.pending_session.id, self.finished_session.id
+        return {
+            'login': (self.anonymous, 'get', reverse('login'), None, None),
+            'logout': (self.login(member), 'get', reverse('logout'), None, None),
+            'register': (self.anonymous, 'get', reverse('register'), None, None),
+            'test_selection': (self.member_client, 'get', reverse('test_selection'), None, None),
+            'test_progress': (self.member_client, 'get', reverse('test_progress', args=[test.id]), None, None),
+            'test_results': (self.member_client, 'get', reverse('test_results', args=[attempt.test_id]),
+                             {'attempt_id': attempt.attempt_id}, None),
+            'reset_test_progress': (self.member_client, 'get', reverse('reset_test_progress', args=[test.id]),
+                                    {'attempt_id': self.training.attempt_id}, None),
+            'delete_test_progress': (self.member_client, 'get', reverse('delete_test_progress', args=[test.id]),
+                                     {'attempt_id': self.training.attempt_id}, None),
+            'save_answer': (self.member_client, 'post', reverse('save_answer'),
+                            json.dumps({'question_id': self.training.current_question_id, 'answer': ['1']}),
+                            'application/json'),
+            'upload_excel': (self.head_client, 'get', reverse('upload_excel'), None, None),
+            'import_job_detail': (self.head_client, 'get', reverse('import_job_detail', args=[self.import_job.id]), None, None),
+            'import_job_status': (self.head_client, 'get', reverse('import_job_status', args=[self.import_job.id]), None, None),
+            'manage_tests': (self.head_client, 'get', reverse('manage_tests'), None, None),
+            'export_test': (self.head_client, 'get', reverse('export_test', args=[test.id]), None, None),
+            'export_answers': (self.head_client, 'get', reverse('export_answers', args=[test.id]), None, None),
+            'profile': (self.member_client, 'get', reverse('profile'), None, None),
+            'edit_profile': (self.member_client, 'get', reverse('edit_profile'), None, None),
+            'statistics': (self.member_client, 'get', reverse('statistics'), None, None),
+            'reset_statistics': (self.member_client, 'post', reverse('reset_statistics'), None, None),
+            'group_results': (self.head_client, 'get', reverse('group_results'), None, None),
+            'export_group_results': (self.head_client, 'get', reverse('export_group_results'),
+                                     {'rows': 'attempts', 'format': 'csv'}, None),
+            'user_test_results': (self.head_client, 'get', reverse('user_test_results', args=[member.id, attempt.test_id]),
+                                  {'attempt_id': attempt.attempt_id}, None),
+            'user_statistics_view': (self.head_client, 'get', reverse('user_statistics_view', args=[member.id]), None, None),
+            'create_quiz': (self.head_client, 'get', reverse('create_quiz'), None, None),
+            'quiz_sessions': (self.head_client, 'get', reverse('quiz_sessions'), None, None),
+            'quiz_session_detail': (self.head_client, 'get', reverse('quiz_session_detail', args=[active_id]), None, None),
+            'start_quiz_session': (self.head_client, 'get', reverse('start_quiz_session', args=[pending_id]), None, None),
+            'quiz_session_results': (self.head_client, 'get', reverse('quiz_session_results', args=[finished_id]), None, None),
+            'export_quiz_session_results': (self.head_client, 'get',
+                                            reverse('export_quiz_session_results', args=[finished_id]), None, None),
+            'delete_quiz_session': (self.head_client, 'get', reverse('delete_quiz_session', args=[finished_id]), None, None),
+            'update_quiz_participants': (self.head_client, 'get', reverse('update_quiz_participants', args=[active_id]), None, None),
+            'participate_in_quiz': (self.member_client, 'get', reverse('participate_in_quiz', args=[active_id]), None, None),
+            'user_test_all_attempts': (self.head_client, 'get', reverse('user_test_all_attempts', args=[member.id, attempt.test_id]), None, None),
+            'check_time_remaining': (self.member_client, 'get', reverse('check_time_remaining'),
+                                     {'attempt_id': self.quiz_attempt.attempt_id}, None),
+            'quiz_timer_stream': (self.member_client, 'get', reverse('quiz_timer_stream'),
+                                  {'attempt_id': attempt.attempt_id}, None),
+            'training_statistics': (self.member_client, 'get', reverse('training_statistics'), None, None),
+            'express_statistics': (self.member_client, 'get', reverse('express_statistics'), None, None),
+            'quiz_statistics': (self.member_client, 'get', reverse('quiz_statistics'), None, None),
+            'all_statistics': (self.member_client, 'get', reverse('all_statistics'), None, None),
+            'user_training_statistics': (self.head_client, 'get', reverse('user_training_statistics', args=[member.id]), None, None),
+            'user_express_statistics': (self.head_client, 'get', reverse('user_express_statistics', args=[member.id]), None, None),
+            'user_quiz_statistics': (self.head_client, 'get', reverse('user_quiz_statistics', args=[member.id]), None, None),
+            'user_all_statistics': (self.head_client, 'get', reverse('user_all_statistics', args=[member.id]), None, None),
+        }
+
+    def set_current_attempt(self, client):
+        session = client.session
+        session['current_attempt_id'] = self.training.attempt_id
+        session.save()
+
+    def measure_all(self):
+        """Вызывает все URL и возвращает {имя URL: (ответ, запросы)}"""
+        self.set_current_attempt(self.member_client)
+        return {
+            name: capture(client, method, path, data, content_type)
+            for name, (client, method, path, data, content_type) in self.requests().items()
+        }
+
+    def grow_dataset(self):
+        """Многократно увеличивает объем данных, которые видят представления"""
+        add_completed_attempts([self.member], self.tests, 300, seed=2)
+        group_code = self.member.profile.department_code
+        newcomers = seed_users([(f'{PREFIX}new_{index:03d}', group_code) for index in range(40)], 'password')
+        add_completed_attempts(newcomers, self.tests, 400, seed=3)
+        add_quiz_results(self.finished_session, newcomers, timezone.now() - timedelta(days=1), seed=4)
+        add_quiz_results(self.active_session, newcomers, timezone.now(), seed=5)
+        rebuild_daily_stats()
+        rebuild_best_results()
+
+    def test_every_url_has_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern)}
+        self.assertEqual(names - set(QUERY_BUDGETS), set(), 'Добавьте бюджет запросов для новых URL')
+        self.assertEqual(names - set(self.requests()), set(), 'Добавьте запрос к новым URL в requests()')
+
+    def test_views_stay_within_query_budget(self):
+        for name, (response, queries) in self.measure_all().items():
+            with self.subTest(view=name):
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(
+                    len(queries), QUERY_BUDGETS[name],
+                    f'{name}: {len(queries)} запросов при бюджете {QUERY_BUDGETS[name]}'
+                )
+                sql_ms = sum(float(query['time']) for query in queries) * 1000
+                self.assertLessEqual(sql_ms, SQL_TIME_BUDGET_MS, f'{name}: SQL {sql_ms:.0f} мс')
+
+    def test_query_count_does_not_grow_with_data(self):
+        before = {name: len(queries) for name, (_, queries) in self.measure_all().items()}
+        self.grow_dataset()
+        after = {name: len(queries) for name, (_, queries) in self.measure_all().items()}
+        for name in before:
+            with self.subTest(view=name):
+                self.assertLessEqual(
+                    after[name], before[name] + BULK_WRITE_ALLOWANCE.get(name, 0),
+                    f'{name}: {before[name]} -> {after[name]} запросов при росте данных'
+                )
+
+
+class ScenarioTestCase(TestCase):
+    """Тест из десяти вопросов и пользователь, который проходит его попытки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test = seed_test('sc_test', 10)
+        cls.user = User.objects.create_user('sc_user', 'sc_user@example.com', 'password')
+        cls.question_ids = list(cls.test.questions.order_by('question_number').values_list('id', flat=True))
+
+    def setUp(self):
+        self.test.refresh_from_db()
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.user)
+
+    def start_attempt(self, test_type='express', question_ids=None, **fields):
+        question_ids = question_ids or self.question_ids
+        return UserTestProgress.objects.create(
+            user=self.user, test=self.test, test_type=test_type, question_order=question_ids,
+            current_question_id=question_ids[0], **fields
+        )
+
+    def answer(self, progress, correct):
+        """Отвечает правильно на первые correct вопросов попытки и неправильно на остальные"""
+        key = self.test.get_answer_key()
+        for index, question_id in enumerate(progress.question_order):
+            right = sorted(key[question_id].correct)
+            wrong = [option for option in range(1, key[question_id].option_count + 1) if option not in right][:1]
+            progress.record_answer(question_id, [str(option) for option in (right if index < correct else wrong)])
+
+    def complete_attempt(self, correct, test_type='express', progress=None):
+        progress = progress or self.start_attempt(test_type)
+        self.answer(progress, correct)
+        progress.completed = True
+        progress.save()
+        return progress
+
+    def set_department(self, user, code):
+        profile = UserProfile.objects.get(user=user)
+        profile.department_code = code
+        profile.save()
+        return profile
+
+    def create_quiz(self, creator=None, **fields):
+        """Зачет по всем вопросам теста, идущий с пяти минут назад в течение часа"""
+        now = timezone.now()
+        fields = {'starts_at': now - timedelta(minutes=5), 'ends_at': now + timedelta(hours=1), **fields}
+        return QuizSession.objects.create(
+            creator=creator or self.user, test=self.test, question_count=10, time_limit_minutes=30,
+            question_order=self.question_ids, **fields
+        )
+
+
+class AnswerKeyCacheTests(ScenarioTestCase):
+
+    def test_key_is_reused_until_questions_change(self):
+        key = self.test.get_answer_key()
+        with self.assertNumQueries(0):
+            self.assertIs(self.test.get_answer_key(), key)
+
+        question = Question.objects.get(id=self.question_ids[0])
+        question.correct_answer = '4'
+        question.save()
+        # Старая копия Test не знает о новой метке и получает прежний ключ
+        self.assertIs(self.test.get_answer_key(), key)
+
+        self.test.refresh_from_db()
+        fresh = self.test.get_answer_key()
+        self.assertIsNot(fresh, key)
+        self.assertEqual(fresh[question.id].correct, frozenset({4}))
+
+    def test_deleted_question_leaves_the_key(self):
+        self.test.get_answer_key()
+        Question.objects.get(id=self.question_ids[-1]).delete()
+        self.test.refresh_from_db()
+        self.assertNotIn(self.question_ids[-1], self.test.get_answer_key())
+
+
+class GroupEnrollmentTests(ScenarioTestCase):
+
+    def test_group_change_enrolls_user_in_running_group_quizzes(self):
+        creator = User.objects.create_user('ge_creator', 'ge_creator@example.com', 'password')
+        self.set_department(creator, '35У')
+        running = self.create_quiz(creator)
+        self.create_quiz(creator, starts_at=timezone.now() + timedelta(days=1),
+                         ends_at=timezone.now() + timedelta(days=2))
+        self.set_department(self.user, '40-1')
+
+        self.set_department(self.user, '35-2')
+        self.assertEqual(
+            list(QuizParticipant.objects.filter(user=self.user).values_list('quiz_session_id', flat=True)),
+            [running.id]
+        )
+        self.assertEqual(get_session_stats(running).enrolled_count, 1)
+
+        # Смена подгруппы в той же группе не записывает повторно
+        profile = self.set_department(self.user, '35-3')
+        self.assertEqual(QuizParticipant.objects.filter(user=self.user).count(), 1)
+
+        # Пока состав зачетов группы не менялся, синхронизация на главной ничего не делает
+        user = User.objects.select_related('profile').get(id=self.user.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(sync_group_quizzes(user), 0)
+
+        later = self.create_quiz(creator, audience_updated_at=profile.quizzes_synced_at + timedelta(seconds=1))
+        self.assertEqual(sync_group_quizzes(user), 1)
+        self.assertTrue(QuizParticipant.objects.filter(user=self.user, quiz_session=later).exists())
+
+
+class DepartmentBoundaryTests(ScenarioTestCase):
+    """Группы и подгруппы сравниваются целиком, а не по префиксу строки кода"""
+
+    CODES = {
+        'db_group': '35', 'db_sub1': '35-1', 'db_sub1_1': '35-1-1', 'db_sub2': '35-2',
+        'db_sub10': '35-10', 'db_group350': '350', 'db_group36': '36-1',
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.users = {}
+        for username, code in self.CODES.items():
+            self.users[username] = User.objects.create(username=username)
+            self.set_department(self.users[username], code)
+
+    def visible(self, code):
+        viewer = User.objects.create(username=f'db_viewer_{code}')
+        profile = self.set_department(viewer, code)
+        usernames = set(profile.get_viewable_users_query().values_list('username', flat=True))
+        return usernames - {viewer.username}
+
+    def test_head_of_group_sees_whole_group_only(self):
+        self.assertEqual(self.visible('35У'), {'db_group', 'db_sub1', 'db_sub1_1', 'db_sub2', 'db_sub10'})
+
+    def test_head_of_subgroup_does_not_see_sibling_or_digit_prefix_subgroup(self):
+        self.assertEqual(self.visible('35-1У'), {'db_sub1', 'db_sub1_1'})
+
+    def test_code_without_view_rights_sees_nobody(self):
+        self.assertEqual(self.visible('35-1'), set())
+
+    def test_quiz_enrolls_same_group_but_not_digit_prefix_group(self):
+        creator = User.objects.select_related('profile').get(username='db_sub1')
+        quiz_session = self.create_quiz(creator)
+        quiz_session.enroll_group()
+        self.assertEqual(
+            set(quiz_session.participants.values_list('user__username', flat=True)),
+            {'db_group', 'db_sub1', 'db_sub1_1', 'db_sub2', 'db_sub10'}
+        )
+
+
+class VisibilityScopeTests(ScenarioTestCase):
+
+    def make_user(self, username, code):
+        user = User.objects.create(username=username)
+        self.set_department(user, code)
+        return User.objects.select_related('profile').get(id=user.id)
+
+    def test_scope_filters_by_subgroup_and_caches_decisions(self):
+        viewer = self.make_user('vs_head', '35-1У')
+        member = self.make_user('vs_member', '35-1-2')
+        outsider = self.make_user('vs_outsider', '35-10')
+
+        scope = VisibilityScope(viewer)
+        self.assertTrue(scope.has_rights)
+        self.assertEqual(set(scope.users().values_list('username', flat=True)), {'vs_head', 'vs_member'})
+        self.assertTrue(scope.can_view(member))
+        self.assertFalse(scope.can_view(outsider.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(scope.can_view(viewer))
+            self.assertTrue(scope.can_view(member.id))
+            self.assertFalse(scope.can_view(outsider))
+
+    def test_scope_without_rights_sees_only_self_without_queries(self):
+        viewer = self.make_user('vs_plain', '35-1')
+        scope = VisibilityScope(viewer)
+        with self.assertNumQueries(0):
+            self.assertFalse(scope.has_rights)
+            self.assertTrue(scope.can_view(viewer))
+            self.assertFalse(scope.can_view(self.user))
+        self.assertFalse(scope.users().exists())
+
+
+class AnswerUpsertTests(ScenarioTestCase):
+
+    def test_repeated_posts_keep_one_row_with_the_last_answer(self):
+        progress = self.start_attempt()
+        question_id = self.question_ids[0]
+        for answer in (['1'], ['2', '3'], ['2']):
+            response = self.client.post(reverse('save_answer'), json.dumps({'question_id': question_id, 'answer': answer}),
+                                        content_type='application/json')
+            self.assertEqual(response.json(), {'status': 'success'})
+
+        self.assertEqual(list(progress.answer_records.values_list('question_id', 'selected')), [(question_id, ['2'])])
+        self.assertEqual(progress.get_answers(), {str(question_id): ['2']})
+
+
+class AttemptCursorTests(ScenarioTestCase):
+
+    def test_answers_advance_the_cursor_and_a_new_session_resumes_there(self):
+        order = list(reversed(self.question_ids))
+        progress = self.start_attempt(question_ids=order)
+        session = self.client.session
+        session['current_attempt_id'] = progress.attempt_id
+        session.save()
+        url = reverse('test_progress', args=[self.test.id])
+        for expected_number in (1, 2):
+            response = self.client.post(url, {'answer': ['1']})
+            self.assertEqual(response.context['question_number'], expected_number)
+
+        progress.refresh_from_db()
+        self.assertEqual((progress.current_position, progress.current_question_id), (2, order[2]))
+        self.assertEqual(set(progress.get_answers()), {str(order[0]), str(order[1])})
+
+        # Другой браузер с той же попыткой продолжает с третьего вопроса заданного порядка
+        other = Client(HTTP_HOST='localhost')
+        other.force_login(self.user)
+        session = other.session
+        session['current_attempt_id'] = progress.attempt_id
+        session.save()
+        response = other.get(url)
+        self.assertEqual(response.context['question'].id, order[2])
+        self.assertEqual((response.context['question_number'], response.context['total_questions']), (3, 10))
+
+
+class ResultSnapshotTests(ScenarioTestCase):
+
+    def test_results_keep_the_scoring_of_the_completed_attempt(self):
+        progress = self.complete_attempt(6)
+        key = self.test.get_answer_key()
+        first, second = Question.objects.filter(id__in=self.question_ids[:2]).order_by('question_number')
+        first.correct_answer = '4'
+        first.save()
+        second.retired_at = timezone.now()
+        second.save()
+
+        response = self.client.get(reverse('test_results', args=[self.test.id]), {'attempt_id': progress.attempt_id})
+        context = response.context
+        self.assertEqual((context['correct_answers'], context['total_questions'], context['score']), (6, 10, 60.0))
+        rows = context['questions_with_order']
+        self.assertEqual([row['question'].id for row in rows], self.question_ids)
+        self.assertTrue(rows[0]['is_correct'])
+        self.assertEqual(rows[0]['correct_answers_list'], sorted(key[first.id].correct))
+        self.assertEqual(rows[1]['correct_answers_list'], sorted(key[second.id].correct))
+
+
+def daily_rows(user):
+    return sorted(UserDailyStats.objects.filter(user=user).values_list(
+        'test_id', 'test_type', 'day', 'attempts_count', 'score_sum', 'score_min', 'score_max',
+        'grade_fail_count', 'grade_pass_count', 'grade_good_count', 'grade_excellent_count'
+    ))
+
+
+class DailyStatsTests(ScenarioTestCase):
+
+    def test_completed_attempts_match_rebuild(self):
+        self.complete_attempt(10)
+        self.complete_attempt(6)
+        self.complete_attempt(3, test_type='normal')
+        rows = daily_rows(self.user)
+        self.assertEqual([(row[1], row[3], row[4]) for row in rows], [('express', 2, 160.0), ('normal', 1, 30.0)])
+
+        rebuild_daily_stats([self.user.id])
+        self.assertEqual(daily_rows(self.user), rows)
+
+    def test_reset_and_complete_again_counts_attempt_once(self):
+        self.complete_attempt(9)
+        progress = self.complete_attempt(4)
+
+        response = self.client.get(reverse('reset_test_progress', args=[self.test.id]),
+                                   {'attempt_id': progress.attempt_id})
+        self.assertEqual(response.status_code, 302)
+        rows = daily_rows(self.user)
+        self.assertEqual([(row[3], row[4], row[5], row[6]) for row in rows], [(1, 90.0, 90.0, 90.0)])
+
+        progress.refresh_from_db()
+        self.complete_attempt(7, progress=progress)
+        rows = daily_rows(self.user)
+        self.assertEqual([(row[3], row[4], row[5], row[6]) for row in rows], [(2, 160.0, 70.0, 90.0)])
+
+        rebuild_daily_stats([self.user.id])
+        self.assertEqual(daily_rows(self.user), rows)
+
+    def test_deleted_attempt_keeps_history_of_purged_attempts(self):
+        old = self.complete_attempt(8)
+        UserTestProgress.objects.filter(id=old.id).update(completed_at=timezone.now() - timedelta(days=100))
+        rebuild_daily_stats([self.user.id])
+        delete_attempts(UserTestProgress.objects.filter(id=old.id))
+        purged_rows = daily_rows(self.user)
+
+        progress = self.complete_attempt(5)
+        self.client.get(reverse('delete_test_progress', args=[self.test.id]), {'attempt_id': progress.attempt_id})
+        self.assertFalse(UserTestProgress.objects.filter(id=progress.id).exists())
+        self.assertEqual(daily_rows(self.user), purged_rows)
+
+
+def best_rows(user):
+    return sorted(UserBestResult.objects.filter(user=user).values_list('test_id', 'test_type', 'progress_id', 'score'))
+
+
+class BestResultTests(ScenarioTestCase):
+
+    def test_best_attempt_is_kept_and_matches_rebuild(self):
+        self.complete_attempt(6)
+        best = self.complete_attempt(9)
+        self.complete_attempt(7)
+        self.complete_attempt(10, test_type='normal')  # Тренировки не учитываются
+        rows = best_rows(self.user)
+        self.assertEqual(rows, [(self.test.id, 'express', best.id, 90.0)])
+
+        rebuild_best_results([self.user.id])
+        self.assertEqual(best_rows(self.user), rows)
+
+    def test_reset_of_best_attempt_falls_back_to_next_best(self):
+        second = self.complete_attempt(7)
+        best = self.complete_attempt(9)
+
+        self.client.get(reverse('reset_test_progress', args=[self.test.id]), {'attempt_id': best.attempt_id})
+        self.assertEqual(best_rows(self.user), [(self.test.id, 'express', second.id, 70.0)])
+        best.refresh_from_db()
+        self.assertIsNone(best.result_snapshot)
+
+        self.complete_attempt(5, progress=best)
+        self.assertEqual(best_rows(self.user), [(self.test.id, 'express', second.id, 70.0)])
+
+    def test_delete_rebuilds_only_the_affected_test(self):
+        other_test = seed_test('sc_other', 10)
+        other_ids = list(other_test.questions.values_list('id', flat=True))
+        other = UserTestProgress.objects.create(
+            user=self.user, test=other_test, test_type='express', question_order=other_ids,
+            current_question_id=other_ids[0]
+        )
+        other.completed = True
+        other.save()
+        other_row_id = UserBestResult.objects.get(test=other_test).id
+        second = self.complete_attempt(7)
+        best = self.complete_attempt(9)
+
+        self.client.get(reverse('delete_test_progress', args=[self.test.id]), {'attempt_id': best.attempt_id})
+        self.assertEqual(UserBestResult.objects.get(test=self.test).progress_id, second.id)
+        self.assertEqual(UserBestResult.objects.get(test=other_test).id, other_row_id)
+
+
+class QuizResetTests(ScenarioTestCase):
+
+    def test_reset_and_complete_again_updates_session_counters(self):
+        quiz_session = self.create_quiz()
+        progress = self.start_attempt('quiz', quiz_session=quiz_session, start_time=timezone.now(),
+                                      end_time=timezone.now() + timedelta(minutes=30))
+        participant = QuizParticipant.objects.create(quiz_session=quiz_session, user=self.user, progress=progress)
+        reconcile_quiz_stats([quiz_session.id])  # Участник записан в обход счетчиков
+        self.complete_attempt(8, progress=progress)
+
+        self.client.get(reverse('reset_test_progress', args=[self.test.id]), {'attempt_id': progress.attempt_id})
+        participant.refresh_from_db()
+        self.assertIsNone(participant.completed_at)
+        stats = get_session_stats(quiz_session)
+        self.assertEqual((stats.completed_count, stats.score_sum, stats.grade_good_count), (0, 0.0, 0))
+
+        progress.refresh_from_db()
+        self.complete_attempt(4, progress=progress)
+        participant.refresh_from_db()
+        self.assertEqual(participant.completed_at, progress.completed_at)
+        stats = get_session_stats(quiz_session)
+        self.assertEqual((stats.completed_count, stats.score_sum, stats.grade_fail_count), (1, 40.0, 1))
+        self.assertEqual(reconcile_quiz_stats([quiz_session.id]), 0)
+
+
+class QuizActivationTests(ScenarioTestCase):
+
+    def test_scheduler_activates_only_due_quizzes_once(self):
+        now = timezone.now()
+        due = self.create_quiz(starts_at=now - timedelta(minutes=1))
+        future = self.create_quiz(starts_at=now + timedelta(hours=1), ends_at=now + timedelta(hours=2))
+        # Наступивший зачет считается начавшимся и до срабатывания планировщика
+        self.assertTrue(due.is_started)
+        self.assertFalse(future.is_started)
+
+        self.assertEqual(activate_due_sessions(now), 1)
+        self.assertEqual(activate_due_sessions(now), 0)
+
+        due.refresh_from_db()
+        future.refresh_from_db()
+        self.assertTrue(due.is_active)
+        self.assertEqual(due.audience_updated_at, now)
+        self.assertFalse(future.is_active)
+        self.assertEqual(next_activation_time(), future.starts_at)
+        participant = due.participants.get()
+        self.assertEqual(participant.user_id, self.user.id)
+        self.assertIsNotNone(participant.progress_id)
+
+        self.assertEqual(activate_due_sessions(future.starts_at), 1)
+        future.refresh_from_db()
+        self.assertTrue(future.is_started)
+        self.assertIsNone(next_activation_time())
+
+
+class QuizAttemptProvisioningTests(ScenarioTestCase):
+
+    def test_pending_attempts_are_provisioned_once_and_started_once(self):
+        quiz_session = self.create_quiz()
+        other = User.objects.create(username='qp_other')
+        participant = QuizParticipant.objects.create(quiz_session=quiz_session, user=self.user)
+        QuizParticipant.objects.create(quiz_session=quiz_session, user=other)
+
+        self.assertEqual(provision_quiz_attempts(quiz_session), 2)
+        self.assertEqual(provision_quiz_attempts(quiz_session), 0)
+        attempts = UserTestProgress.objects.filter(quiz_session=quiz_session)
+        self.assertEqual(attempts.count(), 2)
+        self.assertFalse(attempts.filter(start_time__isnull=False).exists())
+        self.assertEqual(
+            {tuple(order) for order in attempts.values_list('question_order', flat=True)}, {tuple(self.question_ids)}
+        )
+
+        participant.refresh_from_db()
+        started_at = timezone.now()
+        progress = start_quiz_attempt(quiz_session, participant, now=started_at)
+        self.assertEqual((progress.start_time, progress.end_time), (started_at, started_at + timedelta(minutes=30)))
+        start_quiz_attempt(quiz_session, participant, now=started_at + timedelta(minutes=5))
+        progress.refresh_from_db()
+        self.assertEqual(progress.start_time, started_at)
+        self.assertEqual(get_session_stats(quiz_session).started_count, 1)
+
+
+class ResultsPageTests(ScenarioTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        cls.quiz_session = QuizSession.objects.create(
+            creator=cls.user, test=cls.test, question_count=10, time_limit_minutes=30,
+            starts_at=now - timedelta(hours=1), ends_at=now + timedelta(hours=1), question_order=cls.question_ids,
+        )
+        users = seed_users([(f'sc_rank_{index:02d}', '35-1') for index in range(13)], 'password')
+        # Повторы результатов и времени завершения, участники без результата и незавершившие
+        scores = [90, 70, 90, None, 70, 100, 70, 50, None, 90, 70, None, 100]
+        for index, (user, score) in enumerate(zip(users, scores)):
+            completed_at = None if index % 4 == 3 else now - timedelta(minutes=index % 3)
+            progress = UserTestProgress.objects.create(user=user, test=cls.test, test_type='quiz', score=score)
+            QuizParticipant.objects.create(quiz_session=cls.quiz_session, user=user,
+                                           progress=progress, completed_at=completed_at)
+
+    def read_pages(self, limit, after=None, change_after_first_page=None):
+        ids, positions = [], []
+        while True:
+            page, after = get_results_page(self.quiz_session, after=after, limit=limit)
+            ids += [participant.id for participant in page]
+            positions += [participant.position for participant in page]
+            if change_after_first_page:
+                change_after_first_page()
+                change_after_first_page = None
+            if after is None:
+                return ids, positions
+
+    def test_pages_follow_ranking_order(self):
+        expected = list(ranked_participants(self.quiz_session).values_list('id', 'position'))
+        ids, positions = self.read_pages(limit=4)
+        self.assertEqual(list(zip(ids, positions)), expected)
+
+    def test_participant_moving_up_does_not_shift_other_rows(self):
+        ranking = list(ranked_participants(self.quiz_session).values_list('id', flat=True))
+        mover = QuizParticipant.objects.select_related('progress').get(id=ranking[-2])
+
+        def finish_with_best_score():
+            UserTestProgress.objects.filter(id=mover.progress_id).update(score=100)
+            QuizParticipant.objects.filter(id=mover.id).update(completed_at=timezone.now() - timedelta(hours=1))
+
+        ids, _ = self.read_pages(limit=4, change_after_first_page=finish_with_best_score)
+        self.assertEqual(ids, [participant_id for participant_id in ranking if participant_id != mover.id])
+
+
+class AttemptExpiryTests(ScenarioTestCase):
+
+    def test_overdue_attempts_are_scored_and_closed_at_their_deadline(self):
+        deadline = timezone.now() - timedelta(hours=3)
+        overdue = self.start_attempt('quiz', start_time=deadline - timedelta(minutes=30), end_time=deadline)
+        self.answer(overdue, 8)
+        running = self.start_attempt('quiz', end_time=timezone.now() + timedelta(minutes=30))
+        quiz_session = QuizSession.objects.create(
+            creator=self.user, test=self.test, question_count=10, time_limit_minutes=30,
+            starts_at=deadline - timedelta(hours=1), ends_at=deadline + timedelta(hours=1),
+            question_order=self.question_ids,
+        )
+        participant = QuizParticipant.objects.create(quiz_session=quiz_session, user=self.user, progress=overdue)
+
+        self.assertEqual(expire_all_overdue_attempts(), 1)
+        self.assertEqual(expire_all_overdue_attempts(), 0)
+
+        overdue.refresh_from_db()
+        self.assertTrue(overdue.completed)
+        self.assertEqual(overdue.completed_at, deadline)
+        self.assertEqual((overdue.correct_answers_count, overdue.total_questions_count, overdue.score), (8, 10, 80.0))
+        participant.refresh_from_db()
+        self.assertEqual(participant.completed_at, deadline)
+        running.refresh_from_db()
+        self.assertFalse(running.completed)
+        self.assertEqual(daily_rows(self.user)[0][2], timezone.localtime(deadline).date())
+
+
+class ExportTests(ScenarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create(username='ex_staff', is_staff=True))
+        self.url = reverse('export_answers', args=[self.test.id])
+        self.rows = [
+            [number, f'Вопрос {number}', correct_answer]
+            for number, correct_answer in self.test.questions.order_by('question_number').values_list(
+                'question_number', 'correct_answer'
+            )
+        ]
+
+    def test_csv_is_streamed_with_bom_and_semicolons(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn("filename*=utf-8''", response['Content-Disposition'])
+        self.assertTrue(response['Content-Disposition'].endswith('.csv'))
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        lines = content[1:].splitlines()
+        self.assertEqual(lines[0], 'Номер вопроса;Текст вопроса;Правильные ответы')
+        self.assertEqual(lines[1:], [';'.join(str(value) for value in row) for row in self.rows])
+
+    def test_xlsx_has_header_and_rows(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        sheet = workbook['Ответы']
+        values = [list(row) for row in sheet.iter_rows(values_only=True)]
+        workbook.close()
+        self.assertEqual(values, [['Номер вопроса', 'Текст вопроса', 'Правильные ответы'], *self.rows])
+
+
+class ImportJobRequeueTests(TestCase):
+
+    def test_only_jobs_without_recent_heartbeat_are_requeued(self):
+        user = User.objects.create_user('ij_user', 'ij_user@example.com', 'password')
+        now = timezone.now()
+        long_ago = now - timedelta(minutes=STALE_JOB_MINUTES + 30)
+        alive = TestImportJob.objects.create(
+            created_by=user, file_name='alive.xlsx', status=TestImportJob.STATUS_RUNNING,
+            started_at=long_ago, heartbeat_at=now - timedelta(minutes=1), processed_rows=400,
+        )
+        stale = TestImportJob.objects.create(
+            created_by=user, file_name='stale.xlsx', status=TestImportJob.STATUS_RUNNING,
+            started_at=long_ago, heartbeat_at=long_ago, processed_rows=400,
+        )
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        alive.refresh_from_db()
+        self.assertEqual((alive.status, alive.processed_rows), (TestImportJob.STATUS_RUNNING, 400))
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.processed_rows), (TestImportJob.STATUS_PENDING, 0))
+
+        touch_job(alive.id, processed_rows=600)
+        alive.refresh_from_db()
+        self.assertEqual(alive.processed_rows, 600)
+        self.assertGreaterEqual(alive.heartbeat_at, now)
+
+
+class ReimportTests(ScenarioTestCase):
+
+    def write_excel(self, rows):
+        """Файл импорта из строк (номер, текст, правильные ответы, документ, варианты)"""
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['№', 'Вопрос', 'Ответ', 'Документ', 'Варианты'])
+        for number, text, correct_answer, document_reference, options in rows:
+            sheet.append([number, text, correct_answer, document_reference, *options])
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        workbook.save(path)
+        return path
+
+    def current_rows(self):
+        return [
+            [question.question_number, question.question_text, question.correct_answer,
+             question.document_reference,
+             [question.answer_options[key] for key in sorted(question.answer_options, key=int)]]
+            for question in self.test.questions.filter(retired_at__isnull=True).order_by('question_number')
+        ]
+
+    def reimport(self, rows):
+        report = read_test_excel(self.write_excel(rows))
+        import_test_from_excel(None, self.test.name, report=report)
+        self.test.refresh_from_db()
+        return report.changes
+
+    def test_unchanged_file_writes_nothing(self):
+        rows = self.current_rows()
+        stamp = self.test.answer_key_updated_at
+        changes = self.reimport(rows)
+        self.assertEqual(changes.as_dict(), {'added': [], 'updated': [], 'retired': [], 'unchanged': 10})
+        self.assertEqual(self.test.answer_key_updated_at, stamp)
+
+    def test_changed_correct_answer_rebuilds_the_answer_key(self):
+        key = self.test.get_answer_key()
+        rows = self.current_rows()
+        rows[0][2] = '4'
+        self.reimport(rows)
+        # bulk_update не шлет сигналов - метку ставит сам импорт
+        fresh = self.test.get_answer_key()
+        self.assertIsNot(fresh, key)
+        self.assertEqual(fresh[self.question_ids[0]].correct, frozenset({4}))
+
+    def test_default_name_is_file_name_up_to_first_dot(self):
+        report = read_test_excel(self.write_excel(self.current_rows()), file_name='ПТЭ v1.2.xlsx')
+        self.assertEqual(resolve_test_name(report), 'ПТЭ v1')
+        self.assertEqual(resolve_test_name(report, 'Свое название'), 'Свое название')
+
+    def test_question_number_below_one_is_a_row_error(self):
+        rows = self.current_rows()
+        rows[0][0] = 0
+        rows[1][0] = -2
+        report = read_test_excel(self.write_excel(rows))
+        self.assertEqual(report.errors, ['Строка 2: номер вопроса 0 меньше 1', 'Строка 3: номер вопроса -2 меньше 1'])
+
+    def test_changed_and_missing_questions_keep_their_ids(self):
+        ids = dict(self.test.questions.values_list('question_number', 'id'))
+        rows = [row for row in self.current_rows() if row[0] != 4]
+        rows[1][1] = 'Вопрос 2 в новой редакции'
+        rows.append([11, 'Вопрос 11', '2', 'Документ 1', ['а', 'б']])
+
+        changes = self.reimport(rows)
+        self.assertEqual(changes.as_dict(), {'added': [11], 'updated': [2], 'retired': [4], 'unchanged': 8})
+        self.assertEqual(Question.objects.get(id=ids[2]).question_text, 'Вопрос 2 в новой редакции')
+        self.assertIsNotNone(Question.objects.get(id=ids[4]).retired_at)
+        self.assertEqual(self.test.questions.filter(retired_at__isnull=True).count(), 10)
+
+        # Вопрос, вернувшийся в файл, снова выдается под прежним id
+        changes = self.reimport(self.current_rows() + [[4, 'Вопрос 4', '1', 'Документ 5', ['а', 'б']]])
+        self.assertEqual(changes.updated, [4])
+        self.assertIsNone(Question.objects.get(id=ids[4]).retired_at)
+
+    def test_retired_question_is_scored_in_started_attempt_but_not_offered_again(self):
+        progress = self.start_attempt('normal')
+        retired_id = self.question_ids[3]
+        self.reimport([row for row in self.current_rows() if row[0] != 4])
+
+        key = self.test.get_answer_key()
+        self.assertTrue(key[retired_id].retired)
+        self.assertNotIn(retired_id, range_question_ids(key))
+        self.complete_attempt(10, progress=progress)
+        progress.refresh_from_db()
+        self.assertEqual((progress.correct_answers_count, progress.total_questions_count), (10, 10))
 
-# Create your tests here.
@@ -12,6 +12,8 @@ urlpatterns = [
     path('test/<int:test_id>/delete/', views.delete_test_progress, name='delete_test_progress'),
     path('save_answer/', views.save_answer, name='save_answer'),
     path('upload-excel/', views.upload_test_excel, name='upload_excel'),
+    path('import-jobs/<int:job_id>/', views.import_job_detail, name='import_job_detail'),
+    path('import-jobs/<int:job_id>/status/', views.import_job_status, name='import_job_status'),
     path('manage-tests/', views.manage_tests, name='manage_tests'),
     path('test/<int:test_id>/export/', views.export_test_excel, name='export_test'),
     path('test/<int:test_id>/export-answers/', views.export_answers_excel, name='export_answers'),
@@ -20,6 +22,7 @@ urlpatterns = [
     path('profile/statistics/', views.statistics, name='statistics'),
     path('profile/statistics/reset/', views.reset_statistics, name='reset_statistics'),
     path('group-results/', views.group_results, name='group_results'),
+    path('group-results/export/', views.export_group_results, name='export_group_results'),
     path('user/<int:user_id>/test/<int:test_id>/results/', views.user_test_results, name='user_test_results'),
     path('user/<int:user_id>/statistics/', views.user_statistics_view, name='user_statistics_view'),
     
@@ -29,6 +32,7 @@ urlpatterns = [
     path('quiz/session/<int:session_id>/', views.quiz_session_detail, name='quiz_session_detail'),
     path('quiz/session/<int:session_id>/start/', views.start_quiz_session, name='start_quiz_session'),
     path('quiz/session/<int:session_id>/results/', views.quiz_session_results, name='quiz_session_results'),
+    path('quiz/session/<int:session_id>/results/export/', views.export_quiz_session_results, name='export_quiz_session_results'),
     path('quiz/session/<int:session_id>/delete/', views.delete_quiz_session, name='delete_quiz_session'),
     path('quiz/session/<int:session_id>/update-participants/', views.update_quiz_participants, name='update_quiz_participants'),
     path('quiz/participate/<int:session_id>/', views.participate_in_quiz, name='participate_in_quiz'),
@@ -36,6 +40,7 @@ urlpatterns = [
     path('user/<int:user_id>/test/<int:test_id>/all-attempts/', views.user_test_all_attempts, name='user_test_all_attempts'),
     # Новый URL для проверки времени
     path('check-time-remaining/', views.check_time_remaining, name='check_time_remaining'),
+    path('check-time-remaining/stream/', views.quiz_timer_stream, name='quiz_timer_stream'),
     # Графики статистики
     path('statistics/training/', views.training_statistics, name='training_statistics'),
     path('statistics/express/', views.express_statistics, name='express_statistics'),
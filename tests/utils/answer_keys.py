@@ -0,0 +1,117 @@
+# tests/utils/answer_keys.py
+"""Ключи ответов тестов с кэшем в памяти процесса, привязанным к Test.answer_key_updated_at."""
+from collections import namedtuple
+import threading
+
+# retired - вопрос выведен из теста: оценивается в попытках, где он есть, но в новые не выдается
+AnswerKey = namedtuple('AnswerKey', ['number', 'correct', 'option_count', 'retired'])
+
+_lock = threading.Lock()
+_cache = {}  # test_id -> (answer_key_updated_at, {question_id: AnswerKey})
+
+
+def parse_answer_set(values):
+    """Приводит список выбранных вариантов к frozenset чисел, отбрасывая мусор"""
+    if not values:
+        return frozenset()
+    if isinstance(values, (str, int)):
+        values = [values]
+    return frozenset(int(value) for value in values if str(value).strip().isdigit())
+
+
+def parse_correct_answer(value):
+    """Разбирает строку правильных ответов вида '1, 3' в frozenset чисел"""
+    if not value:
+        return frozenset()
+    return parse_answer_set(part.strip() for part in str(value).split(','))
+
+
+def _build_answer_key(test_id):
+    from tests.models import Question
+
+    rows = Question.objects.filter(test_id=test_id).values_list(
+        'id', 'question_number', 'correct_answer', 'answer_options', 'retired_at'
+    )
+    return {
+        question_id: AnswerKey(
+            number=number,
+            correct=parse_correct_answer(correct_answer),
+            option_count=len(answer_options or {}),
+            retired=retired_at is not None,
+        )
+        for question_id, number, correct_answer, answer_options, retired_at in rows
+    }
+
+
+def get_answer_key(test):
+    """Возвращает ключ ответов теста, перестраивая его при изменении вопросов"""
+    stamp = test.answer_key_updated_at
+    cached = _cache.get(test.id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    key = _build_answer_key(test.id)
+    with _lock:
+        _cache[test.id] = (stamp, key)
+    return key
+
+
+def forget_answer_key(test_id):
+    """Удаляет ключ теста из кэша текущего процесса"""
+    with _lock:
+        _cache.pop(test_id, None)
+
+
+def is_answer_correct(entry, user_answer):
+    """Проверяет ответ пользователя по записи ключа"""
+    return entry is not None and parse_answer_set(user_answer) == entry.correct
+
+
+def active_question_ids(key):
+    """Id вопросов, которые можно выдавать в новых попытках"""
+    return [question_id for question_id, entry in key.items() if not entry.retired]
+
+
+def range_question_ids(key, start_question=None, end_question=None, include_retired=False):
+    """Id вопросов из диапазона номеров в порядке номеров (для новой попытки - без выведенных)"""
+    items = [
+        (entry.number, question_id)
+        for question_id, entry in key.items()
+        if (include_retired or not entry.retired)
+        and (not start_question or entry.number >= start_question)
+        and (not end_question or entry.number <= end_question)
+    ]
+    items.sort()
+    return [question_id for _, question_id in items]
+
+
+def attempt_question_ids(progress, key=None):
+    """Id вопросов попытки в том порядке, в котором они показываются в результатах"""
+    if key is None:
+        key = get_answer_key(progress.test)
+    if progress.question_order:
+        return [question_id for question_id in progress.question_order if question_id in key]
+    return range_question_ids(key, progress.start_question, progress.end_question, include_retired=True)
+
+
+def build_result_snapshot(key, question_ids, answers):
+    """Снимок результата попытки: порядок вопросов, битовая карта правильности,
+    выбранные и правильные варианты. Пишется один раз при завершении."""
+    answers = answers or {}
+    bitmap = []
+    selected = []
+    correct_options = []
+    for question_id in question_ids:
+        entry = key.get(question_id)
+        user_answer = answers.get(str(question_id)) or []
+        bitmap.append('1' if is_answer_correct(entry, user_answer) else '0')
+        selected.append(sorted(parse_answer_set(user_answer)))
+        correct_options.append(sorted(entry.correct) if entry else [])
+    return {
+        'question_ids': list(question_ids),
+        'correct': ''.join(bitmap),
+        'selected': selected,
+        'correct_options': correct_options,
+        'correct_count': bitmap.count('1'),
+        'total': len(bitmap),
+    }
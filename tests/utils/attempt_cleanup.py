@@ -0,0 +1,37 @@
+# tests/utils/attempt_cleanup.py
+"""Массовое удаление попыток: зависимые строки, затем сами попытки одним DELETE."""
+from django.db import connection, transaction
+
+from tests.models import QuizParticipant, UserBestResult, UserTestAnswer, UserTestProgress
+from tests.utils.best_results import rebuild_best_results
+
+
+def _delete_progress_rows(attempt_ids):
+    """DELETE ... WHERE id IN (...) для попыток, на которые больше нет ссылок"""
+    placeholders = ', '.join(['%s'] * len(attempt_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(UserTestProgress._meta.db_table)} '
+            f'WHERE id IN ({placeholders})',
+            attempt_ids,
+        )
+        return cursor.rowcount
+
+
+def delete_attempts(attempts):
+    """Удаляет попытки из QuerySet вместе с ответами и записями участников.
+    Возвращает количество удаленных попыток."""
+    attempt_ids = list(attempts.values_list('id', flat=True))
+    if not attempt_ids:
+        return 0
+    with transaction.atomic():
+        UserTestAnswer.objects.filter(progress_id__in=attempt_ids).delete()
+        QuizParticipant.objects.filter(progress_id__in=attempt_ids).delete()
+        best_result_users = list(UserBestResult.objects.filter(
+            progress_id__in=attempt_ids
+        ).values_list('user_id', flat=True).distinct())
+        UserBestResult.objects.filter(progress_id__in=attempt_ids).delete()
+        deleted = _delete_progress_rows(attempt_ids)
+        if best_result_users:
+            rebuild_best_results(best_result_users)
+        return deleted
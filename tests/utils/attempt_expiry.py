@@ -0,0 +1,90 @@
+# tests/utils/attempt_expiry.py
+"""Завершение и оценка попыток с истекшим временем (пакетами, безопасно из нескольких процессов)"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from tests.models import UserTestProgress, UserTestAnswer, QuizParticipant
+from tests.utils.best_results import record_best_results
+from tests.utils.daily_stats import record_daily_results
+from tests.utils.quiz_stats import record_attempts_completed
+
+
+def expire_overdue_attempts(batch_size=200, now=None):
+    """Закрывает и оценивает один пакет просроченных попыток, возвращает их число"""
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        overdue = UserTestProgress.objects.filter(
+            completed=False,
+            end_time__lt=now
+        ).select_related('test').order_by('end_time')
+        if connection.features.has_select_for_update_skip_locked:
+            overdue = overdue.select_for_update(skip_locked=True, of=('self',))
+        attempts = list(overdue[:batch_size])
+        if not attempts:
+            return 0
+
+        # Ответы всего пакета - одним запросом
+        answers_by_attempt = defaultdict(dict)
+        for progress_id, question_id, selected in UserTestAnswer.objects.filter(
+            progress_id__in=[attempt.id for attempt in attempts]
+        ).values_list('progress_id', 'question_id', 'selected'):
+            answers_by_attempt[progress_id][str(question_id)] = selected
+
+        closed_ids = []
+        for attempt in attempts:
+            attempt.answers = answers_by_attempt.get(attempt.id, {})
+            attempt.calculate_score()
+            # Попытка завершилась в свой дедлайн, а не в момент обхода
+            completed_at = min(attempt.end_time, now)
+            # Условный UPDATE: при параллельном запуске результат записывает тот, кто закрыл попытку первым
+            updated = UserTestProgress.objects.filter(id=attempt.id, completed=False).update(
+                completed=True,
+                completed_at=completed_at,
+                answers=attempt.answers,
+                result_snapshot=attempt.result_snapshot,
+                score=attempt.score,
+                correct_answers_count=attempt.correct_answers_count,
+                total_questions_count=attempt.total_questions_count,
+                updated_at=now,
+            )
+            if updated:
+                attempt.completed = True
+                attempt.completed_at = completed_at
+                closed_ids.append(attempt.id)
+
+        closed = [attempt for attempt in attempts if attempt.completed]
+        record_daily_results(closed)
+        record_best_results(closed)
+
+        # Участники зачетов, которых закрыли именно сейчас, - для счетчиков сессий
+        scores = {attempt.id: attempt.score for attempt in attempts}
+        participants = list(QuizParticipant.objects.filter(
+            progress_id__in=closed_ids,
+            completed_at__isnull=True
+        ).values_list('id', 'quiz_session_id', 'progress_id'))
+        if participants:
+            QuizParticipant.objects.filter(
+                id__in=[participant_id for participant_id, _, _ in participants]
+            ).update(completed_at=Subquery(
+                UserTestProgress.objects.filter(id=OuterRef('progress_id')).values('completed_at')[:1]
+            ))
+            record_attempts_completed(
+                (quiz_session_id, scores[progress_id]) for _, quiz_session_id, progress_id in participants
+            )
+
+    return len(closed_ids)
+
+
+def expire_all_overdue_attempts(batch_size=200):
+    """Закрывает все просроченные на текущий момент попытки, возвращает их число"""
+    now = timezone.now()
+    total = 0
+    while True:
+        closed = expire_overdue_attempts(batch_size=batch_size, now=now)
+        total += closed
+        if closed < batch_size:
+            return total
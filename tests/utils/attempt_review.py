@@ -0,0 +1,50 @@
+# tests/utils/attempt_review.py
+"""Разбор попытки для страниц результатов из снимка result_snapshot."""
+from tests.models import Question
+from tests.utils.answer_keys import attempt_question_ids, build_result_snapshot
+
+
+def get_result_snapshot(progress):
+    """Возвращает снимок результата попытки; для незавершенных и старых попыток
+    строит его на лету, ничего не сохраняя"""
+    if progress.completed and progress.result_snapshot:
+        return progress.result_snapshot
+    answer_key = progress.test.get_answer_key()
+    question_ids = attempt_question_ids(progress, answer_key)
+    return build_result_snapshot(answer_key, question_ids, progress.get_answers())
+
+
+def build_attempt_review(progress):
+    """Возвращает контекст разбора попытки для шаблонов результатов"""
+    snapshot = get_result_snapshot(progress)
+    questions_by_id = Question.objects.in_bulk(snapshot['question_ids'])
+
+    questions_with_order = []
+    user_answers = {}
+
+    for index, question_id in enumerate(snapshot['question_ids']):
+        question = questions_by_id.get(question_id)
+        if question is None:
+            continue
+
+        user_answers[str(question_id)] = snapshot['selected'][index]
+        questions_with_order.append({
+            'question': question,
+            'order_number': len(questions_with_order) + 1,
+            'original_number': question.question_number,
+            'correct_answers_list': snapshot['correct_options'][index],
+            'is_correct': snapshot['correct'][index] == '1'
+        })
+
+    correct_answers = snapshot['correct_count']
+    total_questions = snapshot['total']
+    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+
+    return {
+        'questions_with_order': questions_with_order,
+        'user_answers': user_answers,
+        'correct_answers': correct_answers,
+        'total_questions': total_questions,
+        'score': score,
+        'session_id': progress.quiz_session_id,
+    }
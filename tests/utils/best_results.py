@@ -0,0 +1,52 @@
+# tests/utils/best_results.py
+"""Лучшие результаты пользователей по тестам (UserBestResult) для страницы результатов группы"""
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from tests.models import UserBestResult, UserTestProgress
+
+BEST_RESULT_TYPES = ('express', 'quiz')
+
+
+def record_best_results(attempts):
+    """Учитывает завершенные попытки в лучших результатах"""
+    for attempt in attempts:
+        if attempt.test_type not in BEST_RESULT_TYPES or attempt.score is None or attempt.completed_at is None:
+            continue
+        lookup = {'user_id': attempt.user_id, 'test_id': attempt.test_id, 'test_type': attempt.test_type}
+        values = {'progress_id': attempt.id, 'score': attempt.score, 'completed_at': attempt.completed_at}
+        UserBestResult.objects.bulk_create([UserBestResult(**lookup, **values)], ignore_conflicts=True)
+        UserBestResult.objects.filter(score__lte=attempt.score, **lookup).update(**values)
+
+
+def best_attempts(attempts):
+    """Лучшая попытка по каждому (пользователь, тест, тип) из QuerySet попыток"""
+    return attempts.filter(
+        completed=True, score__isnull=False, completed_at__isnull=False, test_type__in=BEST_RESULT_TYPES
+    ).annotate(
+        rank=Window(RowNumber(), partition_by=[F('user_id'), F('test_id'), F('test_type')],
+                    order_by=[F('score').desc(), F('completed_at').desc()])
+    ).filter(rank=1).values_list('user_id', 'test_id', 'test_type', 'id', 'score', 'completed_at')
+
+
+def rebuild_best_results(user_ids=None, batch_size=2000, test_ids=None):
+    """Пересчитывает лучшие результаты (все или для пользователей и тестов). Возвращает количество строк."""
+    attempts = UserTestProgress.objects.all()
+    existing = UserBestResult.objects.all()
+    if user_ids is not None:
+        attempts = attempts.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+    if test_ids is not None:
+        attempts = attempts.filter(test_id__in=test_ids)
+        existing = existing.filter(test_id__in=test_ids)
+
+    with transaction.atomic():
+        existing.delete()
+        rows = [
+            UserBestResult(user_id=user_id, test_id=test_id, test_type=test_type,
+                           progress_id=progress_id, score=score, completed_at=completed_at)
+            for user_id, test_id, test_type, progress_id, score, completed_at in best_attempts(attempts)
+        ]
+        UserBestResult.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
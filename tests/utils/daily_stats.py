@@ -0,0 +1,214 @@
+# tests/utils/daily_stats.py
+"""Дневная статистика пользователей по тестам (UserDailyStats) для графиков"""
+from datetime import date, datetime, time, timedelta
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncDate
+from django.utils import timezone
+
+from tests.models import UserDailyStats, UserTestProgress
+from tests.utils.quiz_stats import grade_field
+
+# Счетчик оценки -> условие на результат попытки
+DAILY_GRADE_FIELDS = {
+    'grade_fail_count': Q(score__lte=50),
+    'grade_pass_count': Q(score__gt=50, score__lte=70),
+    'grade_good_count': Q(score__gt=70, score__lte=90),
+    'grade_excellent_count': Q(score__gt=90),
+}
+
+# Подписи распределения результатов на графике
+GRADE_LABELS = {
+    'grade_fail_count': '0-50%',
+    'grade_pass_count': '51-70%',
+    'grade_good_count': '71-89%',
+    'grade_excellent_count': '90-100%',
+}
+
+CHART_PERIODS = (7, 30, 60, 90, 180, 365)
+CHART_DEFAULT_DAYS = 60
+
+
+def local_day(moment):
+    """День по времени сервера (Europe/Moscow), к которому относится момент"""
+    return timezone.localtime(moment, timezone.get_default_timezone()).date()
+
+
+def _apply_increments(lookup, row):
+    return UserDailyStats.objects.filter(**lookup).update(
+        attempts_count=F('attempts_count') + row['attempts_count'],
+        score_sum=F('score_sum') + row['score_sum'],
+        score_min=Least('score_min', Value(row['score_min'])),
+        score_max=Greatest('score_max', Value(row['score_max'])),
+        **{field: F(field) + row[field] for field in DAILY_GRADE_FIELDS if row[field]}
+    )
+
+
+def record_daily_results(attempts):
+    """Добавляет завершенные попытки в дневную статистику"""
+    increments = {}
+    for attempt in attempts:
+        if attempt.score is None or attempt.completed_at is None:
+            continue
+        key = (attempt.user_id, attempt.test_id, attempt.test_type, local_day(attempt.completed_at))
+        row = increments.get(key)
+        if row is None:
+            row = increments[key] = dict(
+                attempts_count=0, score_sum=0.0, score_min=attempt.score, score_max=attempt.score,
+                **{field: 0 for field in DAILY_GRADE_FIELDS}
+            )
+        row['attempts_count'] += 1
+        row['score_sum'] += attempt.score
+        row['score_min'] = min(row['score_min'], attempt.score)
+        row['score_max'] = max(row['score_max'], attempt.score)
+        row[grade_field(attempt.score)] += 1
+
+    for (user_id, test_id, test_type, day), row in increments.items():
+        lookup = {'user_id': user_id, 'test_id': test_id, 'test_type': test_type, 'day': day}
+        if _apply_increments(lookup, row):
+            continue
+        try:
+            with transaction.atomic():
+                UserDailyStats.objects.create(**lookup, **row)
+        except IntegrityError:
+            # Строку этого дня только что создал параллельный запрос
+            _apply_increments(lookup, row)
+
+
+def remove_daily_result(attempt):
+    """Вычитает завершенную попытку из дневной статистики (перед ее повторным открытием)"""
+    if attempt.score is None or attempt.completed_at is None:
+        return
+    day = local_day(attempt.completed_at)
+    lookup = {'user_id': attempt.user_id, 'test_id': attempt.test_id, 'test_type': attempt.test_type, 'day': day}
+    rows = UserDailyStats.objects.filter(**lookup)
+    rows.update(
+        attempts_count=F('attempts_count') - 1,
+        score_sum=F('score_sum') - attempt.score,
+        **{grade_field(attempt.score): F(grade_field(attempt.score)) - 1}
+    )
+    rows.filter(attempts_count__lte=0).delete()
+
+    # Минимум и максимум не вычитаются - берем их по оставшимся попыткам этого дня
+    day_start = timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+    remaining = UserTestProgress.objects.filter(
+        user_id=attempt.user_id, test_id=attempt.test_id, test_type=attempt.test_type,
+        completed=True, score__isnull=False,
+        completed_at__gte=day_start, completed_at__lt=day_start + timedelta(days=1)
+    ).exclude(id=attempt.id).aggregate(score_min=Min('score'), score_max=Max('score'))
+    if remaining['score_min'] is not None:
+        rows.update(**remaining)
+
+
+def rebuild_daily_stats(user_ids=None, batch_size=2000):
+    """Пересчитывает дневную статистику из попыток (всю или для пользователей).
+    Возвращает количество строк."""
+    attempts = UserTestProgress.objects.filter(completed=True, score__isnull=False, completed_at__isnull=False)
+    existing = UserDailyStats.objects.all()
+    if user_ids is not None:
+        attempts = attempts.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    rows = attempts.annotate(
+        day=TruncDate('completed_at', tzinfo=timezone.get_default_timezone())
+    ).values('user_id', 'test_id', 'test_type', 'day').annotate(
+        attempts_count=Count('id'),
+        score_sum=Sum('score'),
+        score_min=Min('score'),
+        score_max=Max('score'),
+        **{field: Count('id', filter=condition) for field, condition in DAILY_GRADE_FIELDS.items()}
+    ).order_by()
+
+    with transaction.atomic():
+        existing.delete()
+        stats = [UserDailyStats(**row) for row in rows]
+        UserDailyStats.objects.bulk_create(stats, batch_size=batch_size)
+    return len(stats)
+
+
+def get_chart_window(params, today=None):
+    """Период графиков по GET-параметрам: days (из CHART_PERIODS) или
+    date_from/date_to (ГГГГ-ММ-ДД). Возвращает словарь с границами и подписью."""
+    today = today or local_day(timezone.now())
+
+    def parse(name):
+        try:
+            return date.fromisoformat(params.get(name, ''))
+        except ValueError:
+            return None
+
+    date_from, date_to = parse('date_from'), parse('date_to')
+    if date_from or date_to:
+        first_day = date_from or date(2000, 1, 1)
+        last_day = date_to or today
+        if first_day > last_day:
+            first_day, last_day = last_day, first_day
+        label = f"{first_day:%d.%m.%Y} - {last_day:%d.%m.%Y}"
+        return {'first_day': first_day, 'last_day': last_day, 'days': None, 'label': label,
+                'query': f'date_from={first_day.isoformat()}&date_to={last_day.isoformat()}'}
+
+    try:
+        days = int(params.get('days', CHART_DEFAULT_DAYS))
+    except ValueError:
+        days = CHART_DEFAULT_DAYS
+    if days not in CHART_PERIODS:
+        days = CHART_DEFAULT_DAYS
+    return {'first_day': today - timedelta(days=days), 'last_day': today, 'days': days,
+            'label': f'{days} дней', 'query': f'days={days}'}
+
+
+def build_chart_statistics(user, test_type, first_day, last_day):
+    """Данные графиков и итоговые цифры за период из дневной статистики"""
+    rows = UserDailyStats.objects.filter(user=user, day__gte=first_day, day__lte=last_day)
+    if test_type != 'all':
+        rows = rows.filter(test_type=test_type)
+
+    totals = rows.aggregate(
+        count=Sum('attempts_count'),
+        score_sum=Sum('score_sum'),
+        best=Max('score_max'),
+        worst=Min('score_min'),
+        **{field: Sum(field) for field in DAILY_GRADE_FIELDS}
+    )
+    total_tests = totals['count'] or 0
+
+    # Прогресс: средний результат по дням
+    progress_data = [
+        {'date': row['day'].isoformat(), 'score': round(row['score_sum'] / row['count'], 1)}
+        for row in rows.values('day').annotate(
+            count=Sum('attempts_count'), score_sum=Sum('score_sum')
+        ).order_by('day')
+        if row['count']
+    ]
+
+    # Результаты по тестам: средний и количество попыток
+    tests = [
+        {'test__name': row['test__name'], 'count': row['count'], 'avg_score': row['score_sum'] / row['count']}
+        for row in rows.values('test__name').annotate(
+            count=Sum('attempts_count'), score_sum=Sum('score_sum')
+        ).order_by()
+        if row['count']
+    ]
+    tests_performance = sorted(
+        ({'test': row['test__name'], 'avg_score': round(row['avg_score'], 1), 'count': row['count']} for row in tests),
+        key=lambda row: row['avg_score'], reverse=True
+    )
+    popular_tests = sorted(tests, key=lambda row: row['count'], reverse=True)[:5]
+
+    return {
+        'chart_data': {
+            'progress_data': json.dumps(progress_data),
+            'score_distribution': json.dumps({
+                label: totals[field] or 0 for field, label in GRADE_LABELS.items()
+            }),
+            'tests_performance': json.dumps(tests_performance[:10]),  # Топ-10 тестов
+            'total_tests': total_tests,
+        },
+        'total_tests': total_tests,
+        'avg_score': round(totals['score_sum'] / total_tests, 1) if total_tests else 0,
+        'best_score': round(totals['best'] or 0, 1),
+        'worst_score': round(totals['worst'] or 0, 1),
+        'popular_tests': popular_tests,
+    }
@@ -1,77 +1,288 @@
+# tests/utils/excel_importer.py
+"""Импорт теста из Excel: проверка строк файла и добавление, изменение или вывод вопросов по номеру"""
 import os
+
+from django.db import transaction
+from django.utils import timezone
 from openpyxl import load_workbook
-from django.conf import settings
-from tests.models import Test, Question
 
-def import_test_from_excel(file_path, test_name=None):
-    """
-    Импортирует тест из Excel файла
-    Формат файла:
-    - Столбец A: номер вопроса
-    - Столбец B: текст вопроса
-    - Столбец C: правильные ответы (могут быть несколько через запятую)
-    - Столбец D: ссылка на документ
-    - Столбцы E и далее: варианты ответов
-    """
+from tests.models import Question, Test, question_content_hash
+from tests.utils.answer_keys import parse_correct_answer
+
+CORRECT_ANSWER_MAX_LENGTH = Question._meta.get_field('correct_answer').max_length
+DOCUMENT_REFERENCE_MAX_LENGTH = Question._meta.get_field('document_reference').max_length
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportValidationError(ValueError):
+    """Файл не прошел проверку; report содержит все найденные ошибки"""
+
+    def __init__(self, report):
+        self.report = report
+        super().__init__(report.error_summary())
+
+
+class ImportReport:
+    """Результат чтения файла: проверенные вопросы, ошибки и предупреждения по строкам"""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.questions = []  # словари полей Question без test
+        self.errors = []
+        self.warnings = []
+        self.skipped_rows = 0
+        self.rows_read = 0
+        self.changes = None  # QuestionChanges после импорта или preview_changes
+
+    @property
+    def is_valid(self):
+        return not self.errors and bool(self.questions)
+
+    def add_error(self, row_num, message):
+        self.errors.append(f"Строка {row_num}: {message}" if row_num else message)
+
+    def add_warning(self, row_num, message):
+        self.warnings.append(f"Строка {row_num}: {message}")
+
+    def error_summary(self):
+        shown = self.errors[:MAX_REPORTED_ERRORS]
+        summary = '; '.join(shown)
+        if len(self.errors) > len(shown):
+            summary += f' и еще {len(self.errors) - len(shown)} ошибок'
+        return summary
+
+    def as_dict(self):
+        return {
+            'file_name': self.file_name,
+            'questions': len(self.questions),
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'skipped_rows': self.skipped_rows,
+            'changes': self.changes.as_dict() if self.changes else None,
+        }
+
+
+def _cell_text(row, index):
+    """Текст ячейки; целые числа, которые Excel хранит как 1.0, - без дробной части"""
+    value = row[index] if len(row) > index else None
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_row(report, row_num, row):
+    question_number = int(row[0])
+    question_text = _cell_text(row, 1)
+    correct_answer = _cell_text(row, 2) or "1"
+    document_reference = _cell_text(row, 3)
+
+    # Собираем варианты ответов (пустые ячейки пропускаются)
+    answer_options = {}
+    option_num = 1
+    for value in row[4:]:
+        if value is not None and str(value).strip():
+            answer_options[option_num] = str(value)
+            option_num += 1
+
+    errors_before = len(report.errors)
+    if question_number != row[0]:
+        report.add_error(row_num, f"номер вопроса {row[0]} не целое число")
+    elif question_number < 1:
+        report.add_error(row_num, f"номер вопроса {question_number} меньше 1")
+    if not answer_options:
+        report.add_error(row_num, "нет вариантов ответов")
+    correct = parse_correct_answer(correct_answer)
+    if not correct:
+        report.add_error(row_num, f"не удалось разобрать правильные ответы \"{correct_answer}\"")
+    elif answer_options and max(correct) > len(answer_options):
+        report.add_error(row_num, f"правильный ответ {max(correct)} больше числа вариантов ({len(answer_options)})")
+    if len(correct_answer) > CORRECT_ANSWER_MAX_LENGTH:
+        report.add_error(row_num, f"правильные ответы длиннее {CORRECT_ANSWER_MAX_LENGTH} символов")
+    if len(document_reference) > DOCUMENT_REFERENCE_MAX_LENGTH:
+        report.add_error(row_num, f"ссылка на документ длиннее {DOCUMENT_REFERENCE_MAX_LENGTH} символов")
+    if not question_text:
+        report.add_warning(row_num, "пустой текст вопроса")
+    if len(report.errors) > errors_before:
+        return None
+
+    return {
+        'question_number': question_number,
+        'question_text': question_text,
+        'correct_answer': correct_answer,
+        'document_reference': document_reference,
+        'answer_options': answer_options,
+    }
+
+
+def read_test_excel(file_path, file_name=None, progress=None, progress_every=200):
+    """Читает и проверяет файл, ничего не записывая в базу. Возвращает ImportReport.
+    Столбцы: A - номер вопроса, B - текст, C - правильные ответы через запятую,
+    D - ссылка на документ, E и далее - варианты ответов.
+    progress(прочитано строк, всего строк) вызывается каждые progress_every строк."""
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Файл {file_path} не найден")
-    
+
+    report = ImportReport(file_name or os.path.basename(file_path))
+    try:
+        workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
+    except Exception as e:
+        report.add_error(None, f"Не удалось открыть файл Excel: {e}")
+        return report
+
+    try:
+        sheet = workbook.active
+        total_rows = sheet.max_row or 0  # по размеру листа из файла, без чтения строк
+        numbers = {}
+        for row_num, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            report.rows_read = row_num
+            if progress and row_num % progress_every == 0:
+                progress(row_num, max(total_rows, row_num))
+            # Пропускаем заголовок, пустые строки и строки без номера вопроса
+            if not row or isinstance(row[0], bool) or not isinstance(row[0], (int, float)):
+                if row and any(value is not None and str(value).strip() for value in row):
+                    report.skipped_rows += 1
+                continue
+
+            question = _parse_row(report, row_num, row)
+            if question is None:
+                continue
+            number = question['question_number']
+            if number in numbers:
+                report.add_error(row_num, f"вопрос {number} уже есть в строке {numbers[number]}")
+                continue
+            numbers[number] = row_num
+            report.questions.append(question)
+    finally:
+        workbook.close()
+
+    if not report.questions and not report.errors:
+        report.add_error(None, "Не удалось импортировать ни одного вопроса из файла")
+    return report
+
+
+CONTENT_FIELDS = ('question_text', 'correct_answer', 'document_reference', 'answer_options')
+
+
+class QuestionChanges:
+    """Изменения вопросов теста при повторном импорте (списки номеров вопросов)"""
+
+    def __init__(self):
+        self.added = []
+        self.updated = []
+        self.retired = []
+        self.unchanged = 0
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.updated or self.retired)
+
+    def summary(self):
+        return (f"добавлено {len(self.added)}, изменено {len(self.updated)}, "
+                f"выведено из теста {len(self.retired)}, без изменений {self.unchanged}")
+
+    def as_dict(self):
+        return {
+            'added': self.added,
+            'updated': self.updated,
+            'retired': self.retired,
+            'unchanged': self.unchanged,
+        }
+
+
+def diff_questions(test, questions):
+    """Сравнивает вопросы файла с вопросами теста по номеру и хэшу содержимого.
+    Возвращает (QuestionChanges, новые Question, измененные Question, id выводимых)."""
+    changes = QuestionChanges()
+    current = {}
+    retired_ids = []
+    if test is not None and test.pk:
+        # Читаем только номера и хэши; при повторах номера берем действующий вопрос с большим id
+        rows = Question.objects.filter(test=test).order_by('id').values_list(
+            'id', 'question_number', 'content_hash', 'retired_at'
+        )
+        for question_id, number, content_hash, retired_at in rows:
+            previous = current.get(number)
+            if previous is not None and retired_at is not None and previous[2] is None:
+                continue
+            if previous is not None and previous[2] is None:
+                retired_ids.append(previous[0])
+                changes.retired.append(number)
+            current[number] = (question_id, content_hash, retired_at)
+
+    to_create = []
+    to_update = []
+    for question in questions:
+        number = question['question_number']
+        content_hash = question_content_hash(*(question[field] for field in CONTENT_FIELDS))
+        existing = current.pop(number, None)
+        if existing is None:
+            to_create.append(Question(test=test, content_hash=content_hash, **question))
+            changes.added.append(number)
+        elif existing[1] != content_hash or existing[2] is not None:
+            to_update.append(Question(id=existing[0], test=test, content_hash=content_hash, retired_at=None, **question))
+            changes.updated.append(number)
+        else:
+            changes.unchanged += 1
+
+    # Вопросы, которых нет в файле, выводятся из теста
+    for number, (question_id, _, retired_at) in current.items():
+        if retired_at is None:
+            retired_ids.append(question_id)
+            changes.retired.append(number)
+    changes.retired.sort()
+    return changes, to_create, to_update, retired_ids
+
+
+def sync_questions(test, questions, batch_size=1000):
+    """Приводит вопросы теста к вопросам файла (в вызывающей транзакции): добавляет
+    новые, обновляет измененные и выводит из теста отсутствующие. Id сохранившихся
+    вопросов не меняются, поэтому попытки и ответы на них остаются действительными."""
+    changes, to_create, to_update, retired_ids = diff_questions(test, questions)
+    if not changes.has_changes:
+        return changes
+
+    Question.objects.bulk_create(to_create, batch_size=batch_size)
+    Question.objects.bulk_update(
+        to_update, [*CONTENT_FIELDS, 'content_hash', 'retired_at'], batch_size=batch_size
+    )
+    Question.objects.filter(id__in=retired_ids).update(retired_at=timezone.now())
+    # bulk-операции не отправляют post_save - сбрасываем кэш ключей ответов сами
+    Test.objects.filter(id=test.id).update(answer_key_updated_at=timezone.now())
+    return changes
+
+
+def resolve_test_name(report, test_name=None):
+    """Название теста: заданное или имя файла до первой точки (как было всегда -
+    иначе повторный импорт "ПТЭ v1.2.xlsx" создал бы второй тест)"""
+    return test_name or report.file_name.split('.')[0]
+
+
+def preview_changes(report, test_name=None):
+    """Изменения, которые внесет импорт файла, без записи в базу"""
+    test = Test.objects.filter(name=resolve_test_name(report, test_name)).first()
+    report.changes = diff_questions(test, report.questions)[0]
+    return report.changes
+
+
+def import_test_from_excel(file_path, test_name=None, report=None):
+    """
+    Импортирует тест из Excel файла: проверяет все строки, затем атомарно
+    вносит изменения в вопросы теста (report.changes). При ошибках в файле
+    вызывает ImportValidationError.
+    """
+    report = report or read_test_excel(file_path)
+    if not report.is_valid:
+        raise ImportValidationError(report)
+
     # Создаем или получаем тест
-    if test_name is None:
-        test_name = os.path.basename(file_path).split('.')[0]
-    
-    test, created = Test.objects.get_or_create(name=test_name)
-    if created:
-        test.description = f"Тест импортирован из файла {os.path.basename(file_path)}"
-        test.save()
-    
-    # Очищаем существующие вопросы
-    test.questions.all().delete()
-    
-    # Загружаем Excel файл
-    wb = load_workbook(filename=file_path)
-    sheet = wb.active
-    
-    # Пропускаем заголовок если есть
-    start_row = 2 if sheet['A1'].value and 'опрос' in str(sheet['A1'].value) else 1
-    
-    questions_created = 0
-    for row_num, row in enumerate(sheet.iter_rows(min_row=start_row, values_only=True), start=start_row):
-        if not row[0] or not isinstance(row[0], (int, float)):
-            continue  # Пропускаем пустые строки или строки без номера вопроса
-        
-        question_number = int(row[0])
-        question_text = row[1] if row[1] else ""
-        
-        # Обрабатываем правильные ответы (могут быть несколько через запятую)
-        correct_answer = str(row[2]) if row[2] else "1"
-        
-        document_reference = row[3] if row[3] else ""
-        
-        # Собираем варианты ответов
-        answer_options = {}
-        option_num = 1
-        for i in range(4, len(row)):
-            if row[i] and str(row[i]).strip():
-                answer_options[option_num] = str(row[i])
-                option_num += 1
-        
-        # Проверяем, что есть варианты ответов
-        if not answer_options:
-            raise ValueError(f"В строке {row_num} нет вариантов ответов")
-        
-        # Создаем вопрос
-        Question.objects.create(
-            test=test,
-            question_number=question_number,
-            question_text=question_text,
-            correct_answer=correct_answer,
-            document_reference=document_reference,
-            answer_options=answer_options
+    test_name = resolve_test_name(report, test_name)
+
+    with transaction.atomic():
+        test, created = Test.objects.get_or_create(
+            name=test_name,
+            defaults={'description': f"Тест импортирован из файла {report.file_name}"}
         )
-        questions_created += 1
-    
-    if questions_created == 0:
-        raise ValueError("Не удалось импортировать ни одного вопроса из файла")
-    
-    return test
\ No newline at end of file
+        report.changes = sync_questions(test, report.questions)
+    return test
@@ -0,0 +1,112 @@
+# tests/utils/import_jobs.py
+"""Очередь заданий на импорт тестов, выполняемых командой process_import_jobs."""
+import logging
+
+from django.db.models import Q
+from django.utils import timezone
+
+from tests.models import TestImportJob
+from tests.utils.excel_importer import import_test_from_excel, preview_changes, read_test_excel
+
+logger = logging.getLogger(__name__)
+
+STALE_JOB_MINUTES = 30
+
+
+def queue_import(user, uploaded_file, test_name='', dry_run=False):
+    """Сохраняет загруженный файл и ставит задание в очередь"""
+    return TestImportJob.objects.create(
+        created_by=user,
+        file=uploaded_file,
+        file_name=uploaded_file.name,
+        test_name=test_name or '',
+        dry_run=dry_run,
+    )
+
+
+def claim_next_job():
+    """Забирает самое старое задание из очереди (или None)"""
+    while True:
+        job_id = TestImportJob.objects.filter(
+            status=TestImportJob.STATUS_PENDING
+        ).order_by('created_at', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = TestImportJob.objects.filter(id=job_id, status=TestImportJob.STATUS_PENDING).update(
+            status=TestImportJob.STATUS_RUNNING, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return TestImportJob.objects.get(id=job_id)
+
+
+def requeue_stale_jobs(minutes=STALE_JOB_MINUTES):
+    """Возвращает в очередь выполняющиеся задания, от обработчика которых
+    не было отметки heartbeat_at больше minutes минут"""
+    cutoff = timezone.now() - timezone.timedelta(minutes=minutes)
+    return TestImportJob.objects.filter(
+        status=TestImportJob.STATUS_RUNNING
+    ).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    ).update(status=TestImportJob.STATUS_PENDING, processed_rows=0, heartbeat_at=None)
+
+
+def touch_job(job_id, **fields):
+    """Отмечает, что обработчик задания жив (и обновляет переданные поля)"""
+    TestImportJob.objects.filter(id=job_id).update(heartbeat_at=timezone.now(), **fields)
+
+
+def _finish(job, status, message, report=None, test=None):
+    job.status = status
+    job.message = message
+    job.test = test
+    job.finished_at = timezone.now()
+    fields = ['status', 'message', 'test', 'finished_at']
+    if report is not None:
+        job.questions_count = len(report.questions)
+        job.errors = report.errors
+        job.warnings = report.warnings
+        job.changes = report.changes.as_dict() if report.changes else {}
+        # max_row в файле бывает неточным - итог берем по фактически прочитанным строкам
+        job.processed_rows = job.total_rows = report.rows_read
+        fields += ['questions_count', 'errors', 'warnings', 'changes', 'processed_rows', 'total_rows']
+    job.save(update_fields=fields)
+    # Файл больше не нужен - результат и ошибки сохранены в задании
+    job.file.delete(save=False)
+
+
+def run_import_job(job):
+    """Проверяет файл задания и (если это не проверка и ошибок нет) импортирует тест"""
+    def progress(processed_rows, total_rows):
+        touch_job(job.id, processed_rows=processed_rows, total_rows=total_rows)
+
+    try:
+        report = read_test_excel(job.file.path, file_name=job.file_name, progress=progress)
+        if not report.is_valid:
+            _finish(job, TestImportJob.STATUS_FAILED, f'Найдено ошибок: {len(report.errors)}. Тест не импортирован.', report)
+        elif job.dry_run:
+            changes = preview_changes(report, job.test_name)
+            _finish(job, TestImportJob.STATUS_DONE,
+                    f'Ошибок нет. Вопросов в файле: {len(report.questions)}; при импорте: {changes.summary()}.', report)
+        else:
+            # Запись вопросов идет одной транзакцией - отмечаемся перед ней
+            touch_job(job.id)
+            test = import_test_from_excel(job.file.path, job.test_name, report=report)
+            _finish(job, TestImportJob.STATUS_DONE,
+                    f'Тест {test.name} успешно импортирован: {report.changes.summary()}.', report, test)
+    except Exception as e:
+        logger.exception('Ошибка импорта в задании %s', job.id)
+        _finish(job, TestImportJob.STATUS_FAILED, f'Ошибка при импорте теста: {e}')
+    return job
+
+
+def process_import_jobs(limit=None):
+    """Выполняет задания из очереди (не больше limit), возвращает их количество"""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_import_job(job)
+        processed += 1
+    return processed
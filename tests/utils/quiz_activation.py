@@ -0,0 +1,40 @@
+# tests/utils/quiz_activation.py
+"""Активация наступивших зачетов одним UPDATE из команды activate_quiz_sessions."""
+from django.db import transaction
+from django.utils import timezone
+
+from tests.models import QuizSession
+from tests.utils.quiz_attempts import provision_quiz_attempts
+from tests.utils.quiz_enrollment import enroll_group
+
+
+def activate_due_sessions(now=None):
+    """Активирует все зачеты, у которых наступило время начала.
+    Возвращает количество активированных зачетов."""
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        due_ids = list(
+            QuizSession.objects.filter(is_active=False, starts_at__lte=now).values_list('id', flat=True)
+        )
+        if not due_ids:
+            return 0
+        activated = QuizSession.objects.filter(id__in=due_ids, is_active=False).update(
+            is_active=True,
+            audience_updated_at=now
+        )
+
+    # Дописываем в еще идущие зачеты тех, кто попал в группу после их создания,
+    # и заранее создаем попытки всем участникам
+    for quiz_session in QuizSession.objects.filter(id__in=due_ids, ends_at__gte=now).select_related('creator__profile', 'test'):
+        enroll_group(quiz_session)
+        provision_quiz_attempts(quiz_session)
+
+    return activated
+
+
+def next_activation_time():
+    """Время начала ближайшего еще не активированного зачета или None"""
+    return QuizSession.objects.filter(is_active=False).order_by('starts_at').values_list(
+        'starts_at', flat=True
+    ).first()
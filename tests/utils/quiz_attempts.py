@@ -0,0 +1,75 @@
+# tests/utils/quiz_attempts.py
+"""Попытки участников зачета: заранее при активации, старт одним условным UPDATE."""
+from django.db import transaction
+from django.utils import timezone
+
+from tests.models import QuizParticipant, UserTestProgress, generate_attempt_id
+from tests.utils.quiz_stats import record_attempt_started
+
+
+def quiz_question_order(quiz_session):
+    """Вопросы зачета в порядке номеров (только существующие в тесте)"""
+    answer_key = quiz_session.test.get_answer_key()
+    return sorted(
+        (question_id for question_id in quiz_session.question_order if question_id in answer_key),
+        key=lambda question_id: answer_key[question_id].number
+    )
+
+
+def provision_quiz_attempts(quiz_session, participants=None):
+    """Создает ожидающие попытки участникам зачета, у которых их еще нет.
+    Возвращает количество созданных попыток."""
+    if participants is None:
+        participants = quiz_session.participants.all()
+    question_order = quiz_question_order(quiz_session)
+
+    with transaction.atomic():
+        pending = list(participants.filter(progress__isnull=True).select_for_update())
+        if not pending:
+            return 0
+
+        attempts = UserTestProgress.objects.bulk_create([
+            UserTestProgress(
+                user_id=participant.user_id,
+                test_id=quiz_session.test_id,
+                current_question_id=question_order[0] if question_order else None,
+                completed=False,
+                answers={},
+                start_question=1,
+                end_question=quiz_session.question_count,
+                test_type='quiz',
+                time_limit_minutes=quiz_session.time_limit_minutes,
+                question_order=question_order,
+                quiz_session=quiz_session,
+                attempt_id=generate_attempt_id(participant.user_id, quiz_session.test_id),
+            )
+            for participant in pending
+        ], batch_size=500)
+
+        for participant, attempt in zip(pending, attempts):
+            participant.progress = attempt
+        QuizParticipant.objects.bulk_update(pending, ['progress'], batch_size=500)
+    return len(pending)
+
+
+def start_quiz_attempt(quiz_session, participant, now=None):
+    """Открывает ожидающую попытку участника: выставляет start_time и end_time
+    одним UPDATE. Повторное открытие ничего не меняет. Возвращает попытку."""
+    now = now or timezone.now()
+
+    if participant.progress_id is None:
+        provision_quiz_attempts(quiz_session, QuizParticipant.objects.filter(id=participant.id))
+        participant.refresh_from_db(fields=['progress'])
+
+    end_time = now + timezone.timedelta(minutes=quiz_session.time_limit_minutes)
+    started = UserTestProgress.objects.filter(
+        id=participant.progress_id,
+        start_time__isnull=True
+    ).update(start_time=now, end_time=end_time, updated_at=now)
+
+    progress = participant.progress
+    if started:
+        progress.start_time = now
+        progress.end_time = end_time
+        record_attempt_started(quiz_session.id)
+    return progress
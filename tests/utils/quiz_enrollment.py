@@ -0,0 +1,83 @@
+# tests/utils/quiz_enrollment.py
+"""Запись участников в зачеты по событиям: разность множеств и один bulk_create."""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from tests.models import QuizSession, QuizParticipant, UserProfile
+from tests.utils.quiz_stats import refresh_enrolled_counts
+
+
+def enroll_users(quiz_session, users):
+    """Записывает в зачет пользователей из QuerySet, которых там еще нет.
+    Возвращает количество добавленных участников."""
+    with transaction.atomic():
+        missing_user_ids = list(
+            users.exclude(
+                id__in=QuizParticipant.objects.filter(quiz_session=quiz_session).values('user_id')
+            ).values_list('id', flat=True).distinct()
+        )
+        QuizParticipant.objects.bulk_create(
+            [QuizParticipant(quiz_session=quiz_session, user_id=user_id) for user_id in missing_user_ids],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        if missing_user_ids:
+            refresh_enrolled_counts([quiz_session.id])
+    return len(missing_user_ids)
+
+
+def get_quiz_audience(creator):
+    """Пользователи группы создателя зачета вместе с самим создателем"""
+    group_users = creator.profile.get_group_users()
+    return User.objects.filter(Q(id__in=group_users.values('id')) | Q(id=creator.id))
+
+
+def enroll_group(quiz_session):
+    """Записывает в зачет всю группу создателя (включая создателя)"""
+    return enroll_users(quiz_session, get_quiz_audience(quiz_session.creator))
+
+
+def enroll_user_in_group_quizzes(user):
+    """Записывает пользователя во все активные зачеты, созданные в его группе.
+    Возвращает количество зачетов, в которые он добавлен."""
+    profile = user.profile
+    if not profile.department_code:
+        return 0
+
+    synced_at = timezone.now()
+    with transaction.atomic():
+        quiz_ids = list(
+            QuizSession.objects.filter(
+                QuizSession.started_filter(synced_at),
+                ends_at__gte=synced_at,
+                creator__in=profile.get_group_users().values('id')
+            ).exclude(
+                participants__user=user
+            ).values_list('id', flat=True)
+        )
+        QuizParticipant.objects.bulk_create(
+            [QuizParticipant(quiz_session_id=quiz_id, user=user) for quiz_id in quiz_ids],
+            ignore_conflicts=True,
+        )
+        refresh_enrolled_counts(quiz_ids)
+        UserProfile.objects.filter(pk=profile.pk).update(quizzes_synced_at=synced_at)
+    profile.quizzes_synced_at = synced_at
+    return len(quiz_ids)
+
+
+def sync_group_quizzes(user):
+    """Записывает пользователя в зачеты группы, только если с последней
+    синхронизации в группе создавались или активировались зачеты"""
+    profile = user.profile
+    if not profile.department_group:
+        return 0
+
+    if profile.quizzes_synced_at is not None and not QuizSession.objects.filter(
+        audience_updated_at__gt=profile.quizzes_synced_at,
+        creator__profile__department_group=profile.department_group
+    ).exists():
+        return 0
+
+    return enroll_user_in_group_quizzes(user)
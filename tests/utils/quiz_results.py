@@ -0,0 +1,125 @@
+# tests/utils/quiz_results.py
+"""Рейтинг участников сессии зачета и его постраничная выдача по ключу"""
+import base64
+import binascii
+import json
+
+from django.db.models import Avg, Case, Count, F, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils.dateparse import parse_datetime
+
+from tests.models import QuizParticipant
+
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = 500
+
+GRADE_LABELS = [
+    (50, 'неудовлетворительно'),
+    (70, 'удовлетворительно'),
+    (90, 'хорошо'),
+    (100, 'отлично'),
+]
+
+RANKING_ORDER = [
+    Case(When(completed_at__isnull=False, then=Value(0)), default=Value(1)).asc(),
+    F('progress__score').desc(nulls_last=True),
+    F('completed_at').asc(),
+    F('id').asc(),
+]
+
+
+def grade_label(score):
+    """Оценка словами для результата в процентах (границы как в шаблоне)"""
+    if score is None:
+        return None
+    for upper_bound, label in GRADE_LABELS:
+        if score <= upper_bound:
+            return label
+    return GRADE_LABELS[-1][1]
+
+
+def ranked_participants(quiz_session, user_ids=None):
+    """Участники сессии с местом в рейтинге (position), упорядоченные по нему.
+    user_ids - необязательный подзапрос, ограничивающий видимых участников."""
+    participants = QuizParticipant.objects.filter(quiz_session=quiz_session)
+    if user_ids is not None:
+        participants = participants.filter(user__in=user_ids)
+    return participants.select_related('user', 'user__profile', 'progress').annotate(
+        position=Window(RowNumber(), order_by=RANKING_ORDER)
+    ).order_by('position')
+
+
+def encode_cursor(participant, position):
+    """Ключ страницы: место и значения сортировки последнего показанного участника"""
+    score = participant.progress.score if participant.progress else None
+    completed_at = participant.completed_at.isoformat() if participant.completed_at else None
+    data = json.dumps([position, score, completed_at, participant.id])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(место, результат, время завершения, id участника) или None для первой страницы"""
+    if not token:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        position, score, completed_at, participant_id = json.loads(data)
+        completed_at = parse_datetime(completed_at) if completed_at else None
+        return int(position), (float(score) if score is not None else None), completed_at, int(participant_id)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def after_cursor(cursor):
+    """Условие "строка идет в RANKING_ORDER после строки ключа"."""
+    _, score, completed_at, participant_id = cursor
+    nothing = Q(pk__in=[])
+    if score is None:
+        lower_score, same_score = nothing, Q(progress__score__isnull=True)
+    else:
+        lower_score = Q(progress__score__lt=score) | Q(progress__score__isnull=True)
+        same_score = Q(progress__score=score)
+    if completed_at is None:
+        # Незавершившие идут последними, и время завершения у всех пустое
+        return Q(completed_at__isnull=True) & (lower_score | (same_score & Q(id__gt=participant_id)))
+    same_group = Q(completed_at__isnull=False) & (
+        lower_score | (same_score & (
+            Q(completed_at__gt=completed_at) | Q(completed_at=completed_at, id__gt=participant_id)
+        ))
+    )
+    return same_group | Q(completed_at__isnull=True)
+
+
+def get_results_page(quiz_session, user_ids=None, after=None, limit=RESULTS_PAGE_SIZE):
+    """Страница рейтинга после ключа after (из encode_cursor) - условием по значениям
+    сортировки последней показанной строки, без подсчета мест всех участников.
+    Возвращает (участники с position, ключ следующей страницы или None)."""
+    limit = max(1, min(limit, RESULTS_MAX_PAGE_SIZE))
+    cursor = decode_cursor(after)
+    participants = QuizParticipant.objects.filter(quiz_session=quiz_session)
+    if user_ids is not None:
+        participants = participants.filter(user__in=user_ids)
+    if cursor is not None:
+        participants = participants.filter(after_cursor(cursor))
+    page = list(participants.select_related('user', 'user__profile', 'progress').order_by(*RANKING_ORDER)[:limit + 1])
+
+    first_position = cursor[0] + 1 if cursor else 1
+    for index, participant in enumerate(page):
+        participant.position = first_position + index
+    next_after = encode_cursor(page[limit - 1], page[limit - 1].position) if len(page) > limit else None
+    return page[:limit], next_after
+
+
+def summarize_participants(quiz_session, user_ids=None):
+    """Итоги по участникам одним агрегирующим запросом"""
+    participants = QuizParticipant.objects.filter(quiz_session=quiz_session)
+    if user_ids is not None:
+        participants = participants.filter(user__in=user_ids)
+    completed = Q(completed_at__isnull=False)
+    summary = participants.aggregate(
+        total_count=Count('id'),
+        completed_count=Count('id', filter=completed),
+        avg_score=Avg('progress__score', filter=completed),
+    )
+    summary['avg_score'] = summary['avg_score'] or 0
+    return summary
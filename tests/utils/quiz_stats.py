@@ -0,0 +1,140 @@
+# tests/utils/quiz_stats.py
+"""Счетчики сессий зачетов в QuizSessionStats и их сверка с участниками."""
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from tests.models import QuizParticipant, QuizSessionStats
+
+# Поле счетчика оценки -> условие на результат (границы как в шаблоне результатов)
+GRADE_FIELDS = {
+    'grade_fail_count': Q(progress__score__lte=50),
+    'grade_pass_count': Q(progress__score__gt=50, progress__score__lte=70),
+    'grade_good_count': Q(progress__score__gt=70, progress__score__lte=90),
+    'grade_excellent_count': Q(progress__score__gt=90),
+}
+
+
+def grade_field(score):
+    """Имя счетчика оценки для результата в процентах"""
+    if score <= 50:
+        return 'grade_fail_count'
+    if score <= 70:
+        return 'grade_pass_count'
+    if score <= 90:
+        return 'grade_good_count'
+    return 'grade_excellent_count'
+
+
+def get_session_stats(quiz_session):
+    """Счетчики сессии; для сессий без строки счетчиков она создается пересчетом"""
+    stats = QuizSessionStats.objects.filter(quiz_session=quiz_session).first()
+    if stats is None:
+        reconcile_quiz_stats([quiz_session.id])
+        stats = QuizSessionStats.objects.get(quiz_session=quiz_session)
+    return stats
+
+
+def refresh_enrolled_counts(session_ids):
+    """Обновляет число участников сессий одним UPDATE с подзапросом.
+    bulk_create(ignore_conflicts=True) не сообщает, сколько строк вставлено,
+    поэтому число не увеличивается, а пересчитывается по индексу сессии."""
+    if not session_ids:
+        return
+    enrolled = QuizParticipant.objects.filter(
+        quiz_session_id=OuterRef('quiz_session_id')
+    ).values('quiz_session_id').annotate(total=Count('id')).values('total')
+    QuizSessionStats.objects.filter(quiz_session_id__in=session_ids).update(
+        enrolled_count=Coalesce(Subquery(enrolled), 0)
+    )
+
+
+def record_attempt_started(quiz_session_id):
+    """Участник начал попытку"""
+    QuizSessionStats.objects.filter(quiz_session_id=quiz_session_id).update(
+        started_count=F('started_count') + 1
+    )
+
+
+def record_attempts_completed(results):
+    """Участники завершили попытки. results - пары (id сессии, результат)"""
+    increments = defaultdict(lambda: defaultdict(float))
+    for quiz_session_id, score in results:
+        session_increments = increments[quiz_session_id]
+        session_increments['completed_count'] += 1
+        if score is not None:
+            session_increments['score_sum'] += score
+            session_increments[grade_field(score)] += 1
+
+    for quiz_session_id, session_increments in increments.items():
+        QuizSessionStats.objects.filter(quiz_session_id=quiz_session_id).update(**{
+            field: F(field) + (value if field == 'score_sum' else int(value))
+            for field, value in session_increments.items()
+        })
+
+
+def complete_quiz_attempt(progress):
+    """Отмечает участника зачета завершившим и обновляет счетчики.
+    Условный UPDATE гарантирует, что завершение посчитается один раз."""
+    updated = QuizParticipant.objects.filter(
+        progress_id=progress.id,
+        completed_at__isnull=True
+    ).update(completed_at=progress.completed_at)
+    if updated:
+        record_attempts_completed([(progress.quiz_session_id, progress.score)])
+    return bool(updated)
+
+
+def reopen_quiz_attempt(progress):
+    """Снимает отметку о завершении с участника, чья попытка открыта повторно,
+    и вычитает ее результат из счетчиков. Вызывается до сброса progress.score."""
+    updated = QuizParticipant.objects.filter(
+        progress_id=progress.id,
+        completed_at__isnull=False
+    ).update(completed_at=None)
+    if updated:
+        decrements = {'completed_count': F('completed_count') - 1}
+        if progress.score is not None:
+            field = grade_field(progress.score)
+            decrements.update({'score_sum': F('score_sum') - progress.score, field: F(field) - 1})
+        QuizSessionStats.objects.filter(quiz_session_id=progress.quiz_session_id).update(**decrements)
+    return bool(updated)
+
+
+def reconcile_quiz_stats(session_ids=None):
+    """Пересчитывает счетчики сессий по участникам и исправляет расхождения.
+    Возвращает количество исправленных сессий."""
+    from tests.models import QuizSession
+
+    sessions = QuizSession.objects.all()
+    if session_ids is not None:
+        sessions = sessions.filter(id__in=session_ids)
+
+    completed = Q(completed_at__isnull=False)
+    aggregates = {
+        row['quiz_session_id']: row
+        for row in QuizParticipant.objects.filter(
+            quiz_session__in=sessions
+        ).values('quiz_session_id').annotate(
+            enrolled_count=Count('id'),
+            started_count=Count('id', filter=Q(progress__start_time__isnull=False)),
+            completed_count=Count('id', filter=completed),
+            score_sum=Coalesce(Sum('progress__score', filter=completed), 0.0),
+            **{field: Count('id', filter=completed & condition) for field, condition in GRADE_FIELDS.items()}
+        )
+    }
+    counter_fields = ['enrolled_count', 'started_count', 'completed_count', 'score_sum'] + list(GRADE_FIELDS)
+
+    repaired = 0
+    for quiz_session_id in sessions.values_list('id', flat=True):
+        row = aggregates.get(quiz_session_id, {})
+        expected = {field: row.get(field, 0) for field in counter_fields}
+        stats, created = QuizSessionStats.objects.get_or_create(quiz_session_id=quiz_session_id, defaults=expected)
+        if created:
+            repaired += 1
+            continue
+        if any(round(getattr(stats, field), 6) != round(value, 6) for field, value in expected.items()):
+            QuizSessionStats.objects.filter(quiz_session_id=quiz_session_id).update(**expected)
+            repaired += 1
+    return repaired
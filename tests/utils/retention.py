@@ -0,0 +1,83 @@
+# tests/utils/retention.py
+"""Удаление старых тренировок и экспресс-тестов пакетами с архивом в JSON Lines."""
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from tests.models import UserTestProgress
+from tests.utils.attempt_cleanup import delete_attempts
+
+RETENTION_DAYS = 60
+PURGED_TEST_TYPES = ('normal', 'express')  # Зачеты хранятся бессрочно
+
+ARCHIVE_FIELDS = (
+    'id', 'attempt_id', 'user_id', 'user__username', 'test_id', 'test__name', 'test_type',
+    'start_question', 'end_question', 'question_order', 'answers', 'result_snapshot',
+    'score', 'correct_answers_count', 'total_questions_count',
+    'start_time', 'completed_at', 'created_at',
+)
+
+
+def expired_attempts(days=RETENTION_DAYS, now=None):
+    """Завершенные тренировки и экспресс-тесты старше days дней"""
+    cutoff = (now or timezone.now()) - timezone.timedelta(days=days)
+    return UserTestProgress.objects.filter(
+        completed_at__lt=cutoff,
+        test_type__in=PURGED_TEST_TYPES
+    )
+
+
+def delete_in_batches(attempts, batch_size=500, archive=None):
+    """Удаляет попытки из QuerySet пакетами по batch_size, дописывая их в
+    открытый файл archive (если передан). Возвращает (удалено, пакетов)."""
+    deleted = 0
+    batches = 0
+    while True:
+        batch_ids = list(attempts.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not batch_ids:
+            break
+        batch = UserTestProgress.objects.filter(id__in=batch_ids)
+        if archive is not None:
+            for row in batch.values(*ARCHIVE_FIELDS):
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+        deleted += delete_attempts(batch)
+        batches += 1
+        if len(batch_ids) < batch_size:
+            break
+    return deleted, batches
+
+
+def open_archive(path):
+    """Открывает архив на дозапись (.gz - со сжатием)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'at', encoding='utf-8')
+    return open(path, 'a', encoding='utf-8')
+
+
+def purge_expired_attempts(days=RETENTION_DAYS, batch_size=500, archive_path=None, dry_run=False, now=None):
+    """Удаляет (или при dry_run только считает) устаревшие попытки всех пользователей.
+    Возвращает отчет: {'cutoff', 'found', 'deleted', 'batches', 'users', 'archive'}."""
+    now = now or timezone.now()
+    attempts = expired_attempts(days, now)
+    report = {
+        'cutoff': now - timezone.timedelta(days=days),
+        'found': attempts.count(),
+        'deleted': 0,
+        'batches': 0,
+        'users': 0,
+        'archive': archive_path,
+    }
+    if not report['found']:
+        return report
+    report['users'] = attempts.values('user_id').distinct().count()
+    if dry_run:
+        return report
+
+    if archive_path:
+        with open_archive(archive_path) as archive:
+            report['deleted'], report['batches'] = delete_in_batches(attempts, batch_size, archive)
+    else:
+        report['deleted'], report['batches'] = delete_in_batches(attempts, batch_size)
+    return report
@@ -0,0 +1,49 @@
+# tests/utils/visibility.py
+"""Проверка прав руководителя на просмотр чужих результатов одним запросом."""
+from django.contrib.auth.models import User
+
+from tests.models import UserProfile
+
+
+class VisibilityScope:
+    """Область видимости результатов для одного пользователя"""
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+        self.lookup = viewer.profile.get_visibility_lookup()
+        self._decisions = {viewer.id: True}
+
+    @property
+    def has_rights(self):
+        """Есть ли у пользователя права просмотра чужих результатов"""
+        return self.lookup is not None
+
+    def can_view(self, user):
+        """Может ли пользователь видеть результаты user (User или id)"""
+        user_id = getattr(user, 'id', user)
+        if user_id not in self._decisions:
+            self._decisions[user_id] = self.has_rights and UserProfile.objects.filter(
+                user_id=user_id, **self.lookup
+            ).exists()
+        return self._decisions[user_id]
+
+    def users(self):
+        """QuerySet видимых пользователей"""
+        if not self.has_rights:
+            return User.objects.none()
+        return User.objects.filter(id__in=self.user_ids())
+
+    def user_ids(self):
+        """Подзапрос id видимых пользователей для фильтров вида user__in=..."""
+        if not self.has_rights:
+            return UserProfile.objects.none().values('user_id')
+        return UserProfile.objects.filter(**self.lookup).values('user_id')
+
+
+def get_visibility_scope(request):
+    """Область видимости текущего пользователя, вычисляемая один раз на запрос"""
+    scope = getattr(request, '_visibility_scope', None)
+    if scope is None or scope.viewer.id != request.user.id:
+        scope = VisibilityScope(request.user)
+        request._visibility_scope = scope
+    return scope
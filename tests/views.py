@@ -1,8 +1,8 @@
+import asyncio
 import json
-import tempfile
-import os
 import random
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
@@ -11,14 +11,28 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.db.models import Count, Avg  # Добавляем Avg здесь
+from django.db import transaction
+from django.db.models import Count, Avg, F, Q  # Добавляем Avg здесь
+from django.core.paginator import Paginator
 from django.utils import timezone
-from .models import UserProfile, Test, Question, UserTestProgress, QuizSession, QuizParticipant
+from .models import UserProfile, Test, Question, UserTestProgress, QuizSession, QuizParticipant, UserBestResult, TestImportJob
 from .forms import TestSelectionForm, CustomUserCreationForm, ExcelUploadForm, ExpressTestForm
 from .forms import UserEditForm, UserProfileForm, QuizCreationForm
+from .utils.answer_keys import active_question_ids, is_answer_correct, range_question_ids
+from .utils.attempt_review import build_attempt_review
+from .utils.best_results import rebuild_best_results
+from .utils.daily_stats import CHART_PERIODS, build_chart_statistics, get_chart_window, remove_daily_result
+from .utils.quiz_enrollment import enroll_users, enroll_user_in_group_quizzes, get_quiz_audience, sync_group_quizzes
+from .utils.quiz_stats import get_session_stats, reopen_quiz_attempt
+from .utils.quiz_attempts import start_quiz_attempt
+from .utils.import_jobs import queue_import
+from .utils.exports import format_datetime, full_name, table_response, xlsx_response
+from .utils.quiz_results import RESULTS_PAGE_SIZE, get_results_page, grade_label, ranked_participants, summarize_participants
+from .utils.retention import delete_in_batches
+from .utils.visibility import get_visibility_scope
 from django.utils.safestring import mark_safe
-from django.http import HttpResponse
-from openpyxl import Workbook
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET
 from django.db.models import Count, Avg, Min, Max
 from datetime import datetime, timedelta
@@ -37,106 +51,22 @@ def register_view(request):
             if hasattr(user, 'profile'):
                 user.profile.refresh_from_db()
             
-            # УЛУЧШЕННАЯ СИНХРОНИЗАЦИЯ ЗАЧЕТОВ ПРИ РЕГИСТРАЦИИ
-            from .models import QuizSession, QuizParticipant
-            from django.utils import timezone
-            
-            now = timezone.now()
-            user_profile = user.profile
-            
-            #print(f"=== ДЕТАЛЬНАЯ СИНХРОНИЗАЦИЯ ЗАЧЕТОВ ДЛЯ {user.username} ===")
-            #print(f"Код подразделения пользователя: {user_profile.department_code}")
-
-            if user_profile.department_code:
-                try:
-                    user_code = user_profile.department_code.upper().strip()
-                    #print(f"Код пользователя для синхронизации: {user_code}")
-                    
-                    # Разбираем код пользователя на уровни иерархии (БЕЗ У)
-                    user_parts = user_code.replace('У', '').split('-')
-                    user_levels = []
-                    for i in range(len(user_parts)):
-                        level_code = '-'.join(user_parts[:i+1])
-                        user_levels.append(level_code)
-                    #print(f"Уровни иерархии пользователя (без У): {user_levels}")
-
-                    # Ищем активные зачеты
-                    active_quizzes = QuizSession.objects.filter(
-                        ends_at__gte=now,
-                        is_active=True
-                    ).select_related('creator', 'test').prefetch_related('participants')
-
-                    #print(f"Найдено активных зачетов: {active_quizzes.count()}")
-
-                    # Проверяем каждый зачет на принадлежность к иерархии пользователя
-                    matching_quizzes = []
-                    for quiz in active_quizzes:
-                        creator_username = quiz.creator.username
-                        creator_code = quiz.creator.profile.department_code if hasattr(quiz.creator, 'profile') else "Нет профиля"
-                        
-                        #print(f"\n--- Зачет: {quiz.test.name} ---")
-                        #print(f"Создатель: {creator_username}")
-                        #print(f"Код создателя: {creator_code}")
-                        
-                        # Проверяем, находится ли создатель зачета в иерархии пользователя
-                        creator_in_user_hierarchy = False
-                        if creator_code:
-                            creator_code_clean = creator_code.upper().strip().replace('У', '')
-                            creator_parts = creator_code_clean.split('-')
-                            
-                            # Создаем уровни иерархии создателя (БЕЗ У)
-                            creator_levels = []
-                            for i in range(len(creator_parts)):
-                                level_code = '-'.join(creator_parts[:i+1])
-                                creator_levels.append(level_code)
-                            
-                            # Проверяем пересечение уровней иерархии (БЕЗ У)
-                            common_levels = set(user_levels) & set(creator_levels)
-                            creator_in_user_hierarchy = bool(common_levels)
-                            
-                            #print(f"Уровни создателя (без У): {creator_levels}")
-                            #print(f"Общие уровни: {common_levels}")
-                            #print(f"Создатель в иерархии пользователя: {creator_in_user_hierarchy}")
-
-                        #if creator_in_user_hierarchy:
-                            #matching_quizzes.append(quiz)
-                            #print("✓ ДОБАВЛЯЕМ: Создатель находится в иерархии пользователя")
-                        #else:
-                            #print("✗ ПРОПУСКАЕМ: Создатель не в иерархии пользователя")
-
-                    # Добавляем пользователя в найденные зачеты
-                    added_count = 0
-                    for quiz in matching_quizzes:
-                        # Проверяем, не добавлен ли уже
-                        already_participant = QuizParticipant.objects.filter(
-                            quiz_session=quiz, 
-                            user=user
-                        ).exists()
-                        
-                        if not already_participant:
-                            QuizParticipant.objects.create(
-                                quiz_session=quiz,
-                                user=user
-                            )
-                            added_count += 1
-                            print(f"✓ ПОЛЬЗОВАТЕЛЬ ДОБАВЛЕН В ЗАЧЕТ: {quiz.test.name}")
-                        else:
-                            print(f"ℹ ПОЛЬЗОВАТЕЛЬ УЖЕ УЧАСТНИК: {quiz.test.name}")
-
-                    #print(f"\n=== ИТОГ ===")
-                    #print(f"Добавлено зачетов: {added_count}")
-
-                    if added_count > 0:
-                        messages.info(request, f'Вы автоматически добавлены в {added_count} активных зачетов вашей группы.')
-                    else:
-                        messages.info(request, 'На данный момент нет активных зачетов в вашей группе.')
-                        
-                except Exception as e:
-                    print(f"Ошибка при добавлении в зачеты при регистрации: {e}")
-                    import traceback
-                    traceback.print_exc()
+            # В активные зачеты группы пользователь записывается при сохранении
+            # профиля (UserProfile.save), здесь только сообщаем результат
+            if user.profile.department_code:
+                now = timezone.now()
+                added_count = QuizParticipant.objects.filter(
+                    user=user,
+                    quiz_session__in=QuizSession.objects.filter(
+                        QuizSession.started_filter(now),
+                        ends_at__gte=now
+                    )
+                ).count()
+                if added_count > 0:
+                    messages.info(request, f'Вы автоматически добавлены в {added_count} активных зачетов вашей группы.')
+                else:
+                    messages.info(request, 'На данный момент нет активных зачетов в вашей группе.')
             else:
-                print("Код подразделения не указан - пропускаем синхронизацию зачетов")
                 messages.info(request, 'Укажите код подразделения в профиле для доступа к зачетам вашей группы.')
             
             messages.success(request, f'Добро пожаловать, {user.username}! Регистрация прошла успешно.')
@@ -169,44 +99,14 @@ def logout_view(request):
 
 @login_required
 def test_selection(request):
-    # АВТОМАТИЧЕСКАЯ СИНХРОНИЗАЦИЯ ЗАЧЕТОВ ПРИ КАЖДОМ ЗАХОДЕ
-    from .models import QuizSession, QuizParticipant
-    from django.utils import timezone
-    
+    # Синхронизация зачетов: запись выполняется только если в группе
+    # появились новые зачеты после последней синхронизации
     user = request.user
     user_profile = user.profile
     
-    now = timezone.now()
-    
     if user_profile.department_code:
         try:
-            # Находим зачеты, созданные руководителями из той же группы
-            group_users = user_profile.get_group_users()
-            
-            # Ищем активные зачеты, где создатель входит в ту же группу
-            active_quizzes = QuizSession.objects.filter(
-                ends_at__gte=now,
-                is_active=True
-            )
-            
-            # Фильтруем зачеты, где создатель в той же группе что и пользователь
-            matching_quizzes = []
-            for quiz in active_quizzes:
-                if quiz.creator in group_users:
-                    matching_quizzes.append(quiz)
-            
-            # Добавляем пользователя в найденные зачеты
-            added_count = 0
-            for quiz in matching_quizzes:
-                if not QuizParticipant.objects.filter(
-                    quiz_session=quiz, 
-                    user=user
-                ).exists():
-                    QuizParticipant.objects.create(
-                        quiz_session=quiz,
-                        user=user
-                    )
-                    added_count += 1
+            added_count = sync_group_quizzes(user)
             
             # Сообщение показываем только если добавлены новые зачеты
             # и это не первый запрос (чтобы избежать дублирования сообщений)
@@ -221,26 +121,18 @@ def test_selection(request):
     normal_form = TestSelectionForm()
     express_form = ExpressTestForm()
     
-    # Получаем НЕЗАВЕРШЕННЫЕ доступные зачеты для пользователя
-    available_quizzes = QuizSession.objects.filter(
+    # Получаем НЕЗАВЕРШЕННЫЕ доступные зачеты для пользователя: еще не закончились
+    # и пользователь их не завершил. Статус активации вычисляется в шаблоне
+    # (QuizSession.is_started) без записи в базу
+    filtered_quizzes = list(QuizSession.objects.filter(
         participants__user=request.user,
-        ends_at__gte=timezone.now()  # Только те, что еще не закончились
-    ).select_related('test').prefetch_related(
-        'participants',
-        'participants__progress'
-    ).order_by('ends_at')  # Сортируем по времени окончания (ближайшие первые)
-    
-    # Фильтруем только те зачеты, которые пользователь еще НЕ завершил
-    filtered_quizzes = []
-    for quiz in available_quizzes:
-        quiz.check_activation()  # Обновляем статус активации
-        
-        # Проверяем, завершил ли пользователь этот зачет
-        user_participant = quiz.participants.filter(user=request.user).first()
-        if user_participant and user_participant.progress and user_participant.progress.completed:
-            continue  # Пропускаем завершенные зачеты
-        
-        filtered_quizzes.append(quiz)
+        ends_at__gte=timezone.now()
+    ).exclude(
+        id__in=QuizParticipant.objects.filter(
+            user=request.user,
+            progress__completed=True
+        ).values('quiz_session_id')
+    ).select_related('test').order_by('ends_at'))  # Сортируем по времени окончания (ближайшие первые)
     
     if request.method == 'POST':
         # Определяем, какая форма была отправлена
@@ -259,18 +151,10 @@ def test_selection(request):
                         'express_form': express_form
                     })
                 
-                # Получаем вопросы в выбранном диапазоне
-                questions_query = test.questions.all()
-                
-                if start_question:
-                    questions_query = questions_query.filter(question_number__gte=start_question)
-                
-                if end_question:
-                    questions_query = questions_query.filter(question_number__lte=end_question)
+                # Получаем id вопросов в выбранном диапазоне из ключа ответов
+                question_ids = range_question_ids(test.get_answer_key(), start_question, end_question)
                 
-                questions = list(questions_query)
-                
-                if not questions:
+                if not question_ids:
                     form.add_error(None, "В выбранном диапазоне нет вопросов")
                     return render(request, 'tests/test_selection.html', {
                         'normal_form': form,
@@ -281,12 +165,13 @@ def test_selection(request):
                 progress = UserTestProgress.objects.create(
                     user=request.user,
                     test=test,
-                    current_question=questions[0],
+                    current_question_id=question_ids[0],
                     completed=False,
                     answers={},
                     start_question=start_question,
                     end_question=end_question,
-                    test_type='normal'
+                    test_type='normal',
+                    question_order=question_ids
                 )
                 
                 # Сохраняем ID попытки в сессии
@@ -294,7 +179,6 @@ def test_selection(request):
                 request.session['question_range'] = {
                     'start': start_question,
                     'end': end_question,
-                    'question_ids': [q.id for q in questions],
                     'test_type': 'normal'
                 }
                 
@@ -306,10 +190,11 @@ def test_selection(request):
                 test = form.cleaned_data['test']
                 question_count = form.cleaned_data['question_count']
                 
-                # Получаем все вопросы теста
-                all_questions = list(test.questions.all())
+                # Получаем все вопросы теста из ключа ответов
+                answer_key = test.get_answer_key()
+                all_question_ids = active_question_ids(answer_key)
                 
-                if not all_questions:
+                if not all_question_ids:
                     form.add_error(None, "В выбранном тесте нет вопросов")
                     return render(request, 'tests/test_selection.html', {
                         'normal_form': normal_form,
@@ -317,27 +202,27 @@ def test_selection(request):
                     })
                 
                 # Проверяем, что запрашиваемое количество не превышает доступное
-                if question_count > len(all_questions):
-                    question_count = len(all_questions)
-                    messages.info(request, f"В тесте только {len(all_questions)} вопросов. Будет использовано максимальное количество.")
+                if question_count > len(all_question_ids):
+                    question_count = len(all_question_ids)
+                    messages.info(request, f"В тесте только {len(all_question_ids)} вопросов. Будет использовано максимальное количество.")
                 
                 # Выбираем случайные вопросы
-                random_questions = random.sample(all_questions, question_count)
+                random_question_ids = random.sample(all_question_ids, question_count)
                 
                 # Сортируем по номеру вопроса для удобства
-                random_questions.sort(key=lambda x: x.question_number)
+                random_question_ids.sort(key=lambda question_id: answer_key[question_id].number)
                 
                 # Вместо update_or_create создаем новую запись
                 progress = UserTestProgress.objects.create(
                     user=request.user,
                     test=test,
-                    current_question=random_questions[0],
+                    current_question_id=random_question_ids[0],
                     completed=False,
                     answers={},
                     start_question=1,
                     end_question=question_count,
                     test_type='express',
-                    question_order=[q.id for q in random_questions]  # Сохраняем порядок вопросов
+                    question_order=random_question_ids  # Сохраняем порядок вопросов
                 )
                 
                 # Сохраняем ID попытки в сессии
@@ -345,44 +230,31 @@ def test_selection(request):
                 request.session['question_range'] = {
                     'start': 1,
                     'end': question_count,
-                    'question_ids': [q.id for q in random_questions],
                     'test_type': 'express'
                 }
                 
                 messages.success(request, f"Экспресс-тест начат! Случайно выбрано {question_count} вопросов.")
                 return redirect('test_progress', test_id=test.id)
     
-    # Получаем все активные (незавершенные) попытки
+    # Получаем все активные (незавершенные) попытки вместе с числом ответов;
+    # заранее созданные и еще не открытые попытки зачетов не показываем
     active_progress = UserTestProgress.objects.filter(
         user=request.user,
         completed=False
-    ).select_related('test').order_by('-created_at')
+    ).exclude(
+        test_type='quiz',
+        start_time__isnull=True
+    ).select_related('test').annotate(
+        answered_count=Count('answer_records')
+    ).order_by('-created_at')
     
     # Создаем список для хранения информации о прогрессе
     progress_info = []
     for progress in active_progress:
-        # Получаем вопросы в диапазоне для этого теста
-        questions_query = progress.test.questions.all()
-        
-        if progress.start_question:
-            questions_query = questions_query.filter(question_number__gte=progress.start_question)
-        
-        if progress.end_question:
-            questions_query = questions_query.filter(question_number__lte=progress.end_question)
-        
-        questions_in_range = list(questions_query)
-        total_in_range = len(questions_in_range)
-        
-        # Считаем количество отвеченных вопросов в диапазоне
-        answered_in_range = 0
-        for question in questions_in_range:
-            if str(question.id) in progress.answers:
-                answered_in_range += 1
-        
         progress_info.append({
             'progress': progress,
-            'total_in_range': total_in_range,
-            'answered_in_range': answered_in_range
+            'total_in_range': len(progress.get_question_ids()),
+            'answered_in_range': progress.answered_count
         })
     
     return render(request, 'tests/test_selection.html', {
@@ -403,7 +275,9 @@ def test_progress(request, test_id):
         return redirect('test_selection')
     
     try:
-        progress = UserTestProgress.objects.get(attempt_id=attempt_id, user=request.user, test=test)
+        progress = UserTestProgress.objects.select_related('current_question').get(
+            attempt_id=attempt_id, user=request.user, test=test
+        )
     except UserTestProgress.DoesNotExist:
         messages.error(request, 'Прогресс теста не найден. Пожалуйста, начните тест заново.')
         return redirect('test_selection')
@@ -428,41 +302,29 @@ def test_progress(request, test_id):
             messages.error(request, 'Время зачета истекло!')
             return redirect('test_results', test_id=test_id)
     
-    # Получаем сохраненный диапазон вопросов из сессии
-    question_range = request.session.get('question_range', {})
-    question_ids = question_range.get('question_ids', [])
-    test_type = question_range.get('test_type', 'normal')
-    
-    if question_ids:
-        # Используем вопросы из диапазона
-        questions = Question.objects.filter(id__in=question_ids).order_by('question_number')
-        total_questions = len(question_ids)
-    else:
-        # Используем все вопросы
-        questions = test.questions.all()
-        total_questions = test.questions.count()
+    test_type = progress.test_type
     
     # Если тест завершен, но пользователь хочет начать заново, сбрасываем прогресс
     if progress.completed and 'restart' not in request.GET:
         return redirect('test_results', test_id=test_id)
     
+    # Курсор попытки: позиция в неизменяемой последовательности вопросов
+    question_ids = progress.get_question_sequence()
+    total_questions = len(question_ids)
+    if not total_questions:
+        messages.error(request, 'В попытке нет вопросов. Пожалуйста, начните тест заново.')
+        return redirect('test_selection')
+    
+    position = min(progress.current_position, total_questions - 1)
     current_question = progress.current_question
-
-    # Находим порядковый номер вопроса в выбранном диапазоне
-    if question_ids:
-        question_list = list(questions)
-        try:
-            question_index = question_list.index(current_question) + 1
-        except ValueError:
-            # Если текущий вопрос не входит в диапазон, начинаем с первого
-            progress.current_question = questions.first()
-            progress.save()
-            current_question = progress.current_question
-            question_index = 1
-        total_questions = len(question_list)
-    else:
-        question_index = current_question.question_number
-        total_questions = test.questions.count()
+    if current_question is None or current_question.id != question_ids[position]:
+        # Курсор и текущий вопрос разошлись - загружаем вопрос по позиции
+        current_question = Question.objects.filter(id=question_ids[position]).first()
+        if current_question is None:
+            messages.error(request, 'Вопрос теста не найден. Пожалуйста, начните тест заново.')
+            return redirect('test_selection')
+        progress.move_to_position(position)
+    question_index = position + 1
     
     # Рассчитываем оставшееся время для зачета
     time_left = None
@@ -492,35 +354,20 @@ def test_progress(request, test_id):
             
             selected_answers = [int(answer) for answer in selected_answers]
             
-            # Получаем правильные ответы
-            correct_answers = [int(ans.strip()) for ans in current_question.correct_answer.split(',')]
+            # Получаем правильные ответы из ключа теста
+            answer_key = test.get_answer_key().get(current_question.id)
+            correct_answers = sorted(answer_key.correct) if answer_key else []
             
-            # Сохраняем ответ
-            progress.answers[str(current_question.id)] = selected_answers
-            progress.save()
+            # Сохраняем ответ одной строкой, не переписывая всю попытку
+            progress.record_answer(current_question.id, selected_answers)
             
             # Проверяем правильность ответа
-            is_correct = set(selected_answers) == set(correct_answers)
+            is_correct = is_answer_correct(answer_key, selected_answers)
             
-            # Получаем следующий вопрос
-            if question_ids:
-                # Используем порядок вопросов из диапазона
-                question_list = list(questions)
-                current_index = question_list.index(current_question)
-                if current_index + 1 < len(question_list):
-                    next_question = question_list[current_index + 1]
-                else:
-                    next_question = None
-            else:
-                # Используем обычный порядок вопросов
-                next_question = test.questions.filter(
-                    question_number__gt=current_question.question_number
-                ).first()
-            
-            # Если есть следующий вопрос, обновляем текущий вопрос в прогрессе
-            if next_question:
-                progress.current_question = next_question
-                progress.save()
+            # Следующий вопрос - просто следующая позиция курсора
+            has_next_question = position + 1 < total_questions
+            if has_next_question:
+                progress.move_to_position(position + 1)
 
             # Рассчитываем оставшееся время для зачета
             time_left = None
@@ -543,7 +390,7 @@ def test_progress(request, test_id):
                 'answer_options': current_question.answer_options,
                 'document_reference': current_question.document_reference,
                 'test': test,
-                'next_question': next_question,
+                'next_question': has_next_question,
                 'question_text': current_question.question_text,
                 'is_quiz': is_quiz,
                 'time_left': time_left,
@@ -565,6 +412,8 @@ def test_progress(request, test_id):
         'test_type': test_type,
         'is_quiz': is_quiz,
         'time_left': time_left,
+        'timer_stream': is_quiz and timer_stream_available(request),
+        'available_questions': len(active_question_ids(test.get_answer_key())),
     })
 
 
@@ -585,135 +434,28 @@ def test_results(request, test_id):
         return redirect('statistics')
     
     try:
-        progress = UserTestProgress.objects.get(attempt_id=attempt_id, user=request.user, test=test)
+        progress = UserTestProgress.objects.select_related('test').get(attempt_id=attempt_id, user=request.user, test=test)
     except UserTestProgress.DoesNotExist:
         messages.error(request, 'Результаты теста не найдены. Возможно, сессия устарела.')
         return redirect('statistics')
     
-    # Получаем вопросы на основе типа теста
-    if progress.test_type == 'express' or progress.test_type == 'quiz':
-        # Для экспресс-теста и зачета используем сохраненный порядок вопросов
-        question_range = request.session.get('question_range', {})
-        question_ids = question_range.get('question_ids', [])
-        
-        if question_ids:
-            # Получаем вопросы в том порядке, в котором они были в тесте
-            questions = []
-            for q_id in question_ids:
-                try:
-                    question = Question.objects.get(id=q_id, test=test)
-                    questions.append(question)
-                except Question.DoesNotExist:
-                    continue
-            total_questions = len(questions)
-        else:
-            # Если в сессии нет данных, используем сохраненный порядок из базы
-            if progress.question_order:
-                question_ids = progress.question_order
-                questions = []
-                for q_id in question_ids:
-                    try:
-                        question = Question.objects.get(id=q_id, test=test)
-                        questions.append(question)
-                    except Question.DoesNotExist:
-                        continue
-                total_questions = len(questions)
-            else:
-                # Если порядок не сохранен, используем вопросы по порядку номеров
-                questions_query = test.questions.all()
-                if progress.start_question:
-                    questions_query = questions_query.filter(question_number__gte=progress.start_question)
-                if progress.end_question:
-                    questions_query = questions_query.filter(question_number__lte=progress.end_question)
-                questions = list(questions_query.order_by('question_number'))
-                total_questions = len(questions)
-    else:
-        # Для обычного теста используем реальный диапазон из прогресса
-        questions_query = test.questions.all()
-        if progress.start_question:
-            questions_query = questions_query.filter(question_number__gte=progress.start_question)
-        if progress.end_question:
-            questions_query = questions_query.filter(question_number__lte=progress.end_question)
-        questions = list(questions_query.order_by('question_number'))
-        total_questions = len(questions)
-    
-    # Создаем список вопросов с их порядковыми номерами в тесте
-    questions_with_order = []
-    correct_answers = 0
-    user_answers = {}
-    
-    for i, question in enumerate(questions, 1):
-        user_answer = progress.answers.get(str(question.id), [])
-        user_answers[str(question.id)] = user_answer
-        
-        # ПРАВИЛЬНОЕ ПРЕОБРАЗОВАНИЕ ПРАВИЛЬНЫХ ОТВЕТОВ
-        correct_answers_list = []
-        try:
-            # Обрабатываем случай, когда correct_answer может быть пустым или содержать нечисловые значения
-            if question.correct_answer:
-                correct_parts = question.correct_answer.split(',')
-                for part in correct_parts:
-                    part = part.strip()
-                    if part.isdigit():  # Проверяем, что часть является числом
-                        correct_answers_list.append(int(part))
-        except (ValueError, AttributeError):
-            correct_answers_list = []
-        
-        # ПРАВИЛЬНАЯ ПРОВЕРКА СОВПАДЕНИЯ ОТВЕТОВ
-        # Преобразуем user_answer в множество чисел для сравнения
-        user_answer_set = set(int(ans) for ans in user_answer if str(ans).isdigit())
-        correct_answers_set = set(correct_answers_list)
-        
-        is_correct = user_answer_set == correct_answers_set
-        if is_correct:
-            correct_answers += 1
-        
-        questions_with_order.append({
-            'question': question,
-            'order_number': i,
-            'original_number': question.question_number,
-            'correct_answers_list': correct_answers_list,
-            'is_correct': is_correct
-        })
-    
-    # ВЫЧИСЛЯЕМ РЕЗУЛЬТАТ ПОСЛЕ подсчета правильных ответов
-    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-    
-    # Обновляем результат в прогресс теста (если еще не обновлено)
+    # Завершаем попытку: save() фиксирует снимок ответов, считает результат
+    # и для зачета отмечает участника в счетчиках сессии
     if not progress.completed:
-        progress.score = score  # Теперь переменная score определена
-        progress.correct_answers_count = correct_answers
-        progress.total_questions_count = total_questions
         progress.completed = True
-        progress.completed_at = timezone.now()
         progress.save()
-  
-    # ОБНОВЛЯЕМ СТАТУС УЧАСТНИКА ЗАЧЕТА, если это зачет
-    if progress.quiz_session:
-        try:
-            participant = QuizParticipant.objects.get(
-                quiz_session=progress.quiz_session,
-                user=request.user,
-                progress=progress
-            )
-            # Используем метод update_completion_status если он есть, или напрямую обновляем
-            if hasattr(participant, 'update_completion_status'):
-                participant.update_completion_status()
-            else:
-                if participant.progress and participant.progress.completed and not participant.completed_at:
-                    participant.completed_at = participant.progress.completed_at
-                    participant.save()
-        except QuizParticipant.DoesNotExist:
-            pass  # Это не зачет или участник не найден
+    
+    # Разбор попытки: все вопросы одним запросом, правильность по ключу ответов
+    review = build_attempt_review(progress)
     
     return render(request, 'tests/test_results.html', {
         'test': test,
         'progress': progress,
-        'correct_answers': correct_answers,
-        'total_questions': total_questions,
-        'score': score,
-        'questions_with_order': questions_with_order,
-        'user_answers': user_answers,
+        'correct_answers': review['correct_answers'],
+        'total_questions': review['total_questions'],
+        'score': review['score'],
+        'questions_with_order': review['questions_with_order'],
+        'user_answers': review['user_answers'],
         'test_type': progress.test_type
     })
 
@@ -733,8 +475,7 @@ def save_answer(request):
             test=question.test
         )
         
-        progress.answers[str(question_id)] = answer
-        progress.save()
+        progress.record_answer(question.id, answer)
         
         return JsonResponse({'status': 'success'})
     except Exception as e:
@@ -751,27 +492,33 @@ def reset_test_progress(request, test_id):
     if attempt_id:
         try:
             progress = UserTestProgress.objects.get(attempt_id=attempt_id, user=request.user, test=test)
+            was_completed = progress.completed
             
-            # Получаем вопросы в выбранном диапазоне
-            questions_query = test.questions.all()
-            
-            if progress.start_question:
-                questions_query = questions_query.filter(question_number__gte=progress.start_question)
-            
-            if progress.end_question:
-                questions_query = questions_query.filter(question_number__lte=progress.end_question)
-            
-            questions = list(questions_query)
-            
-            # Сбрасываем прогресс
-            progress.current_question = questions[0] if questions else test.questions.first()
-            progress.completed = False
-            progress.answers = {}
-            progress.score = None
-            progress.correct_answers_count = None
-            progress.total_questions_count = None
-            progress.completed_at = None
-            progress.save()
+            with transaction.atomic():
+                # Результат повторно открытой попытки убираем из дневной статистики;
+                # при новом завершении он будет добавлен заново
+                if was_completed:
+                    remove_daily_result(progress)
+                    # Участник зачета снова считается незавершившим
+                    if progress.quiz_session_id:
+                        reopen_quiz_attempt(progress)
+                
+                # Сбрасываем прогресс: курсор возвращается к первому вопросу попытки
+                question_ids = progress.get_question_sequence()
+                progress.current_position = 0
+                progress.current_question_id = question_ids[0] if question_ids else None
+                progress.completed = False
+                progress.clear_answers()
+                progress.score = None
+                progress.correct_answers_count = None
+                progress.total_questions_count = None
+                progress.completed_at = None
+                progress.result_snapshot = None
+                progress.save()
+                
+                # Лучший результат мог ссылаться на эту попытку
+                if was_completed:
+                    rebuild_best_results(user_ids=[request.user.id], test_ids=[test.id])
             
             # Обновляем сессию
             request.session['current_attempt_id'] = progress.attempt_id
@@ -799,33 +546,65 @@ def upload_test_excel(request):
             # Проверяем расширение файла
             if not excel_file.name.endswith(('.xlsx', '.xls')):
                 messages.error(request, 'Файл должен быть в формате Excel (.xlsx или .xls)')
-                return render(request, 'tests/upload_excel.html', {'form': form})
-            
-            # Сохраняем файл временно
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                for chunk in excel_file.chunks():
-                    tmp_file.write(chunk)
-                tmp_file_name = tmp_file.name
+                return render(request, 'tests/upload_excel.html', {'form': form, 'jobs': recent_import_jobs(request.user)})
             
-            try:
-                # Импортируем тест
-                from .excel_importer import import_test_from_excel
-                test = import_test_from_excel(tmp_file_name, test_name)
-                messages.success(request, f'Тест {test.name} успешно импортирован! Создано {test.questions.count()} вопросов.')
-            except Exception as e:
-                messages.error(request, f'Ошибка при импорте теста: {str(e)}')
-            finally:
-                # Удаляем временный файл
-                try:
-                    os.unlink(tmp_file_name)
-                except:
-                    pass  # Игнорируем ошибки удаления временного файла
-                
-            return redirect('test_selection')
+            # Импорт (или проверка) выполняется командой process_import_jobs вне запроса
+            job = queue_import(request.user, excel_file, test_name, dry_run=form.cleaned_data.get('dry_run'))
+            return redirect('import_job_detail', job_id=job.id)
     else:
         form = ExcelUploadForm()
     
-    return render(request, 'tests/upload_excel.html', {'form': form})
+    return render(request, 'tests/upload_excel.html', {'form': form, 'jobs': recent_import_jobs(request.user)})
+
+MAX_SHOWN_IMPORT_ROWS = 200
+
+
+def recent_import_jobs(user, limit=10):
+    """Последние задания на импорт пользователя для страницы загрузки"""
+    return TestImportJob.objects.filter(created_by=user).order_by('-created_at')[:limit]
+
+
+def import_job_status_data(job):
+    return {
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'percent': job.percent,
+        'processed_rows': job.processed_rows,
+        'total_rows': job.total_rows,
+        'questions_count': job.questions_count,
+        'errors_count': len(job.errors),
+        'warnings_count': len(job.warnings),
+        'message': job.message,
+        'test_id': job.test_id,
+        'finished': job.is_finished,
+    }
+
+
+@login_required
+def import_job_detail(request, job_id):
+    if not request.user.is_staff:
+        messages.error(request, 'У вас нет прав для загрузки тестов')
+        return redirect('test_selection')
+    
+    job = get_object_or_404(TestImportJob.objects.select_related('test'), id=job_id)
+    return render(request, 'tests/import_job.html', {
+        'job': job,
+        'errors': job.errors[:MAX_SHOWN_IMPORT_ROWS],
+        'warnings': job.warnings[:MAX_SHOWN_IMPORT_ROWS],
+        'max_shown_rows': MAX_SHOWN_IMPORT_ROWS,
+    })
+
+
+@login_required
+@require_GET
+def import_job_status(request, job_id):
+    """Ход выполнения задания для опроса со страницы задания"""
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Доступ запрещен'}, status=403)
+    
+    job = get_object_or_404(TestImportJob, id=job_id)
+    return JsonResponse(import_job_status_data(job))
+
 
 # tests/views.py - обновим функцию manage_tests
 @login_required
@@ -837,7 +616,9 @@ def manage_tests(request):
             messages.error(request, 'У вас нет прав для управления тестами')
             return redirect('test_selection')
     
-    tests = Test.objects.all().annotate(question_count=Count('questions'))
+    tests = Test.objects.all().annotate(
+        question_count=Count('questions', filter=Q(questions__retired_at__isnull=True))
+    )
     
     if request.method == 'POST':
         test_id = request.POST.get('test_id')
@@ -886,34 +667,23 @@ def export_test_excel(request, test_id):
     
     test = get_object_or_404(Test, id=test_id)
     
-    # Создаем Excel файл
-    wb = Workbook()
-    ws = wb.active
-    ws.title = test.name[:31]  # Ограничение длины названия листа в Excel
-    
-    # Заголовки не нужны для этого формата
-    # Данные
-    row_num = 1
-    for question in test.questions.all().order_by('question_number'):
-        # Добавляем номер вопроса и текст
-        ws.append([question.question_number, question.question_text])
-        
-        # Добавляем варианты ответов каждый в отдельной строке
-        for option_num, option_text in sorted(question.answer_options.items()):
-            ws.append([None, f"{option_num}. {option_text}"])
-        
-        # Добавляем пустую строку между вопросами
-        ws.append([None, None])
-        row_num += len(question.answer_options) + 3
-    
-    # Создаем HTTP response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="Тест_{test.name}.xlsx"'
+    # Заголовки не нужны для этого формата (его же читает импорт)
+    def rows():
+        questions = test.questions.filter(retired_at__isnull=True).order_by('question_number').values_list(
+            'question_number', 'question_text', 'answer_options'
+        )
+        for question_number, question_text, answer_options in questions.iterator():
+            # Добавляем номер вопроса и текст
+            yield [question_number, question_text]
+            
+            # Добавляем варианты ответов каждый в отдельной строке
+            for option_num, option_text in sorted(answer_options.items()):
+                yield [None, f"{option_num}. {option_text}"]
+            
+            # Добавляем пустую строку между вопросами
+            yield [None, None]
     
-    wb.save(response)
-    return response
+    return xlsx_response(f'Тест_{test.name}', [(test.name, None, rows())])
 
 # tests/views.py - обновим функцию export_answers_excel
 @login_required
@@ -925,33 +695,14 @@ def export_answers_excel(request, test_id):
     
     test = get_object_or_404(Test, id=test_id)
     
-    # Создаем Excel файл
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Ответы"[:31]  # Ограничение длины названия листа в Excel
-    
-    # Заголовки
-    headers = ['Номер вопроса', 'Текст вопроса', 'Правильные ответы']
-    ws.append(headers)
-    
-    # Данные
-    for question in test.questions.all().order_by('question_number'):
-        row = [
-            question.question_number,
-            question.question_text,
-            question.correct_answer
-        ]
-        
-        ws.append(row)
-    
-    # Создаем HTTP response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    questions = test.questions.filter(retired_at__isnull=True).order_by('question_number').values_list(
+        'question_number', 'question_text', 'correct_answer'
+    )
+    return table_response(
+        request.GET.get('format'), f'Ответы_{test.name}', 'Ответы',
+        ['Номер вопроса', 'Текст вопроса', 'Правильные ответы'],
+        questions.iterator()
     )
-    response['Content-Disposition'] = f'attachment; filename="Ответы_{test.name}.xlsx"'
-    
-    wb.save(response)
-    return response
 
 @login_required
 def profile(request):
@@ -1018,11 +769,12 @@ def statistics(request):
 def reset_statistics(request):
     """Сброс статистики пользователя (только тренировки и экспресс-тесты, зачеты не удаляются)"""
     # Удаляем только тренировки и экспресс-тесты, зачеты оставляем
-    deleted_count = UserTestProgress.objects.filter(
+    deleted_count, _ = delete_in_batches(UserTestProgress.objects.filter(
         user=request.user,
         completed=True,
         test_type__in=['normal', 'express']  # Только обычные тесты и экспресс-тесты
-    ).delete()[0]
+    ))
+    request.user.daily_stats.filter(test_type__in=['normal', 'express']).delete()
     
     messages.success(request, f'Статистика сброшена. Удалено записей: {deleted_count}. Зачеты сохранены.')
     return redirect('statistics')
@@ -1051,7 +803,14 @@ def delete_test_progress(request, test_id):
                     del request.session['question_range']
             
             # Удаляем прогресс (только для тренировок и экспресс-тестов)
-            progress.delete()
+            with transaction.atomic():
+                # Вычитаем попытку из дневной статистики: полный пересчет потерял бы
+                # историю попыток, уже удаленных purge_old_attempts
+                if progress.completed:
+                    remove_daily_result(progress)
+                progress.delete()
+                if progress.completed:
+                    rebuild_best_results(user_ids=[request.user.id], test_ids=[test.id])
             messages.success(request, f'Прогресс по тесту "{test.name}" был удален.')
             
         except UserTestProgress.DoesNotExist:
@@ -1062,6 +821,24 @@ def delete_test_progress(request, test_id):
     return redirect('test_selection')
 
 
+# Строк на странице каждой таблицы результатов группы
+GROUP_RESULTS_PAGE_SIZE = 50
+
+
+def filter_group_results(request, results):
+    """Фильтры страницы результатов группы (тест, период) для лучших результатов или попыток"""
+    test_filter = request.GET.get('test')
+    if test_filter:
+        results = results.filter(test_id=test_filter)
+    date_from = request.GET.get('date_from')
+    date_to = request.GET.get('date_to')
+    if date_from:
+        results = results.filter(completed_at__gte=date_from)
+    if date_to:
+        results = results.filter(completed_at__lte=date_to)
+    return results
+
+
 @login_required
 def group_results(request):
     """Просмотр результатов тестов пользователей в группе - лучшие результаты по каждому тесту отдельно"""
@@ -1073,149 +850,119 @@ def group_results(request):
         return redirect('profile')
     
     # Получаем пользователей, чьи результаты можно просматривать
-    viewable_users = user_profile.get_viewable_users_query()
-    
-    # Базовый запрос для завершенных ЭКСПРЕСС-тестов
-    completed_tests = UserTestProgress.objects.filter(
-        user__in=viewable_users,
-        completed=True,
-        score__isnull=False,
-        test_type='express'  # ТОЛЬКО экспресс-тесты
-    ).select_related('user', 'test').order_by('-completed_at')
-    
-    # Базовый запрос для завершенных ЗАЧЕТОВ
-    quiz_results = UserTestProgress.objects.filter(
-        user__in=viewable_users,
-        completed=True,
-        score__isnull=False,
-        test_type='quiz'  # ТОЛЬКО зачеты
-    ).select_related('user', 'test', 'quiz_session').order_by('-completed_at')
-    
-    # Фильтрация по тесту, если указан
-    test_filter = request.GET.get('test')
-    if test_filter:
-        completed_tests = completed_tests.filter(test_id=test_filter)
-        quiz_results = quiz_results.filter(test_id=test_filter)  # ПРИМЕНЯЕМ ФИЛЬТР К ЗАЧЕТАМ
-    
-    # Фильтрация по дате
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    if date_from:
-        completed_tests = completed_tests.filter(completed_at__gte=date_from)
-        quiz_results = quiz_results.filter(completed_at__gte=date_from)  # ПРИМЕНЯЕМ ФИЛЬТР К ЗАЧЕТАМ
-    if date_to:
-        completed_tests = completed_tests.filter(completed_at__lte=date_to)
-        quiz_results = quiz_results.filter(completed_at__lte=date_to)  # ПРИМЕНЯЕМ ФИЛЬТР К ЗАЧЕТАМ
-    
-    # Собираем лучшие результаты для каждого пользователя и КАЖДОГО теста отдельно (ЭКСПРЕСС-ТЕСТЫ)
-    best_results_dict = {}
-    
-    for test_progress in completed_tests:
-        user_id = test_progress.user.id
-        test_id = test_progress.test.id
-        
-        # Ключ: пользователь + тест (для каждого теста отдельно)
-        key = f"{user_id}_{test_id}"
-        
-        # Если у пользователя еще нет результата по этому тесту или текущий результат лучше
-        if key not in best_results_dict:
-            best_results_dict[key] = test_progress
-        else:
-            # Сравниваем результаты - берем лучший
-            existing_progress = best_results_dict[key]
-            if test_progress.score > existing_progress.score:
-                best_results_dict[key] = test_progress
-    
-    # Преобразуем словарь обратно в список
-    best_results = list(best_results_dict.values())
-    
-    # Собираем лучшие результаты зачетов для каждого пользователя и КАЖДОГО теста отдельно
-    best_quiz_results_dict = {}
-    
-    for quiz_progress in quiz_results:
-        user_id = quiz_progress.user.id
-        test_id = quiz_progress.test.id
-        
-        key = f"{user_id}_{test_id}"
-        
-        if key not in best_quiz_results_dict:
-            best_quiz_results_dict[key] = quiz_progress
-        else:
-            existing_progress = best_quiz_results_dict[key]
-            if quiz_progress.score > existing_progress.score:
-                best_quiz_results_dict[key] = quiz_progress
+    viewable_users = get_visibility_scope(request).users()
     
-    best_quiz_results = list(best_quiz_results_dict.values())
-    
-    # Сортируем по фамилии, названию теста и результату
-    best_results.sort(key=lambda x: (x.user.profile.last_name or '', x.test.name, -x.score))
-    best_quiz_results.sort(key=lambda x: (x.user.profile.last_name or '', x.test.name, -x.score))
+    # Лучшие результаты по каждому пользователю и тесту хранятся в UserBestResult
+    best_results = UserBestResult.objects.filter(user__in=viewable_users)
     
     # Получаем список доступных тестов для фильтра (и экспресс-тесты и зачеты)
-    available_tests_express = Test.objects.filter(
-        usertestprogress__user__in=viewable_users,
-        usertestprogress__completed=True,
-        usertestprogress__test_type='express'
-    ).distinct()
-    
-    available_tests_quiz = Test.objects.filter(
-        usertestprogress__user__in=viewable_users,
-        usertestprogress__completed=True,
-        usertestprogress__test_type='quiz'
-    ).distinct()
-    
-    # Объединяем тесты из обоих типов
-    available_tests = available_tests_express.union(available_tests_quiz)
-    
-    # Получаем названия тестов для отображения в шаблоне
-    test_names = {str(test.id): test.name for test in available_tests}
-    
-    # Статистика по группе
-    total_users = viewable_users.count()
-    
-    # Считаем уникальные тесты и пользователей
-    unique_express_tests = len(set((r.user.id, r.test.id) for r in best_results))
-    unique_quiz_tests = len(set((r.user.id, r.test.id) for r in best_quiz_results))
-    
-    # Средний балл по группе (по всем результатам)
-    if best_results:
-        avg_score = sum(result.score for result in best_results) / len(best_results)
-    else:
-        avg_score = 0
+    available_tests = Test.objects.filter(
+        id__in=best_results.values('test_id')
+    ).order_by('name')
+    
+    # Фильтрация по тесту и дате (по дате лучшего результата)
+    best_results = filter_group_results(request, best_results)
+    
+    # Количество и средний балл по экспресс-тестам и зачетам - одним запросом
+    summary = best_results.aggregate(
+        total_tests=Count('id', filter=Q(test_type='express')),
+        avg_score=Avg('score', filter=Q(test_type='express')),
+        total_quiz_tests=Count('id', filter=Q(test_type='quiz')),
+        avg_quiz_score=Avg('score', filter=Q(test_type='quiz')),
+    )
     
-    # Средний балл по зачетам
-    if best_quiz_results:
-        avg_quiz_score = sum(result.score for result in best_quiz_results) / len(best_quiz_results)
-    else:
-        avg_quiz_score = 0
+    # Сортируем по фамилии, названию теста и результату; страницы - отдельно для каждой таблицы
+    best_results = best_results.select_related(
+        'user__profile', 'test', 'progress'
+    ).order_by('user__profile__last_name', 'test__name', '-score', 'id')
+    express_paginator = Paginator(best_results.filter(test_type='express'), GROUP_RESULTS_PAGE_SIZE)
+    quiz_paginator = Paginator(best_results.filter(test_type='quiz'), GROUP_RESULTS_PAGE_SIZE)
+    # Количество строк уже посчитано агрегатом - без отдельных COUNT
+    express_paginator.count = summary['total_tests']
+    quiz_paginator.count = summary['total_quiz_tests']
+    completed_tests = express_paginator.get_page(request.GET.get('page'))
+    quiz_tests = quiz_paginator.get_page(request.GET.get('quiz_page'))
+    
+    # Параметры фильтра для ссылок на страницы
+    filter_query = request.GET.copy()
+    filter_query.pop('page', None)
+    filter_query.pop('quiz_page', None)
     
     return render(request, 'tests/group_results.html', {
         'viewable_users': viewable_users,
-        'completed_tests': best_results,
-        'quiz_tests': best_quiz_results,
+        'completed_tests': completed_tests,
+        'quiz_tests': quiz_tests,
         'available_tests': available_tests,
-        'test_names': test_names,
-        'total_users': total_users,
-        'total_tests': unique_express_tests,  # Количество уникальных комбинаций пользователь-тест
-        'total_quiz_tests': unique_quiz_tests,
-        'avg_score': round(avg_score, 1),
-        'avg_quiz_score': round(avg_quiz_score, 1),
+        'test_names': {str(test.id): test.name for test in available_tests},
+        'total_users': viewable_users.count(),
+        'total_tests': summary['total_tests'],  # Количество уникальных комбинаций пользователь-тест
+        'total_quiz_tests': summary['total_quiz_tests'],
+        'avg_score': round(summary['avg_score'] or 0, 1),
+        'avg_quiz_score': round(summary['avg_quiz_score'] or 0, 1),
         'user_profile': user_profile,
+        'filter_query': filter_query.urlencode(),
     })
 
+TEST_TYPE_LABELS = {'normal': 'Тренировка', 'express': 'Экспресс-тест', 'quiz': 'Зачет'}
+
+
+@login_required
+@require_GET
+def export_group_results(request):
+    """Выгрузка результатов группы с фильтрами страницы: лучшие результаты
+    (rows=best) или все завершенные попытки (rows=attempts)"""
+    if not request.user.profile.can_view_other_results():
+        messages.error(request, 'У вас нет прав для просмотра результатов группы.')
+        return redirect('profile')
+    
+    viewable_users = get_visibility_scope(request).users()
+    if request.GET.get('rows') == 'attempts':
+        results = UserTestProgress.objects.filter(
+            user__in=viewable_users, completed=True, score__isnull=False
+        )
+        filename = 'Попытки_группы'
+        fields = ['correct_answers_count', 'total_questions_count']
+    else:
+        results = UserBestResult.objects.filter(user__in=viewable_users)
+        filename = 'Результаты_группы'
+        fields = ['progress__correct_answers_count', 'progress__total_questions_count']
+    
+    results = filter_group_results(request, results).order_by(
+        'user__profile__last_name', 'test__name', 'test_type', '-score', 'id'
+    ).values_list(
+        'user__profile__last_name', 'user__profile__first_name', 'user__profile__patronymic',
+        'user__username', 'user__profile__department_code', 'test__name', 'test_type',
+        'completed_at', 'score', *fields
+    )
+    
+    def rows():
+        for (last_name, first_name, patronymic, username, department_code, test_name, test_type,
+             completed_at, score, correct_count, total_count) in results.iterator():
+            yield [
+                full_name(last_name, first_name, patronymic, username), username, department_code,
+                test_name, TEST_TYPE_LABELS.get(test_type, test_type), format_datetime(completed_at),
+                round(score, 1), correct_count, total_count,
+            ]
+    
+    return table_response(
+        request.GET.get('format'), filename, 'Результаты',
+        ['ФИО', 'Логин', 'Код подразделения', 'Тест', 'Тип', 'Дата прохождения',
+         'Результат, %', 'Правильные ответы', 'Количество вопросов'],
+        rows()
+    )
+
 @login_required
 def user_statistics_view(request, user_id):
     """Просмотр статистики конкретного пользователя (для руководителей)"""
     # Проверяем права доступа
-    if not request.user.profile.can_view_other_results():
+    if not get_visibility_scope(request).has_rights:
         messages.error(request, 'У вас нет прав для просмотра статистики других пользователей.')
         return redirect('profile')
     
     target_user = get_object_or_404(User, id=user_id)
     
     # Проверяем, что текущий пользователь имеет право просматривать статистику target_user
-    viewable_users = request.user.profile.get_viewable_users_query()
-    if target_user not in viewable_users:
+    if not get_visibility_scope(request).can_view(target_user):
         messages.error(request, 'У вас нет прав для просмотра статистики этого пользователя.')
         return redirect('group_results')
     
@@ -1224,19 +971,7 @@ def user_statistics_view(request, user_id):
 
 def statistics_for_user(request, target_user, is_own_profile=True):
     """Общая функция для отображения статистики (для своего профиля и для просмотра другими)"""
-    # Автоматически удаляем тесты старше 2 месяцев (только для своего профиля, кроме зачетов)
-    if is_own_profile:
-        two_months_ago = timezone.now() - timezone.timedelta(days=60)
-        old_tests = UserTestProgress.objects.filter(
-            user=target_user,
-            completed_at__lt=two_months_ago,
-            test_type__in=['normal', 'express']  # Удаляем только тренировки и экспресс-тесты
-        )
-        old_tests_count = old_tests.count()
-        old_tests.delete()
-        
-        if old_tests_count > 0:
-            messages.info(request, f'Автоматически удалено {old_tests_count} записей тренировок и экспресс-тестов старше 2 месяцев. Зачеты сохранены.')
+    # Страница только читает данные: попытки старше 2 месяцев удаляет команда purge_old_attempts
     
     # Получаем все завершенные тесты (только за последние 2 месяца)
     two_months_ago = timezone.now() - timezone.timedelta(days=60)
@@ -1346,7 +1081,7 @@ def statistics_for_user(request, target_user, is_own_profile=True):
 def user_test_results(request, user_id, test_id):
     """Просмотр детальных результатов конкретного пользователя"""
     # Проверяем права доступа
-    if not request.user.profile.can_view_other_results():
+    if not get_visibility_scope(request).has_rights:
         messages.error(request, 'У вас нет прав для просмотра этих результатов.')
         return redirect('profile')
     
@@ -1354,8 +1089,7 @@ def user_test_results(request, user_id, test_id):
     test = get_object_or_404(Test, id=test_id)
     
     # Проверяем, что текущий пользователь имеет право просматривать результаты target_user
-    viewable_users = request.user.profile.get_viewable_users_query()
-    if target_user != request.user and target_user not in viewable_users:
+    if not get_visibility_scope(request).can_view(target_user):
         messages.error(request, 'У вас нет прав для просмотра результатов этого пользователя.')
         return redirect('group_results')
     
@@ -1365,7 +1099,7 @@ def user_test_results(request, user_id, test_id):
     if attempt_id:
         # Получаем конкретную попытку по attempt_id
         try:
-            attempt = UserTestProgress.objects.get(
+            attempt = UserTestProgress.objects.select_related('test').get(
                 attempt_id=attempt_id,
                 user=target_user,
                 test=test,
@@ -1382,110 +1116,25 @@ def user_test_results(request, user_id, test_id):
             completed=True
         ).order_by('-completed_at')
         
-        if not attempts.exists():
+        attempt = attempts.select_related('test').first()
+        
+        if attempt is None:
             messages.error(request, 'У выбранного пользователя нет завершенных попыток по этому тесту.')
             return redirect('group_results')
-        
-        attempt = attempts.first()
     
-    # Находим сессию зачета, к которой относится эта попытка
-    session_id = None
-    try:
-        participant = QuizParticipant.objects.get(progress=attempt)
-        session_id = participant.quiz_session.id
-    except QuizParticipant.DoesNotExist:
-        # Если это не зачет, ищем сессию по question_order
-        try:
-            quiz_session = QuizSession.objects.filter(question_order=attempt.question_order).first()
-            if quiz_session:
-                session_id = quiz_session.id
-        except:
-            pass
-
-    # Определяем вопросы на основе типа теста
-    if attempt.test_type == 'express' or attempt.test_type == 'quiz':
-        # Для экспресс-теста и зачета используем сохраненный порядок вопросов
-        if attempt.question_order:
-            # Получаем вопросы в сохраненном порядке
-            question_ids = attempt.question_order
-            questions = []
-            for q_id in question_ids:
-                try:
-                    question = Question.objects.get(id=q_id, test=test)
-                    questions.append(question)
-                except Question.DoesNotExist:
-                    continue
-            total_questions = len(questions)
-        else:
-            # Если порядок не сохранен, используем вопросы по порядку номеров
-            questions_query = test.questions.all()
-            if attempt.start_question:
-                questions_query = questions_query.filter(question_number__gte=attempt.start_question)
-            if attempt.end_question:
-                questions_query = questions_query.filter(question_number__lte=attempt.end_question)
-            questions = list(questions_query.order_by('question_number'))
-            total_questions = len(questions)
-    else:
-        # Для обычного теста используем реальный диапазон из прогресса
-        questions_query = test.questions.all()
-        if attempt.start_question:
-            questions_query = questions_query.filter(question_number__gte=attempt.start_question)
-        if attempt.end_question:
-            questions_query = questions_query.filter(question_number__lte=attempt.end_question)
-        questions = list(questions_query.order_by('question_number'))
-        total_questions = len(questions)
-    
-    # Создаем список вопросов с их порядковыми номерами в тесте
-    questions_with_order = []
-    correct_answers = 0
-    user_answers = {}
-    
-    for i, question in enumerate(questions, 1):
-        user_answer = attempt.answers.get(str(question.id), [])
-        user_answers[str(question.id)] = user_answer
-        
-        # ПРАВИЛЬНОЕ ПРЕОБРАЗОВАНИЕ ПРАВИЛЬНЫХ ОТВЕТОВ
-        correct_answers_list = []
-        try:
-            # Обрабатываем случай, когда correct_answer может быть пустым или содержать нечисловые значения
-            if question.correct_answer:
-                correct_parts = question.correct_answer.split(',')
-                for part in correct_parts:
-                    part = part.strip()
-                    if part.isdigit():  # Проверяем, что часть является числом
-                        correct_answers_list.append(int(part))
-        except (ValueError, AttributeError):
-            correct_answers_list = []
-        
-        # ПРАВИЛЬНАЯ ПРОВЕРКА СОВПАДЕНИЯ ОТВЕТОВ
-        # Преобразуем user_answer в множество чисел для сравнения
-        user_answer_set = set(int(ans) for ans in user_answer if str(ans).isdigit())
-        correct_answers_set = set(correct_answers_list)
-        
-        is_correct = user_answer_set == correct_answers_set
-        if is_correct:
-            correct_answers += 1
-        
-        questions_with_order.append({
-            'question': question,
-            'order_number': i,
-            'original_number': question.question_number,
-            'correct_answers_list': correct_answers_list,
-            'is_correct': is_correct
-        })
-    
-    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+    # Разбор попытки: все вопросы одним запросом, сессия зачета - из самой попытки
+    review = build_attempt_review(attempt)
     
     return render(request, 'tests/user_test_results.html', {
         'target_user': target_user,
         'test': test,
         'attempt': attempt,
-        'questions_with_order': questions_with_order,
-        'user_answers': user_answers,
-        'correct_answers': correct_answers,
-        'total_questions': total_questions,
-        'score': score,
-        'session_id': session_id,
+        'questions_with_order': review['questions_with_order'],
+        'user_answers': review['user_answers'],
+        'correct_answers': review['correct_answers'],
+        'total_questions': review['total_questions'],
+        'score': review['score'],
+        'session_id': review['session_id'],
     })
 
 # Функции для проведения зачета
@@ -1509,27 +1158,20 @@ def create_quiz(request):
             starts_at = form.cleaned_data['starts_at']
             ends_at = form.cleaned_data['ends_at']
             
-            # Получаем пользователей группы с помощью нового метода
-            group_users = user_profile.get_group_users()
+            # Участники зачета - группа создателя вместе с ним самим
+            quiz_audience = get_quiz_audience(request.user)
             
-            # ВКЛЮЧАЕМ СОЗДАТЕЛЯ В СПИСОК УЧАСТНИКОВ
-            all_users = list(group_users) 
-            all_users.append(request.user)  # Явно добавляем создателя
+            # Получаем все вопросы теста из ключа ответов
+            answer_key = test.get_answer_key()
+            question_ids = active_question_ids(answer_key)
             
-            if not all_users:
-                messages.error(request, 'В вашей группе нет пользователей')
+            if len(question_ids) < question_count:
+                messages.error(request, f'В тесте только {len(question_ids)} вопросов, нельзя создать зачет с {question_count} вопросами')
                 return render(request, 'tests/create_quiz.html', {'form': form})
             
-            # Получаем все вопросы теста
-            all_questions = list(test.questions.all())
-            
-            if len(all_questions) < question_count:
-                messages.error(request, f'В тесте только {len(all_questions)} вопросов, нельзя создать зачет с {question_count} вопросами')
-                return render(request, 'tests/create_quiz.html', {'form': form})
-            
-            # Выбираем случайные вопросы
-            random_questions = random.sample(all_questions, question_count)
-            question_order = [q.id for q in random_questions]
+            # Выбираем случайные вопросы и сортируем их по номеру
+            question_order = random.sample(question_ids, question_count)
+            question_order.sort(key=lambda question_id: answer_key[question_id].number)
             
             # Создаем сессию зачета (is_active=False по умолчанию)
             quiz_session = QuizSession.objects.create(
@@ -1544,16 +1186,10 @@ def create_quiz(request):
                 manually_activated=False
             )
             
-            # Добавляем ВСЕХ участников (включая создателя)
-            for user in all_users:
-                # Проверяем, не создаем ли дубликат
-                if not QuizParticipant.objects.filter(quiz_session=quiz_session, user=user).exists():
-                    QuizParticipant.objects.create(
-                        quiz_session=quiz_session,
-                        user=user
-                    )
+            # Добавляем ВСЕХ участников (включая создателя) одним bulk_create
+            participants_count = enroll_users(quiz_session, quiz_audience)
             
-            messages.success(request, f'Зачет создан! Участников: {len(all_users)} (включая вас). Зачет будет активирован автоматически в {starts_at.strftime("%d.%m.%Y %H:%M")} или вы можете активировать его вручную.')
+            messages.success(request, f'Зачет создан! Участников: {participants_count} (включая вас). Зачет будет активирован автоматически в {starts_at.strftime("%d.%m.%Y %H:%M")} или вы можете активировать его вручную.')
             return redirect('quiz_session_detail', session_id=quiz_session.id)
     
     else:
@@ -1565,12 +1201,18 @@ def create_quiz(request):
 def quiz_sessions(request):
     """Список сессий зачетов - ДОСТУПНО ВСЕМ ПОЛЬЗОВАТЕЛЯМ"""
     # Для создателей - созданные зачеты
-    created_sessions = QuizSession.objects.filter(creator=request.user).order_by('-created_at')
+    created_sessions = QuizSession.objects.filter(
+        creator=request.user
+    ).select_related('test', 'stats').order_by('-created_at')
     
     # Для всех пользователей - зачеты, в которых они участвуют
-    # ИСКЛЮЧАЕМ УСЛОВИЕ exclude(creator=request.user) чтобы создатель видел свои зачеты
+    # ИСКЛЮЧАЕМ УСЛОВИЕ exclude(creator=request.user) чтобы создатель видел свои зачеты.
+    # Попытка пользователя берется тем же JOIN, что и фильтр по участнику
     participant_sessions = QuizSession.objects.filter(
         participants__user=request.user
+    ).select_related('test', 'creator').annotate(
+        user_attempt_id=F('participants__progress__attempt_id'),
+        user_completed=F('participants__progress__completed'),
     ).order_by('-created_at')
     
     return render(request, 'tests/quiz_sessions.html', {
@@ -1583,34 +1225,26 @@ def quiz_session_detail(request, session_id):
     """Детальная информация о сессии зачета"""
     quiz_session = get_object_or_404(QuizSession, id=session_id)
     
-    # Проверяем и обновляем статус активации
-    quiz_session.check_activation()
-    
     # Проверяем права доступа
     if (quiz_session.creator != request.user and 
         not quiz_session.participants.filter(user=request.user).exists()):
         messages.error(request, 'У вас нет доступа к этой сессии зачета')
         return redirect('quiz_sessions')
     
-    # Получаем участников и сортируем по фамилии
-    participants = quiz_session.participants.select_related(
-        'user', 'user__profile', 'progress'
-    ).all().order_by('user__profile__last_name', 'user__profile__first_name')
-    
-    # ПРИНУДИТЕЛЬНО ОБНОВЛЯЕМ СТАТУСЫ ВСЕХ УЧАСТНИКОВ
-    for participant in participants:
-        if participant.progress and participant.progress.completed and not participant.completed_at:
-            participant.completed_at = participant.progress.completed_at
-            participant.save()
+    # Счетчики сессии - одна строка, без пересчета по участникам
+    stats = get_session_stats(quiz_session)
     
-    # Считаем завершивших
-    completed_count = participants.filter(completed_at__isnull=False).count()
+    # Список показывает только тех, кто еще не завершил тест
+    participants = quiz_session.participants.filter(
+        completed_at__isnull=True
+    ).select_related('user', 'user__profile').order_by('user__profile__last_name', 'user__profile__first_name')
     
     return render(request, 'tests/quiz_session_detail.html', {
         'quiz_session': quiz_session,
         'participants': participants,
-        'completed_count': completed_count,
-        'total_participants': participants.count(),
+        'stats': stats,
+        'completed_count': stats.completed_count,
+        'total_participants': stats.enrolled_count,
         'is_creator': quiz_session.creator == request.user
     })
 
@@ -1619,18 +1253,15 @@ def participate_in_quiz(request, session_id):
     """Участие в зачете"""
     quiz_session = get_object_or_404(QuizSession, id=session_id)
     
-    # Проверяем и обновляем статус активации
-    quiz_session.check_activation()
-    
     # Проверяем, является ли пользователь участником
     participant = get_object_or_404(
-        QuizParticipant, 
+        QuizParticipant.objects.select_related('progress'),
         quiz_session=quiz_session, 
         user=request.user
     )
     
-    # Проверяем, активирован ли зачет
-    if not quiz_session.is_active:
+    # Проверяем, начался ли зачет
+    if not quiz_session.is_started:
         messages.error(request, 'Зачет еще не активирован.')
         return redirect('quiz_session_detail', session_id=session_id)
     
@@ -1643,51 +1274,25 @@ def participate_in_quiz(request, session_id):
     # Проверяем, не завершил ли уже пользователь зачет
     if participant.progress and participant.progress.completed:
         # Если зачет уже завершен, перенаправляем на страницу результатов С attempt_id
-        return redirect('test_results', test_id=quiz_session.test.id) + f'?attempt_id={participant.progress.attempt_id}'
+        return redirect(f"{reverse('test_results', args=[quiz_session.test_id])}?attempt_id={participant.progress.attempt_id}")
     
-    # Создаем или получаем прогресс теста
-    if not participant.progress:
-        # Создаем прогресс теста
-        questions = Question.objects.filter(id__in=quiz_session.question_order)
-        first_question = questions.first()
-        
-        # Рассчитываем время окончания теста
-        end_time = now + timezone.timedelta(minutes=quiz_session.time_limit_minutes)
-        
-        progress = UserTestProgress.objects.create(
-            user=request.user,
-            test=quiz_session.test,
-            current_question=first_question,
-            completed=False,
-            answers={},
-            start_question=1,
-            end_question=quiz_session.question_count,
-            test_type='quiz',
-            time_limit_minutes=quiz_session.time_limit_minutes,
-            question_order=quiz_session.question_order,
-            start_time=now,
-            end_time=end_time,
-            quiz_session=quiz_session
-        )
-        
-        participant.progress = progress
-        participant.save()
-    else:
-        progress = participant.progress
-        
-        # Если прогресс уже существует, но время вышло - завершаем тест
-        if progress.end_time and timezone.now() > progress.end_time:
-            progress.completed = True
-            progress.save()
-            messages.error(request, 'Время зачета истекло')
-            return redirect('test_results', test_id=quiz_session.test.id)
+    # Если попытка уже открыта, но время вышло - завершаем тест
+    progress = participant.progress
+    if progress and progress.end_time and now > progress.end_time:
+        progress.completed = True
+        progress.save()
+        messages.error(request, 'Время зачета истекло')
+        return redirect(f"{reverse('test_results', args=[quiz_session.test_id])}?attempt_id={progress.attempt_id}")
+    
+    # Открываем попытку: она создана заранее при активации зачета, здесь только
+    # выставляется время начала и окончания (один UPDATE)
+    progress = start_quiz_attempt(quiz_session, participant, now)
     
     # Сохраняем в сессии
     request.session['current_attempt_id'] = progress.attempt_id
     request.session['question_range'] = {
         'start': 1,
         'end': quiz_session.question_count,
-        'question_ids': quiz_session.question_order,
         'test_type': 'quiz'
     }
     
@@ -1704,30 +1309,10 @@ def update_quiz_participants(request, session_id):
         messages.error(request, 'Только создатель зачета может обновлять список участников.')
         return redirect('quiz_session_detail', session_id=session_id)
     
-    # Получаем всех пользователей группы создателя
-    creator_profile = request.user.profile
-    group_users = creator_profile.get_group_users()
-    
-    # Добавляем создателя, если его нет
-    if request.user not in group_users:
-        group_users = list(group_users) + [request.user]
-    
-    added_count = 0
-    existing_count = 0
-    
-    # Добавляем всех пользователей группы в зачет
-    for user in group_users:
-        if not QuizParticipant.objects.filter(
-            quiz_session=quiz_session, 
-            user=user
-        ).exists():
-            QuizParticipant.objects.create(
-                quiz_session=quiz_session,
-                user=user
-            )
-            added_count += 1
-        else:
-            existing_count += 1
+    # Добавляем всех пользователей группы создателя (и его самого) одним bulk_create
+    quiz_audience = get_quiz_audience(request.user)
+    added_count = enroll_users(quiz_session, quiz_audience)
+    existing_count = quiz_audience.count() - added_count
     
     messages.success(request, f'Добавлено {added_count} новых участников в зачет. Уже было: {existing_count}.')
     return redirect('quiz_session_detail', session_id=session_id)
@@ -1744,54 +1329,98 @@ def quiz_session_results(request, session_id):
         messages.error(request, 'Только создатель зачета может просматривать результаты')
         return redirect('quiz_sessions')
     
-    # Получаем участников - создатель видит всех, другие руководители видят только свою группу
-    if quiz_session.creator == request.user:
-        participants = quiz_session.participants.select_related(
-            'user', 'user__profile', 'progress'
-        ).all()
+    # Создатель видит всех участников, другие руководители - только свою группу
+    user_ids = None if quiz_session.creator == request.user else get_visibility_scope(request).user_ids()
+    
+    # Страница рейтинга: порядок считается в базе, страницы - по ключу
+    # (значения сортировки последнего показанного участника)
+    after = request.GET.get('after', '')
+    try:
+        limit = int(request.GET.get('limit', RESULTS_PAGE_SIZE))
+    except ValueError:
+        limit = RESULTS_PAGE_SIZE
+    participants, next_after = get_results_page(quiz_session, user_ids, after=after, limit=limit)
+    
+    # Итоги: для всей сессии - готовые счетчики, для части участников - агрегат в базе
+    if user_ids is None:
+        stats = get_session_stats(quiz_session)
+        summary = {
+            'total_count': stats.enrolled_count,
+            'completed_count': stats.completed_count,
+            'avg_score': stats.average_score,
+        }
     else:
-        # Для других руководителей - только участников из их группы
-        viewable_users = user_profile.get_viewable_users_query()
-        participants = quiz_session.participants.select_related(
-            'user', 'user__profile', 'progress'
-        ).filter(user__in=viewable_users)
-    
-    # ПРИНУДИТЕЛЬНО ОБНОВЛЯЕМ СТАТУСЫ ВСЕХ УЧАСТНИКОВ
-    for participant in participants:
-        if participant.progress and participant.progress.completed and not participant.completed_at:
-            participant.completed_at = participant.progress.completed_at
-            participant.save()
-    
-    # СОРТИРУЕМ УЧАСТНИКОВ:
-    # 1. Сначала завершившие тест, затем незавершившие
-    # 2. Среди завершивших - по результату (от большего к меньшему)
-    # 3. При одинаковом результате - по времени завершения (раньше завершившие выше)
-    sorted_participants = sorted(
-        participants,
-        key=lambda p: (
-            # Приоритет: завершившие тест идут первыми
-            0 if p.completed_at else 1,
-            # Для завершивших: результат от большего к меньшему
-            -p.progress.score if p.progress and p.progress.score is not None else 1,
-            # При одинаковом результате: кто раньше завершил - тот выше
-            p.completed_at if p.completed_at else timezone.now()
-        )
-    )
+        summary = summarize_participants(quiz_session, user_ids)
     
-    # Считаем статистику
-    completed_participants = [p for p in sorted_participants if p.completed_at]
-    avg_score = 0
-    if completed_participants:
-        avg_score = sum(p.progress.score for p in completed_participants if p.progress) / len(completed_participants)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'session_id': quiz_session.id,
+            'test': quiz_session.test.name,
+            'total_count': summary['total_count'],
+            'completed_count': summary['completed_count'],
+            'avg_score': round(summary['avg_score'], 1),
+            'results': [
+                {
+                    'position': participant.position,
+                    'user_id': participant.user_id,
+                    'name': participant.user.profile.get_short_name(),
+                    'completed': participant.completed_at is not None,
+                    'completed_at': participant.completed_at.isoformat() if participant.completed_at else None,
+                    'score': participant.progress.score if participant.progress else None,
+                    'grade': grade_label(participant.progress.score) if participant.progress else None,
+                    'attempt_id': participant.progress.attempt_id if participant.progress else None,
+                }
+                for participant in participants
+            ],
+            'next_after': next_after,
+        }, json_dumps_params={'ensure_ascii': False})
     
     return render(request, 'tests/quiz_session_results.html', {
         'quiz_session': quiz_session,
-        'participants': sorted_participants,  # Используем отсортированный список
-        'completed_count': len(completed_participants),
-        'total_count': len(sorted_participants),
-        'avg_score': round(avg_score, 1)
+        'participants': participants,  # Уже упорядочены по месту в рейтинге
+        'completed_count': summary['completed_count'],
+        'total_count': summary['total_count'],
+        'avg_score': round(summary['avg_score'], 1),
+        'after': after,
+        'next_after': next_after,
     })
 
+@login_required
+@require_GET
+def export_quiz_session_results(request, session_id):
+    """Выгрузка рейтинга сессии зачета (права - как у страницы результатов)"""
+    quiz_session = get_object_or_404(QuizSession.objects.select_related('test'), id=session_id)
+    
+    if quiz_session.creator != request.user and not request.user.profile.can_view_other_results():
+        messages.error(request, 'Только создатель зачета может просматривать результаты')
+        return redirect('quiz_sessions')
+    
+    user_ids = None if quiz_session.creator == request.user else get_visibility_scope(request).user_ids()
+    participants = ranked_participants(quiz_session, user_ids).values_list(
+        'position', 'user__profile__last_name', 'user__profile__first_name', 'user__profile__patronymic',
+        'user__username', 'user__profile__department_code', 'completed_at',
+        'progress__score', 'progress__correct_answers_count', 'progress__total_questions_count'
+    )
+    
+    def rows():
+        for (position, last_name, first_name, patronymic, username, department_code, completed_at,
+             score, correct_count, total_count) in participants.iterator():
+            completed = completed_at is not None
+            yield [
+                position, full_name(last_name, first_name, patronymic, username), username, department_code,
+                'Завершил' if completed else 'Не завершил', format_datetime(completed_at),
+                round(score, 1) if completed and score is not None else '',
+                grade_label(score) if completed else '',
+                correct_count if completed else '', total_count if completed else '',
+            ]
+    
+    return table_response(
+        request.GET.get('format'), f'Зачет_{quiz_session.id}_{quiz_session.test.name}', 'Результаты зачета',
+        ['Место', 'ФИО', 'Логин', 'Код подразделения', 'Статус', 'Время завершения',
+         'Результат, %', 'Оценка', 'Правильные ответы', 'Количество вопросов'],
+        rows()
+    )
+
 @login_required
 def start_quiz_session(request, session_id):
     """Принудительное начало зачета (для создателя)"""
@@ -1822,7 +1451,9 @@ def delete_quiz_session(request, session_id):
         # Получаем название теста для сообщения
         test_name = quiz_session.test.name
         
-        # Удаляем зачет и всех участников (прогресс тестов остается в истории)
+        # Удаляем зачет и всех участников (прогресс тестов остается в истории,
+        # кроме заранее созданных и так и не открытых попыток)
+        quiz_session.progress_records.filter(completed=False, start_time__isnull=True).delete()
         quiz_session.delete()
         
         messages.success(request, f'Зачет "{test_name}" был успешно удален.')
@@ -1839,7 +1470,7 @@ def delete_quiz_session(request, session_id):
 def user_test_all_attempts(request, user_id, test_id):
     """Отображение всех попыток пользователя по конкретному тесту"""
     # Проверяем права доступа
-    if not request.user.profile.can_view_other_results():
+    if not get_visibility_scope(request).has_rights:
         messages.error(request, 'У вас нет прав для просмотра этих результатов.')
         return redirect('profile')
     
@@ -1847,8 +1478,7 @@ def user_test_all_attempts(request, user_id, test_id):
     test = get_object_or_404(Test, id=test_id)
     
     # Проверяем, что текущий пользователь имеет право просматривать статистику target_user
-    viewable_users = request.user.profile.get_viewable_users_query()
-    if target_user != request.user and target_user not in viewable_users:
+    if not get_visibility_scope(request).can_view(target_user):
         messages.error(request, 'У вас нет прав для просмотра результатов этого пользователя.')
         return redirect('group_results')
     
@@ -1869,7 +1499,7 @@ def user_test_all_attempts(request, user_id, test_id):
         'test': test,
         'best_attempt': best_attempt,
         'all_attempts': all_attempts,
-        'total_attempts': all_attempts.count(),
+        'total_attempts': len(all_attempts),
     })
 #Представление для проверки времени
 @login_required
@@ -1910,6 +1540,80 @@ def check_time_remaining(request):
         return JsonResponse({'error': 'Прогресс не найден'}, status=404)
 
 
+# Поток событий таймера зачета (Server-Sent Events).
+# Дедлайн отправляется один раз, дальше клиент считает сам; сервер лишь
+# изредка присылает resync и событие expired, когда время выходит.
+# Поток отдается только под ASGI (testing_platform/asgi.py), где каждое
+# соединение - это корутина. Под WSGI Django дочитал бы асинхронный генератор
+# до конца, прежде чем отправить первый байт, и держал бы поток воркера все
+# время зачета, поэтому там страница зачета сразу использует опрос.
+QUIZ_TIMER_RESYNC_SECONDS = 60
+
+
+def timer_stream_available(request):
+    """Можно ли отдавать SSE-поток таймера: только при запуске через ASGI"""
+    return isinstance(request, ASGIRequest)
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _quiz_timer_events(end_time, completed):
+    # Клиент переподключается через 5 секунд, если соединение оборвалось
+    yield 'retry: 5000\n\n'
+    
+    if completed:
+        yield _sse_event('completed', {'remaining_time': 0})
+        return
+    
+    if not end_time:
+        yield _sse_event('deadline', {'end_time': None, 'remaining_time': None})
+        return
+    
+    remaining_time = max(0, (end_time - timezone.now()).total_seconds())
+    yield _sse_event('deadline', {'end_time': end_time.isoformat(), 'remaining_time': remaining_time})
+    
+    while remaining_time > 0:
+        await asyncio.sleep(min(remaining_time, QUIZ_TIMER_RESYNC_SECONDS))
+        remaining_time = max(0, (end_time - timezone.now()).total_seconds())
+        if remaining_time > 0:
+            yield _sse_event('resync', {'remaining_time': remaining_time})
+    
+    yield _sse_event('expired', {'remaining_time': 0})
+
+
+@login_required
+@require_GET
+async def quiz_timer_stream(request):
+    """SSE-поток оставшегося времени зачета вместо периодического опроса"""
+    attempt_id = request.GET.get('attempt_id')
+    
+    if not attempt_id:
+        return JsonResponse({'error': 'attempt_id не указан'}, status=400)
+    
+    user = await request.auser()
+    progress = await UserTestProgress.objects.filter(
+        attempt_id=attempt_id,
+        user=user
+    ).values('end_time', 'completed').afirst()
+    
+    if progress is None:
+        return JsonResponse({'error': 'Прогресс не найден'}, status=404)
+    
+    if not timer_stream_available(request):
+        # 204 - сигнал EventSource больше не переподключаться; клиент перейдет на опрос
+        return HttpResponse(status=204)
+    
+    response = StreamingHttpResponse(
+        _quiz_timer_events(progress['end_time'], progress['completed']),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def training_statistics(request):
     """Графики статистики тренировок"""
@@ -1956,36 +1660,11 @@ def user_all_statistics(request, user_id):
 
 def statistics_charts(request, user, test_type, current_view):
     """Общая функция для генерации графиков статистики"""
-    # Получаем данные за последние 60 дней
-    sixty_days_ago = timezone.now() - timezone.timedelta(days=60)
-    
-    # Базовый запрос
-    tests_query = UserTestProgress.objects.filter(
-        user=user,
-        completed=True,
-        completed_at__gte=sixty_days_ago
-    )
-    
-    # Фильтруем по типу теста
-    if test_type != 'all':
-        tests_query = tests_query.filter(test_type=test_type)
+    # Период: ?days=N или ?date_from=...&date_to=... (по умолчанию 60 дней)
+    window = get_chart_window(request.GET)
     
-    tests = tests_query.order_by('completed_at')
-    
-    # Подготавливаем данные для графиков
-    chart_data = prepare_chart_data(tests, test_type)
-    
-    # Дополнительная статистика
-    total_tests = tests.count()
-    avg_score = tests.aggregate(avg=Avg('score'))['avg'] or 0
-    best_score = tests.aggregate(best=Max('score'))['best'] or 0
-    worst_score = tests.aggregate(worst=Min('score'))['worst'] or 0
-    
-    # Самые популярные тесты
-    popular_tests = tests.values('test__name').annotate(
-        count=Count('id'),
-        avg_score=Avg('score')
-    ).order_by('-count')[:5]
+    # Графики и итоги строятся по дневной статистике, а не по попыткам
+    statistics_data = build_chart_statistics(user, test_type, window['first_day'], window['last_day'])
     
     # Определяем правильный шаблон
     if 'user_' in current_view:
@@ -1998,132 +1677,35 @@ def statistics_charts(request, user, test_type, current_view):
         'target_user': user,  # Добавляем для совместимости
         'test_type': test_type,
         'current_view': current_view,
-        'chart_data': chart_data,
-        'total_tests': total_tests,
-        'avg_score': round(avg_score, 1),
-        'best_score': round(best_score, 1),
-        'worst_score': round(worst_score, 1),
-        'popular_tests': popular_tests,
-        'time_period': '60 дней'
+        **statistics_data,
+        'time_period': window['label'],
+        'chart_periods': CHART_PERIODS,
+        'days': window['days'],
+        'date_from': window['first_day'].isoformat(),
+        'date_to': window['last_day'].isoformat(),
+        'period_query': window['query'],
     })
 
 def user_statistics_charts(request, target_user, test_type, current_view):
     """Графики статистики для просмотра другими пользователями"""
     # Проверяем права доступа
-    if not request.user.profile.can_view_other_results() and request.user != target_user:
+    if not get_visibility_scope(request).can_view(target_user):
         messages.error(request, 'У вас нет прав для просмотра статистики этого пользователя.')
         return redirect('group_results')
     
     # Используем общую функцию, но с другим шаблоном
     return statistics_charts(request, target_user, test_type, current_view)
 
-def prepare_chart_data(tests, test_type):
-    """Подготовка данных для графиков"""
-    import json
-    from collections import defaultdict
-    
-    # Данные для графика прогресса по времени
-    progress_data = []
-    scores_by_date = defaultdict(list)
-    
-    for test in tests:
-        date_str = test.completed_at.strftime('%Y-%m-%d')
-        scores_by_date[date_str].append(test.score)
-    
-    # Усредняем результаты по дням
-    for date_str, scores in sorted(scores_by_date.items()):
-        avg_score = sum(scores) / len(scores)
-        progress_data.append({
-            'date': date_str,
-            'score': round(avg_score, 1)
-        })
-    
-    # ИСПРАВЛЕННАЯ ЛОГИКА: Данные для распределения результатов по 4-балльной системе
-    score_distribution = {
-        '0-50%': 0,    # неудовлетворительно
-        '51-70%': 0,   # удовлетворительно  
-        '71-89%': 0,   # хорошо
-        '90-100%': 0   # отлично
-    }
-    
-    for test in tests:
-        if test.score is not None:
-            score = test.score
-            if score <= 50:
-                score_distribution['0-50%'] += 1
-            elif score <= 70:
-                score_distribution['51-70%'] += 1
-            elif score <= 90:
-                score_distribution['71-89%'] += 1
-            else:
-                score_distribution['90-100%'] += 1
-    
-    # Данные для графика по тестам
-    tests_performance = []
-    test_scores = defaultdict(list)
-    
-    for test in tests:
-        if test.score is not None:
-            test_scores[test.test.name].append(test.score)
-    
-    for test_name, scores in test_scores.items():
-        tests_performance.append({
-            'test': test_name,
-            'avg_score': round(sum(scores) / len(scores), 1),
-            'count': len(scores)
-        })
-    
-    # Сортируем по среднему результату
-    tests_performance.sort(key=lambda x: x['avg_score'], reverse=True)
-    
-    return {
-        'progress_data': json.dumps(progress_data),
-        'score_distribution': json.dumps(score_distribution),
-        'tests_performance': json.dumps(tests_performance[:10]),  # Топ-10 тестов
-        'total_tests': len(tests)
-    }
-
 
 @login_required
 def sync_user_quizzes(request):
     """Синхронизация зачетов пользователя при каждом входе"""
-    from .models import QuizSession, QuizParticipant
-    from django.utils import timezone
-    
     user = request.user
     user_profile = user.profile
     
-    now = timezone.now()
-    
     if user_profile.department_code:
         try:
-            # Находим зачеты, созданные руководителями из той же группы
-            group_users = user_profile.get_group_users()
-            
-            # Ищем активные зачеты, где создатель входит в ту же группу
-            active_quizzes = QuizSession.objects.filter(
-                ends_at__gte=now,
-                is_active=True
-            )
-            
-            # Фильтруем зачеты, где создатель в той же группе что и пользователь
-            matching_quizzes = []
-            for quiz in active_quizzes:
-                if quiz.creator in group_users:
-                    matching_quizzes.append(quiz)
-            
-            # Добавляем пользователя в найденные зачеты
-            added_count = 0
-            for quiz in matching_quizzes:
-                if not QuizParticipant.objects.filter(
-                    quiz_session=quiz, 
-                    user=user
-                ).exists():
-                    QuizParticipant.objects.create(
-                        quiz_session=quiz,
-                        user=user
-                    )
-                    added_count += 1
+            added_count = enroll_user_in_group_quizzes(user)
             
             if added_count > 0:
                 messages.info(request, f'Вы добавлены в {added_count} новых зачетов вашей группы.')